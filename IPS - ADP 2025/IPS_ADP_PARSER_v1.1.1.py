@@ -1,19 +1,40 @@
-import pandas as pd
 import os
 import sys
 import glob
 import re
 from datetime import datetime
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from openpyxl.utils import get_column_letter
+
+# Librería compartida (carpeta ips_core en la raíz del repositorio)
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+while not os.path.isdir(os.path.join(_RAIZ, "ips_core")) and os.path.dirname(_RAIZ) != _RAIZ:
+    _RAIZ = os.path.dirname(_RAIZ)
+sys.path.insert(0, _RAIZ)
+from ips_core.meses import mes_de_cabecera, layout_meses
+from ips_core.acumulados import derivar_acumulados, marcas_acumulados
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import hoja_tabla, render_estilizada, guardar_en_segundo_plano
+from ips_core.formatos import formatos_de_argv, tipar, exportar_tablas
+from ips_core.carga_masiva import carga_de_argv, generar_carga
+from ips_core.vistas import vistas_de_argv, persistir, renderizar
+from ips_core.decisiones import Decisiones, reglas_de_argv
+from ips_core.arranque import perezoso, es_nulo
+
+pd = perezoso("pandas")   # se importa al leer la primera planilla (ips_core.arranque)
 
 # =============================================================================
 # IPS_ADP_PARSER_v1.1.2 - SIG_DATOS_VARIABLES CON ARCHIVO Y HOJA (12 COLUMNAS)
 # =============================================================================
 
 class IPS_ADP_Parser:
-    def __init__(self, folder_path):
+    HEADERS_VARS = [
+        "AÑO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION", 
+        "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL", 
+        "ARCHIVO", "HOJA"
+    ]
+    ESTADO_BRUTO = ("tree_proy", "tree_sig", "flat_data_proy", "flat_data_sig", "variable_data_sig")   # se guarda para 'render'
+    ARBOLES_ESTILIZADOS = ("tree_proy", "tree_sig")
+
+    def __init__(self, folder_path, formatos=("xlsx",), carga=None, estilizada=False, decisiones=None):
         self.folder_path = folder_path
         self.output_file = os.path.join(folder_path, "ADP_CONSOLIDADO_v20260226-20-15.xlsx")
         
@@ -23,6 +44,10 @@ class IPS_ADP_Parser:
         self.flat_data_sig = [] 
         self.variable_data_sig = [] 
         
+        self.formatos = list(formatos)
+        self.carga = carga            # (desde, hasta, mapa_cr) -> archivo de carga masiva SIG
+        self.estilizada = estilizada  # True: hojas Estilizada en la misma pasada (si no, comando 'render')
+        self.decisiones = decisiones or Decisiones()   # interactivo, o por reglas (--reglas)
         self.opt_format_percent = True
         self.valid_sheet_keywords = ["PROYEC", "SIG"]
         
@@ -53,27 +78,41 @@ class IPS_ADP_Parser:
         print("\n" + "="*60)
         print("   CONFIGURACIÓN MAESTRA ADP v1.1.2 (Transaccional 12 Cols)")
         print("="*60)
-        resp_p = input("1. ¿Transformar porcentajes (0.2 -> 20)? [S/N] (Enter=Si): ").lower().strip()
+        resp_p = self.decisiones.responder("porcentajes", "1. ¿Transformar porcentajes (0.2 -> 20)? [S/N] (Enter=Si): ").lower()
         self.opt_format_percent = (resp_p != 'n')
         print(f"\n[OK] Configuración guardada.")
         print("-" * 60)
 
+    def derive_accumulated(self):
+        # Acumulados calculados (NumPy) sobre todos los indicadores a la vez: completa los vacíos y marca diferencias
+        filas = self.flat_data_proy + self.flat_data_sig
+        n_comp, n_dif = 0, 0
+        for op in (1, 2):
+            c, d = derivar_acumulados(filas, [f"{m} Op {op}" for m in self.meses_fijos],
+                                      [f"{m} Acum Op {op}" for m in self.meses_fijos])
+            n_comp += c; n_dif += d
+        return n_comp, n_dif
+
     def print_summary_and_exit(self):
+        n_comp, n_dif = self.derive_accumulated()
         print("\n" + "="*60)
         print("   RESUMEN FINAL")
         print("="*60)
         print(f"  * Registros 'Proyecciones - Bruta': {len(self.flat_data_proy)}")
         print(f"  * Registros 'SIG - Bruta':          {len(self.flat_data_sig)}")
         print(f"  * Registros 'SIG_DATOS_VARIABLES':  {len(self.variable_data_sig)}")
+        print(f"  * Acumulados completados:          {n_comp}")
+        print(f"  * Acumulados a revisar (difieren): {n_dif}")
         print("-" * 60)
+        self.decisiones.informe(self.output_file)
         if self.flat_data_proy or self.flat_data_sig: 
-            self.export_excel()
+            self.export_outputs()
         else: 
             print("[AVISO] No se generó archivo de salida.")
         sys.exit()
 
     def analyze_formula(self, formula_raw):
-        if pd.isna(formula_raw) or str(formula_raw).strip() == "": return "", "Sin Fórmula"
+        if es_nulo(formula_raw) or str(formula_raw).strip() == "": return "", "Sin Fórmula"
         f_clean = str(formula_raw).replace("\n", " ").strip()
         match = re.search(r'(\s*\*\s*100)\s*$', f_clean)
         suffix, core, f_type = "", f_clean, "CUOCIENTE"
@@ -84,7 +123,7 @@ class IPS_ADP_Parser:
 
     def transform_percentage(self, val):
         if not self.opt_format_percent: return val
-        if pd.isna(val) or val == "" or str(val).strip() == "": return ""
+        if es_nulo(val) or val == "" or str(val).strip() == "": return ""
         try:
             num = float(val)
             if 0 < abs(num) <= 1: return round(num * 100, 2)
@@ -92,32 +131,12 @@ class IPS_ADP_Parser:
         except: return val
 
     def extract_month_name(self, val):
-        if pd.isna(val): return ""
-        val_str = str(val).strip().lower()
-        if not val_str: return ""
-        try:
-            dt = pd.to_datetime(val, errors='raise')
-            mes_idx = dt.month - 1
-            year = str(dt.year)[-2:]
-            meses_base = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-            return f"{meses_base[mes_idx]}-{year}"
-        except: pass
-        mapa_meses = {
-            "ene": "Ene", "feb": "Feb", "mar": "Mar", "abr": "Abr", 
-            "may": "May", "jun": "Jun", "jul": "Jul", "ago": "Ago", 
-            "sep": "Sep", "oct": "Oct", "nov": "Nov", "dic": "Dic"
-        }
-        if "-" in val_str:
-            parts = val_str.split("-")
-            if len(parts) == 2:
-                m, y = parts[0].strip(), parts[1].strip()
-                if m in mapa_meses and y.isdigit(): return f"{mapa_meses[m]}-{y[-2:]}"
-                elif y in mapa_meses and m.isdigit(): return f"{mapa_meses[y]}-{m[-2:]}"
-        return val_str
+        # Despacho por tipo/patrón con caché por valor crudo (ips_core.meses)
+        return mes_de_cabecera(val)
 
     def get_excel_files(self):
         all_files = glob.glob(os.path.join(self.folder_path, "*.xlsx")) + glob.glob(os.path.join(self.folder_path, "*.xls"))
-        valid_files = [f for f in all_files if not os.path.basename(f).startswith("~$") and "ADP_CONSOLIDADO" not in f]
+        valid_files = [f for f in all_files if not os.path.basename(f).startswith("~$") and "ADP_CONSOLIDADO" not in f and "carga masiva" not in os.path.basename(f)]
         return valid_files
 
     def process_folder(self):
@@ -175,7 +194,7 @@ class IPS_ADP_Parser:
 
                 h_idx = None
                 for idx in range(min(15, len(df))):
-                    row_vals = [str(x).upper().strip() for x in df.iloc[idx].values if pd.notna(x)]
+                    row_vals = [str(x).upper().strip() for x in df.iloc[idx].values if not es_nulo(x)]
                     if ("NUMERO" in row_vals or "NÚMERO" in row_vals) or ("INDICADOR" in row_vals and "FORMULA" in row_vals):
                         h_idx = idx
                         break
@@ -207,23 +226,9 @@ class IPS_ADP_Parser:
                 col_efectivo = find_col(["EFECTIVO"]) 
                 col_porc_cump = find_col(["% CUMPLIMIENTO", "CUMPLIMIENTO DE META"])
 
-                month_cols = {} 
-                month_layout = {m: [] for m in self.meses_fijos} 
-                current_m = None
-                
+                # Layout mes -> columna y columnas ACUM, en una sola pasada (memorizado por fila de cabecera)
                 start_month_idx = 7 if len(headers) > 7 else (col_operandos + 2 if col_operandos else 0)
-                for c_idx in range(start_month_idx, len(headers)):
-                    h_name = headers[c_idx]
-                    h_str = str(h_name).replace('\n', ' ').upper().strip()
-                    if h_str in ["NAN", "", "NONE"] or "META" in h_str or "EFECTIVO" in h_str or "CUMPLIMIENTO" in h_str: continue
-                        
-                    if "ACUM" in h_str:
-                        if current_m: month_layout[current_m].append(c_idx)
-                    else:
-                        generic_month = self.extract_month_name(h_name)
-                        if generic_month in self.meses_fijos:
-                            month_cols[generic_month] = c_idx
-                            current_m = generic_month
+                month_cols, month_layout = layout_meses(df.iloc[h_idx].tolist(), start_month_idx, self.meses_fijos)
 
                 sheet_rows = []
                 count_rows = 0
@@ -231,7 +236,7 @@ class IPS_ADP_Parser:
                 def get_v(r_idx, c_idx, default=""):
                     if c_idx is None or r_idx >= len(df): return default
                     val = df.iloc[r_idx, c_idx]
-                    return val if pd.notna(val) else default
+                    return val if not es_nulo(val) else default
 
                 i = h_idx + 1
                 while i < len(df):
@@ -344,101 +349,68 @@ class IPS_ADP_Parser:
 
         self.print_summary_and_exit()
 
-    def _render_estilizada(self, ws, tree_data):
-        styles = {
-            'file': PatternFill("solid", fgColor="000000"),
-            'sheet': PatternFill("solid", fgColor="2F5597"),
-            'head': PatternFill("solid", fgColor="BFBFBF"),
-            'w_font': Font(color="FFFFFF", bold=True),
-            'b_font': Font(bold=True),
-            'border': Border(left=Side('thin'), right=Side('thin'), top=Side('thin'), bottom=Side('thin'))
-        }
-        
+    def _render_estilizada(self, wb, title, tree_data):
         estilizada_keys = [k for k in self.ordered_keys if k not in ["ARCHIVO", "HOJA"]]
-        row_idx = 1
-        FULL_WIDTH = len(estilizada_keys)
-
-        for fname, sheets in tree_data.items():
-            if not any(sheets.values()): continue
-            c = ws.cell(row=row_idx, column=1, value=f"ARCHIVO: {fname}")
-            c.fill = styles['file']; c.font = styles['w_font']; c.alignment = Alignment('center')
-            ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=FULL_WIDTH)
-            row_idx += 1
-            
-            for sname, rows in sheets.items():
-                if not rows: continue
-                c = ws.cell(row=row_idx, column=1, value=f"HOJA: {sname}")
-                c.fill = styles['sheet']; c.font = styles['w_font']
-                ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=FULL_WIDTH)
-                row_idx += 1
-                
-                for c_i, k in enumerate(estilizada_keys, 1):
-                    c = ws.cell(row=row_idx, column=c_i, value=k)
-                    c.fill = styles['head']; c.font = styles['b_font']; c.border = styles['border']
-                row_idx += 1
-                
-                for r in rows:
-                    for c_i, k in enumerate(estilizada_keys, 1):
-                        c = ws.cell(row=row_idx, column=c_i, value=r.get(k, ""))
-                        c.border = styles['border']; c.alignment = Alignment(wrapText=True, vertical='top')
-                    row_idx += 1
-                row_idx += 1
-
-        for i in range(1, FULL_WIDTH + 2): ws.column_dimensions[get_column_letter(i)].width = 22
-
-    def export_excel(self):
-        print(f"\n{'='*60}\nGUARDANDO ARCHIVO: {self.output_file}\n{'='*60}")
-        wb = Workbook()
-        default_sheet = wb.active
+        render_estilizada(wb, title, tree_data, estilizada_keys, marcas=marcas_acumulados("ips_revisar", "ips_derivado"))
+
+    def build_styled_workbook(self):
+        wb = nuevo_libro()
+        self._render_estilizada(wb, "Proyecciones - Estilizada", self.tree_proy)
+        self._render_estilizada(wb, "SIG - Estilizada", self.tree_sig)
+        return wb
+
+    def build_workbook(self):
+        # Escritura fila a fila con el backend más rápido disponible (ips_core.escritores)
+        wb = nuevo_libro()
+        marcas = marcas_acumulados("tabla_revisar", "tabla_derivado")   # acumulados a revisar en naranjo, completados en celeste
         
         # 1. Proyecciones - Bruta
-        ws_proy_bruta = wb.create_sheet("Proyecciones - Bruta")
-        ws_proy_bruta.append(self.ordered_keys)
-        for r in self.flat_data_proy: ws_proy_bruta.append([r.get(k, "") for k in self.ordered_keys])
+        hoja_tabla(wb, "Proyecciones - Bruta", self.ordered_keys, self.flat_data_proy, marcas=marcas)
             
-        # 2. Proyecciones - Estilizada
-        ws_proy_est = wb.create_sheet("Proyecciones - Estilizada")
-        self._render_estilizada(ws_proy_est, self.tree_proy)
+        # 2. Proyecciones - Estilizada (sólo con --estilizada; si no, a pedido con 'render')
+        if self.estilizada: self._render_estilizada(wb, "Proyecciones - Estilizada", self.tree_proy)
         
         # 3. SIG - Bruta
-        ws_sig_bruta = wb.create_sheet("SIG - Bruta")
-        ws_sig_bruta.append(self.ordered_keys)
-        for r in self.flat_data_sig: ws_sig_bruta.append([r.get(k, "") for k in self.ordered_keys])
+        hoja_tabla(wb, "SIG - Bruta", self.ordered_keys, self.flat_data_sig, marcas=marcas)
             
         # 4. SIG - Estilizada
-        ws_sig_est = wb.create_sheet("SIG - Estilizada")
-        self._render_estilizada(ws_sig_est, self.tree_sig)
+        if self.estilizada: self._render_estilizada(wb, "SIG - Estilizada", self.tree_sig)
 
         # 5. SIG_DATOS_VARIABLES (12 Columnas)
-        ws_vars = wb.create_sheet("SIG_DATOS_VARIABLES")
-        headers_vars = [
-            "AÑO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION", 
-            "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL", 
-            "ARCHIVO", "HOJA"
-        ]
-        ws_vars.append(headers_vars)
-        for row in self.variable_data_sig: 
-            ws_vars.append([row.get(k, "") for k in headers_vars])
-            
-        wb.remove(default_sheet)
+        hoja_tabla(wb, "SIG_DATOS_VARIABLES", self.HEADERS_VARS, self.variable_data_sig)
+        return wb
+
+    def export_outputs(self):
+        # Resultado bruto para generar las hojas Estilizada después ('render'), sin re-extraer
+        persistir({a: getattr(self, a) for a in self.ESTADO_BRUTO}, self.output_file)
+        # --format: el xlsx es opcional; parquet/csv/sqlite salen del mismo resultado en memoria
+        if "xlsx" in self.formatos: self.export_excel()
+        otros = [f for f in self.formatos if f != "xlsx"]
+        if otros:
+            tablas = {"Proyecciones - Bruta": tipar(self.flat_data_proy, self.ordered_keys),
+                      "SIG - Bruta": tipar(self.flat_data_sig, self.ordered_keys),
+                      "SIG_DATOS_VARIABLES": tipar(self.variable_data_sig, self.HEADERS_VARS)}
+            exportar_tablas(os.path.splitext(self.output_file)[0], tablas, otros)
+        if self.carga: generar_carga(self.folder_path, self.variable_data_sig, self.carga)
+        if not self.estilizada: print(f"[INFO] Hojas Estilizada a pedido: python {os.path.basename(__file__)} render [--filtro REGION]")
 
-        while True:
-            try:
-                wb.save(self.output_file)
-                print(f"[ÉXITO] Archivo generado: {self.output_file}")
-                break
-            except Exception as e:
-                print(f"\n[ERROR AL GUARDAR] {e}")
-                input("  >> Cierra el archivo si está abierto y presiona Enter para reintentar...")
+    def export_excel(self):
+        print(f"\n{'='*60}\nGUARDANDO ARCHIVO (en segundo plano): {self.output_file}\n{'='*60}")
+        # Temporal + renombrado atómico; si el Excel está abierto se guarda con fecha-hora, sin bloquear
+        return guardar_en_segundo_plano(lambda ruta: self.build_workbook().guardar(ruta), self.output_file)
 
 if __name__ == "__main__":
+    render, carpeta, filtros, estilizada = vistas_de_argv()
+    formatos, carga = formatos_de_argv(), carga_de_argv()
+    decisiones = reglas_de_argv()   # --reglas: sin preguntas por consola
     try:
         print("INICIANDO PROCESADOR MASIVO ADP v1.1.2 (SIG Datos Variables - 12 Cols)")
-        path = input("Ruta de la carpeta (Enter para actual): ").strip() or os.getcwd()
+        path = carpeta or decisiones.carpeta or decisiones.responder("ruta", "Ruta de la carpeta (Enter para actual): ") or os.getcwd()
         if os.path.isdir(path):
-            parser = IPS_ADP_Parser(path)
+            if render: renderizar(IPS_ADP_Parser(path), filtros); sys.exit()
+            parser = IPS_ADP_Parser(path, formatos, carga, estilizada, decisiones)
             parser.process_folder()
         else: print("Ruta inválida.")
     except Exception as e:
         print(f"Error fatal: {e}")
-        input("Enter para salir.")
\ No newline at end of file
+        if decisiones.interactivo: input("Enter para salir.")
\ No newline at end of file
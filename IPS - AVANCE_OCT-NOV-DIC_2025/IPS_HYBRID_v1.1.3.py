@@ -1,24 +1,53 @@
-import pandas as pd
 import os
 import sys
 import glob
 import re
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from openpyxl.utils import get_column_letter
+
+# Librería compartida (carpeta ips_core en la raíz del repositorio)
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+while not os.path.isdir(os.path.join(_RAIZ, "ips_core")) and os.path.dirname(_RAIZ) != _RAIZ:
+    _RAIZ = os.path.dirname(_RAIZ)
+sys.path.insert(0, _RAIZ)
+from ips_core.centros import indice_catalogo
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import hoja_tabla, render_estilizada, guardar_en_segundo_plano
+from ips_core.formatos import formatos_de_argv, tipar, exportar_tablas
+from ips_core.carga_masiva import carga_de_argv, generar_carga
+from ips_core.particiones import particion_de_argv, exportar_particiones
+from ips_core.vistas import vistas_de_argv, persistir, renderizar
+from ips_core.decisiones import Decisiones, reglas_de_argv
+from ips_core.revision import revision_previa
+from ips_core.cola import procesar_en_cola
+from ips_core.reanudacion import PuntoControl
+from ips_core.identificadores import Identificadores
+from ips_core.arranque import perezoso, es_nulo
+
+pd = perezoso("pandas")   # se importa al leer la primera planilla (ips_core.arranque)
 
 # =============================================================================
 # IPS_HYBRID_v1.1.3 - THE LOOP JUMP FIX (PERFECT ROW COUNT)
 # =============================================================================
 
 class IPSParserHybridV113:
-    def __init__(self, folder_path):
+    HEADERS_VARS = ["ANO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION", "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL", "ARCHIVO", "HOJA"]
+    ESTADO_BRUTO = ("data_tree", "flat_data", "variable_data")   # se guarda para 'render'
+    ARBOLES_ESTILIZADOS = ("data_tree",)
+    CONFIGURACION = ("opt_format_percent", "opt_hidden_strategy")   # fijados por configure()
+    MEMORIAS = ("memory_skip", "memory_generate", "memory_skip_empty", "known_segments",
+                "decisions", "file_teams", "identificadores")   # respuestas "siempre", equipos y códigos (punto de control)
+
+    def __init__(self, folder_path, formatos=("xlsx",), particion=None, carga=None, estilizada=False, decisiones=None):
         self.folder_path = folder_path
         self.output_file = os.path.join(folder_path, "IPS_SIG_v1.1.3_OCT-NOV-DIC_2025.xlsx")
         self.data_tree = {} 
         self.flat_data = [] 
         self.variable_data = [] 
-        self.new_indicator_count = 1
+        self.identificadores = Identificadores()   # códigos GEN_ por hash del contenido (ips_core.identificadores)
+        self.formatos = list(formatos)
+        self.particion = particion    # (criterio, solo) -> un libro por EQUIPO/ARCHIVO
+        self.carga = carga            # (desde, hasta, mapa_cr) -> archivo de carga masiva SIG
+        self.estilizada = estilizada  # True: Planilla Estilizada en la misma pasada (si no, comando 'render')
+        self.decisiones = decisiones or Decisiones()   # interactivo, o por reglas (--reglas)
         
         self.opt_format_percent = True
         self.opt_hidden_strategy = 'visible'
@@ -41,50 +70,101 @@ class IPSParserHybridV113:
         print("\n" + "="*60)
         print("   CONFIGURACIÓN MAESTRA v1.1.3 (CORRECCIÓN DE BUCLE)")
         print("="*60)
-        resp_p = input("1. ¿Transformar porcentajes (0.2 -> 20)? [S/N] (Enter=Si): ").lower().strip()
+        resp_p = self.decisiones.responder("porcentajes", "1. ¿Transformar porcentajes (0.2 -> 20)? [S/N] (Enter=Si): ").lower()
         self.opt_format_percent = (resp_p != 'n')
         print("\n2. ¿Cómo manejar filas OCULTAS?")
         print("   [v] Automático: Procesar SOLO VISIBLES (Recomendado).")
         print("   [t] Automático: Procesar TODO.")
         print("   [i] Interactivo: Preguntar caso a caso.")
-        resp_h = input("   >> Elija opción (Enter=v): ").lower().strip()
+        resp_h = self.decisiones.responder("ocultos", "   >> Elija opción (Enter=v): ").lower()
         if resp_h == 't': self.opt_hidden_strategy = 'all'
         elif resp_h == 'i': self.opt_hidden_strategy = 'interactive'
         else: self.opt_hidden_strategy = 'visible'
         print("-" * 60)
 
     # --- INTERACCIÓN ---
-    def ask_segment_confirmation(self, text, context):
-        if self.file_auto.get("segment_always_yes"): return True
+    def ask_segment_batch(self, candidates, context):
+        """Confirma en un solo paso los textos candidatos a SEGMENTO de una hoja. candidates: {texto: [filas]}"""
+        textos = list(candidates)
+        if self.file_auto.get("segment_always_yes"): return set(textos)
         print(f"\n[ATENCIÓN] {context}")
-        print(f"   Texto '{text}'. ¿Es un SEGMENTO?")
-        print("   [s] Si")
-        print("   [n] No")
-        print("   [a] Si a todo en este archivo (Automático)")
-        while True:
-            resp = input("   >> Elija: ").lower().strip()
-            if resp == 's': return True
-            if resp == 'n': return False
-            if resp == 'a':
-                self.file_auto["segment_always_yes"] = True
-                return True
-
-    def ask_id_extraction(self, extracted_id, context):
+        print(f"   {len(textos)} texto(s) podrían ser SEGMENTOS (agrupaciones tipo Hombres/Mujeres):")
+        for n, t in enumerate(textos, 1):
+            filas = ", ".join(str(r + 1) for r in candidates[t][:5])
+            print(f"   [{n}] '{t}'  (Fila {filas}{', ...' if len(candidates[t]) > 5 else ''})")
+        print("   [s] Todos son segmentos")
+        print("   [n] Ninguno")
+        print("   [a] Todos, y Si a todo en este archivo (Automático)")
+        print("   [1,3..] Sólo los números indicados")
+        numeros = lambda r: [x.strip() for x in r.split(",") if x.strip()]
+        valida = lambda r: r in ("s", "n", "a") or bool(numeros(r)) and all(x.isdigit() and 1 <= int(x) <= len(textos) for x in numeros(r))
+        resp = self.decisiones.responder("segmento", "   >> Elija: ", valida, texto=" | ".join(textos))
+        if resp == 's': return set(textos)
+        if resp == 'n': return set()
+        if resp == 'a':
+            self.file_auto["segment_always_yes"] = True
+            return set(textos)
+        return {textos[int(x) - 1] for x in numeros(resp)}
+
+    def is_segment_candidate(self, text):
+        # Texto corto de columna A sin dígitos (ej. 'Hombres', 'Total País')
+        return (len(text) > 2 and len(text) < 30 and not any(c.isdigit() for c in text)
+                and "INDICADOR" not in text.upper() and text.upper() != "NAN")
+
+    @staticmethod
+    def find_col(headers, names):
+        # Primera columna cuyo encabezado contiene alguno de 'names' (sin distinguir mayúsculas)
+        for i, h in enumerate(headers):
+            if any(n.lower() in str(h).lower() for n in names): return i
+        return None
+
+    def scan_segments(self, df, header_indices, ignored_rows, file_name, sheet):
+        """
+        Pre-pasada por hoja: clasifica todas las filas candidatas a SEGMENTO antes de extraer.
+        Devuelve {fila: segmento}. Usa known_segments (y lo aprendido en hojas anteriores) y
+        pregunta los candidatos desconocidos de una sola vez. Lo aceptado se recuerda; lo
+        rechazado vale sólo para esta hoja (como el "No" de antes, que era por fila).
+        """
+        cands = {}   # fila -> texto
+        for loop_idx, h_idx in enumerate(header_indices):
+            end_idx = header_indices[loop_idx + 1] if loop_idx + 1 < len(header_indices) else len(df)
+            if h_idx > 0:
+                prev = df.iloc[h_idx - 1].dropna()
+                if len(prev) == 1:
+                    cand = str(prev.iloc[0]).strip()
+                    if len(cand) < 60: cands[h_idx - 1] = cand
+
+            col_num = self.find_col([str(h).strip() for h in df.iloc[h_idx]], ["NÚMERO", "NUMERO", "N°"])
+            if col_num is None or col_num == 0:
+                for i in range(h_idx + 1, end_idx):
+                    if i in ignored_rows: continue
+                    possible_seg = str(df.iloc[i, 0]).strip()
+                    if self.is_segment_candidate(possible_seg): cands[i] = possible_seg
+
+        desconocidos = {}
+        for r, t in cands.items():
+            if t.upper() not in self.known_segments: desconocidos.setdefault(t, []).append(r)
+        if desconocidos:
+            aceptados = self.ask_segment_batch(desconocidos, f"[{file_name}] > [{sheet}]")
+            self.known_segments.update(t.upper() for t in aceptados)
+
+        return {r: t for r, t in cands.items() if t.upper() in self.known_segments}
+
+    def ask_id_extraction(self, extracted_id, context, fila=None):
         if self.decisions.get("use_embedded_id") is not None: return self.decisions["use_embedded_id"]
         print(f"\n[DECISIÓN DE ID] {context}")
         print(f"   No hay columna Número, pero encontré '{extracted_id}' en el texto/columna A.")
         print("   [s]  Usar este código.")
         print("   [a]  Usar SIEMPRE códigos detectados (Global).")
         print("   [n]  No usar.")
-        while True:
-            choice = input("   >> Elija: ").lower().strip()
-            if choice == 's': return True
-            if choice == 'a': 
-                self.decisions["use_embedded_id"] = True
-                return True
-            if choice == 'n': return False
-
-    def ask_missing_id_strategy(self, prev_id, context, row_text_preview):
+        choice = self.decisiones.responder("id_embebido", "   >> Elija: ", ["s", "a", "n"], fila=fila, texto=extracted_id)
+        if choice == 's': return True
+        if choice == 'a': 
+            self.decisions["use_embedded_id"] = True
+            return True
+        if choice == 'n': return False
+
+    def ask_missing_id_strategy(self, prev_id, context, row_text_preview, fila=None):
         if self.file_auto.get("missing_id_strat"): return self.file_auto["missing_id_strat"]
         print(f"\n[DECISIÓN ID FALTANTE] {context}")
         print(f"   Texto fila: '{row_text_preview}...'")
@@ -94,13 +174,12 @@ class IPSParserHybridV113:
         print(f"   [p]   Usar el ID anterior: '{prev_id}'.")
         print(f"   [pa]  Usar SIEMPRE el anterior en este archivo.")
         print(f"   [n]   Generar código NUEVO único (GEN_X).")
-        while True:
-            choice = input("   >> Elija: ").lower().strip()
-            if choice == 's': return 'skip'
-            if choice == 'sa': self.file_auto["missing_id_strat"] = 'skip'; return 'skip'
-            if choice == 'p': return 'prev'
-            if choice == 'pa': self.file_auto["missing_id_strat"] = 'prev'; return 'prev'
-            if choice == 'n': return 'new'
+        choice = self.decisiones.responder("id_faltante", "   >> Elija: ", ["s", "sa", "p", "pa", "n"], fila=fila, texto=row_text_preview)
+        if choice == 's': return 'skip'
+        if choice == 'sa': self.file_auto["missing_id_strat"] = 'skip'; return 'skip'
+        if choice == 'p': return 'prev'
+        if choice == 'pa': self.file_auto["missing_id_strat"] = 'prev'; return 'prev'
+        if choice == 'n': return 'new'
 
     def ask_column_action(self, missing_cols, context):
         if self.file_auto.get("missing_col_continue"): return 'continue'
@@ -110,14 +189,13 @@ class IPSParserHybridV113:
         print("   [ca] Continuar SIEMPRE en este archivo")
         print("   [s]  Saltar hoja")
         print("   [d]  Detener")
-        while True:
-            choice = input("   >> Elija: ").lower().strip()
-            if choice == 'c': return 'continue'
-            if choice == 'ca': self.file_auto["missing_col_continue"] = True; return 'continue'
-            if choice == 's': return 'skip_sheet'
-            if choice == 'd': self.export_excel(); sys.exit()
-
-    def ask_weird_row_action(self, content, context):
+        choice = self.decisiones.responder("columnas", "   >> Elija: ", ["c", "ca", "s", "d"], texto=missing_cols)
+        if choice == 'c': return 'continue'
+        if choice == 'ca': self.file_auto["missing_col_continue"] = True; return 'continue'
+        if choice == 's': return 'skip_sheet'
+        if choice == 'd': self.decisiones.informe(self.output_file); self.export_excel(); sys.exit()
+
+    def ask_weird_row_action(self, content, context, fila=None):
         clean = str(content).strip().upper()
         if clean in self.memory_skip: return 'skip'
         if "NUEVO" in clean and self.memory_generate: return 'auto'
@@ -126,18 +204,18 @@ class IPSParserHybridV113:
         print(f"\n[FILA RARA] {context}")
         print(f"   Contenido NÚMERO: '{content}'")
         print("   [c] Procesar  [s] Saltar  [x] Saltar Siempre  [d] Detener")
-        while True:
-            choice = input("   >> Elija: ").lower().strip()
-            if choice == 'c': return 'auto'
-            if choice == 's': return 'skip'
-            if choice == 'x':
-                if content == "[VACÍO]": self.memory_skip_empty = True
-                else: self.memory_skip.add(clean)
-                return 'skip'
-            if choice == 'd': self.export_excel(); sys.exit()
+        choice = self.decisiones.responder("fila_rara", "   >> Elija: ", ["c", "s", "x", "d"], fila=fila, texto=content)
+        if choice == 'c': return 'auto'
+        if choice == 's': return 'skip'
+        if choice == 'x':
+            if content == "[VACÍO]": self.memory_skip_empty = True
+            else: self.memory_skip.add(clean)
+            return 'skip'
+        if choice == 'd': self.decisiones.informe(self.output_file); self.export_excel(); sys.exit()
 
     def get_hidden_rows(self, file_path, sheet_name):
         try:
+            from openpyxl import load_workbook
             wb = load_workbook(file_path, read_only=False, data_only=True)
             if sheet_name not in wb.sheetnames: return set()
             ws = wb[sheet_name]
@@ -150,7 +228,7 @@ class IPSParserHybridV113:
 
     # --- UTILIDADES ---
     def analyze_formula(self, formula_raw):
-        if pd.isna(formula_raw) or str(formula_raw).strip() == "": return "", "Sin Fórmula"
+        if es_nulo(formula_raw) or str(formula_raw).strip() == "": return "", "Sin Fórmula"
         f_clean = str(formula_raw).replace("\n", " ").strip()
         match = re.search(r'(\s*\*\s*100)\s*$', f_clean)
         suffix, core, f_type = "", f_clean, "CUOCIENTE"
@@ -160,7 +238,7 @@ class IPSParserHybridV113:
         return core + suffix, f_type
 
     def parse_indicator_text(self, text):
-        if pd.isna(text) or str(text).strip() == "": return "", "No identificado", "No identificado"
+        if es_nulo(text) or str(text).strip() == "": return "", "No identificado", "No identificado"
         text_str = str(text).strip(); lines = text_str.split('\n'); first_line = lines[0].strip()
         match = re.search(r'^[\d\)\.\-\s]*([^/]+)/(.+)', first_line)
         clean_text, dim, amb = text_str, "No identificado", "No identificado"
@@ -172,7 +250,7 @@ class IPSParserHybridV113:
 
     def transform_percentage(self, val):
         if not self.opt_format_percent: return val
-        if pd.isna(val) or val == "" or val == "No aplica": return val
+        if es_nulo(val) or val == "" or val == "No aplica": return val
         if "Valor" in str(val) or "Operando" in str(val): return "" 
         try:
             clean = str(val).replace(",", ".")
@@ -183,7 +261,7 @@ class IPSParserHybridV113:
 
     def determine_team(self, df, file_name, sheet_name):
         if file_name in self.file_teams: return self.file_teams[file_name]
-        candidate = None
+        candidate, cands = None, []
         limit_row = 20; limit_col = min(15, len(df.columns))
         for r in range(min(limit_row, len(df))):
             for c in range(limit_col):
@@ -204,13 +282,21 @@ class IPSParserHybridV113:
                     val = str(df.iloc[r_idx, c_idx]).strip()
                     if len(val) > 3 and val.upper() != "NAN" and "INDICADOR" not in val.upper():
                         candidate = val; break
+        if not candidate or candidate.upper() in ["NO APLICA", "NAN"]:
+            # Último recurso antes de preguntar: similitud del nombre de archivo con el catálogo oficial
+            suggested, cands = indice_catalogo().resolver(os.path.splitext(file_name)[0])
+            if suggested:
+                print(f"   [AUTO] Equipo por similitud con el archivo: '{suggested}'")
+                candidate = suggested
         if not candidate or candidate.upper() in ["NO APLICA", "NAN"]:
             print(f"\n[DECISIÓN MANUAL] Equipo no detectado en: {file_name}")
-            print(f"   Hoja: {sheet_name}"); print("   [m] Manual  [n] No aplica")
-            while True:
-                c = input("   >> ").lower().strip()
-                if c == 'm': candidate = input("   >> Nombre: ").strip(); break
-                if c == 'n': candidate = "No aplica"; break
+            print(f"   Hoja: {sheet_name}")
+            for i, (name, _, score) in enumerate(cands, 1): print(f"   [{i}] Candidato: '{name}' ({score:.0%})")
+            print("   [m] Manual  [n] No aplica")
+            c = self.decisiones.responder("equipo", "   >> ", [str(i) for i in range(1, len(cands) + 1)] + ["m", "n"])
+            if c.isdigit(): candidate = cands[int(c) - 1][0]
+            if c == 'm': candidate = self.decisiones.responder("equipo_manual", "   >> Nombre: ")
+            if c == 'n': candidate = "No aplica"
         self.file_teams[file_name] = candidate
         return candidate
 
@@ -226,7 +312,7 @@ class IPSParserHybridV113:
             t = start_row + offset
             if t >= len(df): continue 
             if t in ignored_rows: continue
-            row_str = "".join([str(x).upper() for x in df.iloc[t].values if pd.notna(x)])
+            row_str = "".join([str(x).upper() for x in df.iloc[t].values if not es_nulo(x)])
             
             if re.search(r'OPERANDO\s*1\s*=', row_str): off1 = offset + 1
             if re.search(r'OPERANDO\s*2\s*=', row_str): off2 = offset + 1
@@ -245,216 +331,215 @@ class IPSParserHybridV113:
         return off1, off2
 
     def process_folder(self):
-        files = glob.glob(os.path.join(self.folder_path, "*.xlsx")) + glob.glob(os.path.join(self.folder_path, "*.xls"))
-        valid_files = [f for f in files if "IPS_CONSOLIDADO" not in f and not os.path.basename(f).startswith("~$")]
+        # Ordenados por nombre: el orden de glob depende del sistema de archivos (y 'shard'/'merge' deben repetirlo)
+        files = sorted(glob.glob(os.path.join(self.folder_path, "*.xlsx")) + glob.glob(os.path.join(self.folder_path, "*.xls")), key=os.path.basename)
+        propios = os.path.splitext(os.path.basename(self.output_file))[0]   # salida y sus vistas _ESTILIZADA
+        valid_files = [f for f in files if "IPS_CONSOLIDADO" not in f and not os.path.basename(f).startswith(("~$", propios)) and "carga masiva" not in os.path.basename(f)]
         if not valid_files: print("[ERROR] No hay archivos."); sys.exit()
-        self.configure()
+        self.decisiones.abrir_diario(self.output_file)   # respuestas anteriores por archivo/hoja/fila
+        punto = PuntoControl(self)   # un registro por archivo terminado
+        hechos = punto.reanudar(valid_files) if self.decisiones.reanudar else 0   # --resume: sigue desde el primero sin terminar
+        if not hechos:
+            self.configure()
+            punto.iniciar()
+        revision_previa(self, valid_files[hechos:])   # --revision-previa: preguntas agrupadas antes de extraer
         
-        for idx_file, file_path in enumerate(valid_files):
-            file_name = os.path.basename(file_path)
-            self.data_tree[file_name] = {}
-            self.file_auto = {} 
-            print(f"\n>>> PROCESANDO ({idx_file + 1}/{len(valid_files)}): {file_name}")
+        if self.decisiones.cola: procesar_en_cola(self, valid_files[hechos:], anotar=punto.anotar)   # --cola: una pregunta no detiene a los demás archivos
+        else:
+            for idx_file in range(hechos, len(valid_files)):
+                self.process_file(valid_files[idx_file], idx_file, len(valid_files))
+                punto.anotar(valid_files[idx_file])
+
+        self.decisiones.informe(self.output_file)
+        self.export_outputs()
+
+    def process_file(self, file_path, idx_file=0, total=1):
+        # Extrae un archivo completo (todas sus hojas) hacia data_tree / flat_data / variable_data
+        file_name = os.path.basename(file_path)
+        self.data_tree[file_name] = {}
+        self.file_auto = {} 
+        print(f"\n>>> PROCESANDO ({idx_file + 1}/{total}): {file_name}")
             
-            try: xls = pd.ExcelFile(file_path)
-            except Exception as e: print(f" [ERROR] Corrupto: {e}"); continue
-
-            for sheet in xls.sheet_names:
-                hidden_rows = self.get_hidden_rows(file_path, sheet)
-                ignored_rows = set()
-                if hidden_rows:
-                    if self.opt_hidden_strategy == 'interactive':
-                        action = self.ask_hidden_interactive(len(hidden_rows), sheet)
-                        if action == 'skip': continue
-                        if action == 'visible': ignored_rows = hidden_rows
-                    elif self.opt_hidden_strategy == 'visible': ignored_rows = hidden_rows
-
-                try: df = pd.read_excel(file_path, sheet_name=sheet, header=None)
-                except: continue
+        try: xls = pd.ExcelFile(file_path)
+        except Exception as e: print(f" [ERROR] Corrupto: {e}"); return
+
+        for sheet in xls.sheet_names:
+            self.decisiones.contexto(file_name, sheet, file_path)
+            hidden_rows = self.get_hidden_rows(file_path, sheet)
+            ignored_rows = set()
+            if hidden_rows:
+                if self.opt_hidden_strategy == 'interactive':
+                    action = self.ask_hidden_interactive(len(hidden_rows), sheet)
+                    if action == 'skip': continue
+                    if action == 'visible': ignored_rows = hidden_rows
+                elif self.opt_hidden_strategy == 'visible': ignored_rows = hidden_rows
+
+            try: df = pd.read_excel(file_path, sheet_name=sheet, header=None)
+            except: continue
                 
-                global_center = self.determine_team(df, file_name, sheet)
-                if global_center is None: continue
-
-                header_indices = []
-                for idx, row in df.iterrows():
-                    if idx in ignored_rows: continue
-                    vals = [str(x).upper().strip() for x in row.values if pd.notna(x)]
-                    if "INDICADOR" in vals and ("FORMULA" in vals or "FÓRMULA" in vals): header_indices.append(idx)
-                    elif "NÚMERO" in vals and "INDICADOR" in vals: 
-                        if idx not in header_indices: header_indices.append(idx)
+            global_center = self.determine_team(df, file_name, sheet)
+            if global_center is None: continue
+
+            header_indices = []
+            for idx, row in df.iterrows():
+                if idx in ignored_rows: continue
+                vals = [str(x).upper().strip() for x in row.values if not es_nulo(x)]
+                if "INDICADOR" in vals and ("FORMULA" in vals or "FÓRMULA" in vals): header_indices.append(idx)
+                elif "NÚMERO" in vals and "INDICADOR" in vals: 
+                    if idx not in header_indices: header_indices.append(idx)
                 
-                sheet_rows = []
-                last_valid_id = "N/A"
+            sheet_rows = []
+            last_valid_id = "N/A"
                 
-                # --- NUEVO: Set para recordar filas ya procesadas como parte de un indicador (datos/operandos)
-                processed_rows = set(ignored_rows)
-
-                for loop_idx, h_idx in enumerate(header_indices):
-                    end_idx = header_indices[loop_idx + 1] if loop_idx + 1 < len(header_indices) else len(df)
-                    current_segment = "GENERAL"
-                    if h_idx > 0:
-                        prev = df.iloc[h_idx - 1].dropna()
-                        if len(prev) == 1:
-                            cand = str(prev.iloc[0]).strip()
-                            if len(cand) < 60:
-                                ctx = f"[{file_name}] > [{sheet}]"
-                                if cand.upper() in self.known_segments: current_segment = cand
-                                else:
-                                    if self.ask_segment_confirmation(cand, ctx): 
-                                        current_segment = cand
-                                        self.known_segments.add(cand.upper())
-
-                    headers = [str(h).strip() for h in df.iloc[h_idx]]
-                    def fc(names):
-                        for i, h in enumerate(headers):
-                            if any(n.lower() in str(h).lower() for n in names): return i
-                        return None
-
-                    col_num = fc(["NÚMERO", "NUMERO", "N°"])
-                    col_ind = fc(["INDICADOR"])
-                    if col_num is None:
-                        ctx = f"[{file_name}] > [{sheet}]"
-                        action = self.ask_column_action("NÚMERO", ctx)
-                        if action == 'skip_sheet': break
-                        if action == 'continue': pass 
-
-                    c_map = {
-                        "num": col_num, "prod": fc(["PRODUCTO"]), "ind": col_ind, "form": fc(["FORMULA"]),
-                        "uni": fc(["UNIDAD"]), "resp": fc(["RESPONSABLE"]), "gest": fc(["GESTOR"]),
-                        "sup": fc(["SUPERVISORES"]), "meta": fc(["Meta 2025", "Meta 2026", "Meta"]),
-                        "pond": fc(["Ponderador"]), "op_desc": fc(["Operandos"]), 
-                        "op_est": fc(["Operandos Estimados", "Estimados Meta"]),
-                        "proy": fc(["Cumplimiento Proyectado", "Proyectado"]), "cump_meta": fc(["% Cumplimiento"]),
-                        "medios": fc(["Medios"]), "control": fc(["Control"]), "inst": fc(["Instrumentos"])
-                    }
-                    months_list = ["Ene.", "Feb.", "Acum Feb.", "Mar.", "Acum Mar.", "Abr.", "Acum Abr.", 
-                                   "May.", "Acum May.", "Jun.", "Acum Jun.", "Jul.", "Acum Jul.", "Ago.", 
-                                   "Acum Ago", "Sept.", "Acum Sept", "Oct.", "Acum Oct.", "Nov.", "Acum Nov.", "Dic."]
-                    m_map = {m: fc([m]) for m in months_list}
-                    c_map.update(m_map)
-
-                    for i in range(h_idx + 1, end_idx):
-                        # --- FIX: Si esta fila ya se procesó como operando o dato, SALTARLA
-                        if i in processed_rows: continue
+            # --- NUEVO: Set para recordar filas ya procesadas como parte de un indicador (datos/operandos)
+            processed_rows = set(ignored_rows)
+            segment_map = self.scan_segments(df, header_indices, ignored_rows, file_name, sheet)
+
+            for loop_idx, h_idx in enumerate(header_indices):
+                end_idx = header_indices[loop_idx + 1] if loop_idx + 1 < len(header_indices) else len(df)
+                current_segment = segment_map.get(h_idx - 1, "GENERAL") if h_idx > 0 else "GENERAL"
+
+                headers = [str(h).strip() for h in df.iloc[h_idx]]
+                def fc(names): return self.find_col(headers, names)
+
+                col_num = fc(["NÚMERO", "NUMERO", "N°"])
+                col_ind = fc(["INDICADOR"])
+                if col_num is None:
+                    ctx = f"[{file_name}] > [{sheet}]"
+                    action = self.ask_column_action("NÚMERO", ctx)
+                    if action == 'skip_sheet': break
+                    if action == 'continue': pass 
+
+                c_map = {
+                    "num": col_num, "prod": fc(["PRODUCTO"]), "ind": col_ind, "form": fc(["FORMULA"]),
+                    "uni": fc(["UNIDAD"]), "resp": fc(["RESPONSABLE"]), "gest": fc(["GESTOR"]),
+                    "sup": fc(["SUPERVISORES"]), "meta": fc(["Meta 2025", "Meta 2026", "Meta"]),
+                    "pond": fc(["Ponderador"]), "op_desc": fc(["Operandos"]), 
+                    "op_est": fc(["Operandos Estimados", "Estimados Meta"]),
+                    "proy": fc(["Cumplimiento Proyectado", "Proyectado"]), "cump_meta": fc(["% Cumplimiento"]),
+                    "medios": fc(["Medios"]), "control": fc(["Control"]), "inst": fc(["Instrumentos"])
+                }
+                months_list = ["Ene.", "Feb.", "Acum Feb.", "Mar.", "Acum Mar.", "Abr.", "Acum Abr.", 
+                               "May.", "Acum May.", "Jun.", "Acum Jun.", "Jul.", "Acum Jul.", "Ago.", 
+                               "Acum Ago", "Sept.", "Acum Sept", "Oct.", "Acum Oct.", "Nov.", "Acum Nov.", "Dic."]
+                m_map = {m: fc([m]) for m in months_list}
+                c_map.update(m_map)
+
+                for i in range(h_idx + 1, end_idx):
+                    # --- FIX: Si esta fila ya se procesó como operando o dato, SALTARLA
+                    if i in processed_rows: continue
                         
-                        ctx = f"[{file_name}] > [{sheet}] > Fila {i+1}"
-                        # 1. SEGMENTO
-                        if c_map["num"] is None or c_map["num"] == 0:
-                            possible_seg = str(df.iloc[i, 0]).strip()
-                            if len(possible_seg) > 2 and len(possible_seg) < 30 and not any(c.isdigit() for c in possible_seg) and "INDICADOR" not in possible_seg.upper() and possible_seg != "" and possible_seg.upper() != "NAN":
-                                if possible_seg.upper() in self.known_segments:
-                                    current_segment = possible_seg; continue
-                                if self.ask_segment_confirmation(possible_seg, ctx):
-                                    current_segment = possible_seg
-                                    self.known_segments.add(possible_seg.upper()); continue
-
-                        raw_num = str(df.iloc[i, c_map["num"]]).strip() if c_map["num"] is not None else ""
+                    ctx = f"[{file_name}] > [{sheet}] > Fila {i+1}"
+                    # 1. SEGMENTO (clasificado en la pre-pasada)
+                    if (c_map["num"] is None or c_map["num"] == 0) and i in segment_map:
+                        current_segment = segment_map[i]; continue
+
+                    raw_num = str(df.iloc[i, c_map["num"]]).strip() if c_map["num"] is not None else ""
                         
-                        # 2. EXTRACCIÓN INTELIGENTE
-                        if not raw_num or raw_num.lower() == "nan":
-                            if c_map["num"] is None:
-                                col0_val = str(df.iloc[i, 0]).strip()
-                                match0 = re.search(r'^(\d+(?:\.\d+)+)', col0_val)
-                                if match0: raw_num = match0.group(1)
+                    # 2. EXTRACCIÓN INTELIGENTE
+                    if not raw_num or raw_num.lower() == "nan":
+                        if c_map["num"] is None:
+                            col0_val = str(df.iloc[i, 0]).strip()
+                            match0 = re.search(r'^(\d+(?:\.\d+)+)', col0_val)
+                            if match0: raw_num = match0.group(1)
                             
-                            if not raw_num or raw_num.lower() == "nan":
-                                ind_content = str(df.iloc[i, c_map["ind"]]).strip() if c_map["ind"] is not None else ""
-                                if len(ind_content) > 5:
-                                    match = re.search(r'(?:^|[\s\n])(\d+\.\d+\.\d+(?:\.\d+)*)', ind_content)
-                                    if match:
-                                        found_id = match.group(1)
-                                        if self.ask_id_extraction(found_id, ctx): raw_num = found_id
+                        if not raw_num or raw_num.lower() == "nan":
+                            ind_content = str(df.iloc[i, c_map["ind"]]).strip() if c_map["ind"] is not None else ""
+                            if len(ind_content) > 5:
+                                match = re.search(r'(?:^|[\s\n])(\d+\.\d+\.\d+(?:\.\d+)*)', ind_content)
+                                if match:
+                                    found_id = match.group(1)
+                                    if self.ask_id_extraction(found_id, ctx, i + 1): raw_num = found_id
                             
-                            if not raw_num or raw_num.lower() == "nan":
-                                ind_content = str(df.iloc[i, c_map["ind"]]).strip() if c_map["ind"] is not None else ""
-                                if len(ind_content) > 5:
-                                    strat = self.ask_missing_id_strategy(last_valid_id, ctx, ind_content[:50])
-                                    if strat == 'skip': continue 
-                                    if strat == 'prev': raw_num = last_valid_id
-                                    else: 
-                                        raw_num = f"GEN_{self.new_indicator_count}"; self.new_indicator_count += 1
-                                else: continue
-
-                        if not raw_num or raw_num.lower() == "nan": continue
-                        if raw_num.upper() in self.blacklist_auto or "VALOR" in raw_num.upper(): continue
-
-                        if not (re.match(r'^\d', raw_num) or "NUEVO" in raw_num.upper() or "GEN" in raw_num.upper() or "S/N" in raw_num.upper()):
-                            action = self.ask_weird_row_action(raw_num, ctx)
-                            if action == 'skip': continue
-                            if action == 'auto': 
-                                raw_num = f"GEN_{self.new_indicator_count}"; self.new_indicator_count += 1
-
-                        last_valid_id = raw_num
-
-                        check_c = c_map["meta"] if c_map["meta"] else (m_map["Oct."] if m_map["Oct."] else None)
-                        idx_ind_data = self.get_real_data_row_index(df, i)
+                        if not raw_num or raw_num.lower() == "nan":
+                            ind_content = str(df.iloc[i, c_map["ind"]]).strip() if c_map["ind"] is not None else ""
+                            if len(ind_content) > 5:
+                                strat = self.ask_missing_id_strategy(last_valid_id, ctx, ind_content[:50], i + 1)
+                                if strat == 'skip': continue 
+                                if strat == 'prev': raw_num = last_valid_id
+                                else: 
+                                    raw_num = self.identificadores.nuevo("GEN", file_name, sheet, ind_content)
+                            else: continue
+
+                    if not raw_num or raw_num.lower() == "nan": continue
+                    if raw_num.upper() in self.blacklist_auto or "VALOR" in raw_num.upper(): continue
+
+                    if not (re.match(r'^\d', raw_num) or "NUEVO" in raw_num.upper() or "GEN" in raw_num.upper() or "S/N" in raw_num.upper()):
+                        action = self.ask_weird_row_action(raw_num, ctx, i + 1)
+                        if action == 'skip': continue
+                        if action == 'auto': 
+                            ind_content = str(df.iloc[i, c_map["ind"]]).strip() if c_map["ind"] is not None else ""
+                            raw_num = self.identificadores.nuevo("GEN", file_name, sheet, ind_content)
+
+                    last_valid_id = raw_num
+
+                    check_c = c_map["meta"] if c_map["meta"] else (m_map["Oct."] if m_map["Oct."] else None)
+                    idx_ind_data = self.get_real_data_row_index(df, i)
                         
-                        rows_to_ignore = set(processed_rows); rows_to_ignore.add(idx_ind_data)
-                        off1, off2 = self.find_operand_offsets(df, i, rows_to_ignore)
-                        idx_op1 = (i + off1) if off1 else idx_ind_data 
-                        idx_op2 = (i + off2) if off2 else idx_ind_data
-
-                        # --- FIX BUCLE: Añadir todas las filas de este indicador al set para no reprocesarlas ---
-                        max_row_for_this_ind = max(i, idx_ind_data, idx_op1, idx_op2)
-                        for r_done in range(i, max_row_for_this_ind + 1):
-                            processed_rows.add(r_done)
-
-                        def gd(r_idx, c_idx):
-                            if c_idx is None or r_idx >= len(df): return ""
-                            val = df.iloc[r_idx, c_idx]
-                            return val if pd.notna(val) else ""
-
-                        row_data = {
-                            "ARCHIVO": file_name, "HOJA": sheet, "EQUIPO": global_center, "SEGMENTO": current_segment,
-                            "TIPO INDICADOR": "CDC" if "CDC" in sheet.upper() else "PMG",
-                            "NÚMERO": raw_num,
-                            "PRODUCTO O PROCESO ESPECÍFICO": gd(i, c_map["prod"]),
-                            "INDICADOR": self.parse_indicator_text(gd(i, c_map["ind"]))[0],
-                            "DIMENSIÓN": self.parse_indicator_text(gd(i, c_map["ind"]))[1],
-                            "ÁMBITO": self.parse_indicator_text(gd(i, c_map["ind"]))[2],
-                            "FORMULA": self.analyze_formula(gd(i, c_map["form"]))[0],
-                            "TIPO FORMULA": self.analyze_formula(gd(i, c_map["form"]))[1],
-                            "UNIDAD": gd(i, c_map["uni"]), "RESPONSABLE": gd(i, c_map["resp"]),
-                            "GESTOR": gd(i, c_map["gest"]), "SUPERVISORES": gd(i, c_map["sup"]),
-                            "Operandos estimados Meta(Valor indicador)": self.transform_percentage(gd(idx_ind_data, c_map["meta"])),
-                            "Ponderador": self.transform_percentage(gd(idx_ind_data, c_map["pond"])),
-                            "Descripción Operando 1": gd(i, c_map["op_desc"]),
-                            "Descripción Operando 2": gd(idx_op1, c_map["op_desc"]),
-                            "Operando 1 estimado Meta": gd(idx_op1, c_map["op_est"]),
-                            "Operando 2 estimado Meta": gd(idx_op2, c_map["op_est"]),
-                            "Cumplimiento Proyectado 2026 Op 1": gd(idx_op1, c_map["proy"]),
-                            "Cumplimiento Proyectado 2026 Op 2": gd(idx_op2, c_map["proy"]),
-                            "% Cumplimiento de Meta": self.transform_percentage(gd(idx_op1, c_map["cump_meta"])),
-                            "Medios de Verificación": gd(idx_ind_data, c_map["medios"]),
-                            "Control de Cambios": gd(idx_ind_data, c_map["control"]),
-                            "Instrumentos de Gestión Asociados": gd(idx_ind_data, c_map["inst"])
-                        }
-                        for m_key, m_col in m_map.items():
-                            row_data[f"{m_key} Op 1"] = gd(idx_op1, m_col)
-                            row_data[f"{m_key} Op 2"] = gd(idx_op2, m_col)
-                        self.flat_data.append(row_data)
-                        sheet_rows.append(row_data)
-
-                        meses_v = [(10, "Oct."), (11, "Nov."), (12, "Dic.")]
-                        for m_num, m_txt in meses_v:
-                            col_m = m_map.get(m_txt)
-                            v1_raw = gd(idx_op1, col_m) if col_m is not None else ""
-                            if "VALOR" in str(v1_raw).upper() or "OPERANDO" in str(v1_raw).upper(): v1_raw = ""
-                            self.variable_data.append({
-                                "ANO": 2025, "MES": m_num, "VARIABLE_COD": f"{raw_num}_A",
-                                "CENTRO_RESP_COD": global_center, "COD_REGION": 0, "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "", "VALOR_TOTAL": v1_raw, "ARCHIVO": file_name, "HOJA": sheet
-                            })
-                            v2_raw = gd(idx_op2, col_m) if col_m is not None else ""
-                            if "VALOR" in str(v2_raw).upper() or "OPERANDO" in str(v2_raw).upper(): v2_raw = ""
-                            self.variable_data.append({
-                                "ANO": 2025, "MES": m_num, "VARIABLE_COD": f"{raw_num}_B",
-                                "CENTRO_RESP_COD": global_center, "COD_REGION": 0, "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "", "VALOR_TOTAL": v2_raw, "ARCHIVO": file_name, "HOJA": sheet
-                            })
-
-                self.data_tree[file_name][sheet] = sheet_rows
-                print(f"   -> {len(sheet_rows)} indicadores extraídos.")
-
-        self.export_excel()
+                    rows_to_ignore = set(processed_rows); rows_to_ignore.add(idx_ind_data)
+                    off1, off2 = self.find_operand_offsets(df, i, rows_to_ignore)
+                    idx_op1 = (i + off1) if off1 else idx_ind_data 
+                    idx_op2 = (i + off2) if off2 else idx_ind_data
+
+                    # --- FIX BUCLE: Añadir todas las filas de este indicador al set para no reprocesarlas ---
+                    max_row_for_this_ind = max(i, idx_ind_data, idx_op1, idx_op2)
+                    for r_done in range(i, max_row_for_this_ind + 1):
+                        processed_rows.add(r_done)
+
+                    def gd(r_idx, c_idx):
+                        if c_idx is None or r_idx >= len(df): return ""
+                        val = df.iloc[r_idx, c_idx]
+                        return val if not es_nulo(val) else ""
+
+                    row_data = {
+                        "ARCHIVO": file_name, "HOJA": sheet, "EQUIPO": global_center, "SEGMENTO": current_segment,
+                        "TIPO INDICADOR": "CDC" if "CDC" in sheet.upper() else "PMG",
+                        "NÚMERO": raw_num,
+                        "PRODUCTO O PROCESO ESPECÍFICO": gd(i, c_map["prod"]),
+                        "INDICADOR": self.parse_indicator_text(gd(i, c_map["ind"]))[0],
+                        "DIMENSIÓN": self.parse_indicator_text(gd(i, c_map["ind"]))[1],
+                        "ÁMBITO": self.parse_indicator_text(gd(i, c_map["ind"]))[2],
+                        "FORMULA": self.analyze_formula(gd(i, c_map["form"]))[0],
+                        "TIPO FORMULA": self.analyze_formula(gd(i, c_map["form"]))[1],
+                        "UNIDAD": gd(i, c_map["uni"]), "RESPONSABLE": gd(i, c_map["resp"]),
+                        "GESTOR": gd(i, c_map["gest"]), "SUPERVISORES": gd(i, c_map["sup"]),
+                        "Operandos estimados Meta(Valor indicador)": self.transform_percentage(gd(idx_ind_data, c_map["meta"])),
+                        "Ponderador": self.transform_percentage(gd(idx_ind_data, c_map["pond"])),
+                        "Descripción Operando 1": gd(i, c_map["op_desc"]),
+                        "Descripción Operando 2": gd(idx_op1, c_map["op_desc"]),
+                        "Operando 1 estimado Meta": gd(idx_op1, c_map["op_est"]),
+                        "Operando 2 estimado Meta": gd(idx_op2, c_map["op_est"]),
+                        "Cumplimiento Proyectado 2026 Op 1": gd(idx_op1, c_map["proy"]),
+                        "Cumplimiento Proyectado 2026 Op 2": gd(idx_op2, c_map["proy"]),
+                        "% Cumplimiento de Meta": self.transform_percentage(gd(idx_op1, c_map["cump_meta"])),
+                        "Medios de Verificación": gd(idx_ind_data, c_map["medios"]),
+                        "Control de Cambios": gd(idx_ind_data, c_map["control"]),
+                        "Instrumentos de Gestión Asociados": gd(idx_ind_data, c_map["inst"])
+                    }
+                    for m_key, m_col in m_map.items():
+                        row_data[f"{m_key} Op 1"] = gd(idx_op1, m_col)
+                        row_data[f"{m_key} Op 2"] = gd(idx_op2, m_col)
+                    self.flat_data.append(row_data)
+                    sheet_rows.append(row_data)
+
+                    meses_v = [(10, "Oct."), (11, "Nov."), (12, "Dic.")]
+                    for m_num, m_txt in meses_v:
+                        col_m = m_map.get(m_txt)
+                        v1_raw = gd(idx_op1, col_m) if col_m is not None else ""
+                        if "VALOR" in str(v1_raw).upper() or "OPERANDO" in str(v1_raw).upper(): v1_raw = ""
+                        self.variable_data.append({
+                            "ANO": 2025, "MES": m_num, "VARIABLE_COD": f"{raw_num}_A",
+                            "CENTRO_RESP_COD": global_center, "COD_REGION": 0, "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "", "VALOR_TOTAL": v1_raw, "ARCHIVO": file_name, "HOJA": sheet
+                        })
+                        v2_raw = gd(idx_op2, col_m) if col_m is not None else ""
+                        if "VALOR" in str(v2_raw).upper() or "OPERANDO" in str(v2_raw).upper(): v2_raw = ""
+                        self.variable_data.append({
+                            "ANO": 2025, "MES": m_num, "VARIABLE_COD": f"{raw_num}_B",
+                            "CENTRO_RESP_COD": global_center, "COD_REGION": 0, "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "", "VALOR_TOTAL": v2_raw, "ARCHIVO": file_name, "HOJA": sheet
+                        })
+
+            self.data_tree[file_name][sheet] = sheet_rows
+            print(f"   -> {len(sheet_rows)} indicadores extraídos.")
 
     def get_ordered_headers(self):
         base = [
@@ -481,47 +566,49 @@ class IPSParserHybridV113:
         ])
         return final_base
 
-    def export_excel(self):
-        print(f"\nGenerando Excel Maestro...")
-        wb = Workbook()
-        ws = wb.active; ws.title = "Carga Bruta"
+    def export_outputs(self):
+        # Resultado bruto para generar la Planilla Estilizada después ('render'), sin re-extraer
+        persistir({a: getattr(self, a) for a in self.ESTADO_BRUTO}, self.output_file)
+        # --format: el xlsx es opcional; parquet/csv/sqlite salen del mismo resultado en memoria
+        if "xlsx" in self.formatos:
+            if self.particion: exportar_particiones(self, *self.particion)
+            else: self.export_excel()
+        otros = [f for f in self.formatos if f != "xlsx"]
+        if otros:
+            tablas = {"Carga Bruta": tipar(self.flat_data, self.get_ordered_headers()),
+                      "DATOS_VARIABLE": tipar(self.variable_data, self.HEADERS_VARS)}
+            exportar_tablas(os.path.splitext(self.output_file)[0], tablas, otros)
+        if self.carga: generar_carga(self.folder_path, self.variable_data, self.carga)
+        if not self.estilizada: print(f"[INFO] Planilla Estilizada a pedido: python {os.path.basename(__file__)} render [--filtro REGION]")
+
+    def render_views(self, wb):
+        render_estilizada(wb, "Planilla Estilizada", self.data_tree, self.get_ordered_headers(), ancho_col=None)
+
+    def build_styled_workbook(self):
+        wb = nuevo_libro()
+        self.render_views(wb)
+        return wb
+
+    def build_workbook(self):
+        # Escritura fila a fila con el backend más rápido disponible (ips_core.escritores)
+        wb = nuevo_libro()
         keys = self.get_ordered_headers()
-        ws.append(keys)
-        fill = PatternFill("solid", fgColor="002060"); font = Font(color="FFFFFF", bold=True)
-        for c in ws[1]: c.fill = fill; c.font = font
-        for d in self.flat_data: ws.append([d.get(k, "") for k in keys])
-
-        ws_s = wb.create_sheet("Planilla Estilizada")
-        styles = {
-            'file': PatternFill("solid", fgColor="000000"), 'sheet': PatternFill("solid", fgColor="2F5597"),
-            'head': PatternFill("solid", fgColor="BFBFBF"), 'w_font': Font(color="FFFFFF", bold=True),
-            'b_font': Font(bold=True), 'border': Border(left=Side('thin'), right=Side('thin'), top=Side('thin'), bottom=Side('thin'))
-        }
-        r_idx = 1
-        for fname, sheets in self.data_tree.items():
-            if not any(sheets.values()): continue
-            c = ws_s.cell(r_idx, 1, f"ARCHIVO: {fname}"); c.fill=styles['file']; c.font=styles['w_font']; ws_s.merge_cells(start_row=r_idx, start_column=1, end_row=r_idx, end_column=len(keys)); r_idx+=1
-            for sname, rows in sheets.items():
-                if not rows: continue
-                c = ws_s.cell(r_idx, 1, f"HOJA: {sname}"); c.fill=styles['sheet']; c.font=styles['w_font']; ws_s.merge_cells(start_row=r_idx, start_column=1, end_row=r_idx, end_column=len(keys)); r_idx+=1
-                for i, k in enumerate(keys, 1):
-                    c = ws_s.cell(r_idx, i, k); c.fill=styles['head']; c.font=styles['b_font']; c.border=styles['border']
-                r_idx+=1
-                for row in rows:
-                    for i, k in enumerate(keys, 1):
-                        c = ws_s.cell(r_idx, i, row.get(k, "")); c.border=styles['border']; c.alignment=Alignment(wrapText=True, vertical='top')
-                    r_idx+=1
-                r_idx+=1
-
-        ws_v = wb.create_sheet("DATOS_VARIABLE")
-        h_vars = ["ANO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION", "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL", "ARCHIVO", "HOJA"]
-        ws_v.append(h_vars)
-        for c in ws_v[1]: c.fill = fill; c.font = font
-        for item in self.variable_data: ws_v.append([item.get(k, "") for k in h_vars])
-
-        try: wb.save(self.output_file); print(f"[EXITO] Guardado en: {self.output_file}")
-        except Exception as e: print(f"[ERROR] {e}")
+        hoja_tabla(wb, "Carga Bruta", keys, self.flat_data, estilo_cabecera="tabla_cabecera_azul")
+
+        if self.estilizada: self.render_views(wb)   # si no, a pedido con 'render'
+
+        hoja_tabla(wb, "DATOS_VARIABLE", self.HEADERS_VARS, self.variable_data, estilo_cabecera="tabla_cabecera_azul")
+        return wb
+
+    def export_excel(self):
+        print(f"\nGenerando Excel Maestro (en segundo plano)...")
+        # Temporal + renombrado atómico; si el Excel está abierto se guarda con fecha-hora, sin bloquear
+        return guardar_en_segundo_plano(lambda ruta: self.build_workbook().guardar(ruta), self.output_file)
 
 if __name__ == "__main__":
-    path = input("Ruta: ").strip() or os.getcwd()
-    IPSParserHybridV113(path).process_folder()
\ No newline at end of file
+    render, carpeta, filtros, estilizada = vistas_de_argv()
+    formatos, particion, carga = formatos_de_argv(), particion_de_argv(), carga_de_argv()
+    decisiones = reglas_de_argv()   # --reglas: sin preguntas por consola
+    path = carpeta or decisiones.carpeta or decisiones.responder("ruta", "Ruta: ") or os.getcwd()
+    if render: renderizar(IPSParserHybridV113(path), filtros)
+    else: IPSParserHybridV113(path, formatos, particion, carga, estilizada, decisiones).process_folder()
\ No newline at end of file
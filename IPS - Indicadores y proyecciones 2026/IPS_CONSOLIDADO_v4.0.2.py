@@ -1,24 +1,55 @@
-import pandas as pd
 import os
 import sys
 import glob
 import re
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from openpyxl.utils import get_column_letter
+
+# Librería compartida (carpeta ips_core en la raíz del repositorio)
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+while not os.path.isdir(os.path.join(_RAIZ, "ips_core")) and os.path.dirname(_RAIZ) != _RAIZ:
+    _RAIZ = os.path.dirname(_RAIZ)
+sys.path.insert(0, _RAIZ)
+from ips_core.centros import indice_catalogo
+from ips_core.acumulados import derivar_acumulados, marcas_acumulados, CLAVES_INTERNAS
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import hoja_tabla, render_estilizada, guardar_en_segundo_plano
+from ips_core.formatos import formatos_de_argv, tipar, exportar_tablas
+from ips_core.carga_masiva import carga_de_argv, generar_carga
+from ips_core.particiones import particion_de_argv, exportar_particiones
+from ips_core.vistas import vistas_de_argv, persistir, renderizar
+from ips_core.decisiones import Decisiones, reglas_de_argv
+from ips_core.revision import revision_previa
+from ips_core.cola import procesar_en_cola
+from ips_core.reanudacion import PuntoControl
+from ips_core.identificadores import Identificadores
+from ips_core.arranque import perezoso, es_nulo
+
+pd = perezoso("pandas")   # se importa al leer la primera planilla (ips_core.arranque)
 
 # =============================================================================
 # IPS_PARSER_v4.0.2 - LIMPIEZA INTELIGENTE DE FÓRMULAS (BALANCEO)
 # =============================================================================
 
 class IPSParserV402:
-    def __init__(self, folder_path):
+    HEADERS_VARS = ["ANO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION", 
+                    "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL",
+                    "ARCHIVO", "HOJA"]
+    ESTADO_BRUTO = ("data_tree", "flat_data", "variable_data")   # se guarda para 'render'
+    ARBOLES_ESTILIZADOS = ("data_tree",)
+    CONFIGURACION = ("opt_format_percent", "opt_hidden_strategy")   # fijados por configure()
+    MEMORIAS = ("memory_skip", "memory_generate", "memory_skip_empty", "identificadores")   # respuestas "siempre" y códigos emitidos (punto de control)
+
+    def __init__(self, folder_path, formatos=("xlsx",), particion=None, carga=None, estilizada=False, decisiones=None):
         self.folder_path = folder_path
         self.output_file = os.path.join(folder_path, "IPS_CONSOLIDADO_V4.0.2.xlsx")
         self.data_tree = {} 
         self.flat_data = [] 
         self.variable_data = [] 
-        self.new_indicator_count = 1
+        self.identificadores = Identificadores()   # códigos GEN_/NUEVO_ por hash del contenido (ips_core.identificadores)
+        self.formatos = list(formatos)
+        self.particion = particion    # (criterio, solo) -> un libro por EQUIPO/ARCHIVO
+        self.carga = carga            # (desde, hasta, mapa_cr) -> archivo de carga masiva SIG
+        self.estilizada = estilizada  # True: Planilla Estilizada en la misma pasada (si no, comando 'render')
+        self.decisiones = decisiones or Decisiones()   # interactivo, o por reglas (--reglas)
         
         # Configuración
         self.opt_format_percent = True
@@ -34,14 +65,14 @@ class IPSParserV402:
         print("   CONFIGURACIÓN MAESTRA v4.0.2")
         print("="*60)
         
-        resp_p = input("1. ¿Transformar porcentajes (0.2 -> 20)? [S/N] (Enter=Si): ").lower().strip()
+        resp_p = self.decisiones.responder("porcentajes", "1. ¿Transformar porcentajes (0.2 -> 20)? [S/N] (Enter=Si): ").lower()
         self.opt_format_percent = (resp_p != 'n')
         
         print("\n2. ¿Cómo manejar filas OCULTAS en todos los archivos?")
         print("   [v] Automático: Procesar SOLO VISIBLES (Recomendado).")
         print("   [t] Automático: Procesar TODO.")
         print("   [i] Interactivo: Preguntar caso a caso.")
-        resp_h = input("   >> Elija opción (Enter=v): ").lower().strip()
+        resp_h = self.decisiones.responder("ocultos", "   >> Elija opción (Enter=v): ").lower()
         
         if resp_h == 't': self.opt_hidden_strategy = 'all'
         elif resp_h == 'i': self.opt_hidden_strategy = 'interactive'
@@ -50,16 +81,32 @@ class IPSParserV402:
         print(f"\n[OK] Configuración guardada. Estrategia Ocultos: {self.opt_hidden_strategy.upper()}")
         print("-" * 60)
 
+    def derive_accumulated(self):
+        # Acumulados calculados (NumPy) para toda la Carga Bruta: completa "Acum" vacíos y marca diferencias
+        meses = ["Ene.", "Feb.", "Mar.", "Abr.", "May.", "Jun.", "Jul.", "Ago.", "Sept.", "Oct.", "Nov.", "Dic."]
+        acums = [None, "Acum Feb.", "Acum Mar.", "Acum Abr.", "Acum May.", "Acum Jun.", "Acum Jul.",
+                 "Acum Ago", "Acum Sept", "Acum Oct.", "Acum Nov.", None]
+        n_comp, n_dif = 0, 0
+        for op in (1, 2):
+            c, d = derivar_acumulados(self.flat_data, [f"{m} Op {op}" for m in meses],
+                                      [f"{a} Op {op}" if a else None for a in acums])
+            n_comp += c; n_dif += d
+        return n_comp, n_dif
+
     def print_summary_and_exit(self):
+        n_comp, n_dif = self.derive_accumulated()
         print("\n" + "="*60)
         print("   RESUMEN FINAL")
         print("="*60)
         print(f"  * Registros 'Carga Bruta':     {len(self.flat_data)}")
         print(f"  * Registros 'DATOS_VARIABLE':  {len(self.variable_data)}")
+        print(f"  * Acumulados completados:      {n_comp}")
+        print(f"  * Acumulados a revisar:        {n_dif}")
         print("-" * 60)
+        self.decisiones.informe(self.output_file)
         
         if self.flat_data:
-            self.export_excel()
+            self.export_outputs()
         else:
             print("[AVISO] No se generó archivo de salida (sin datos).")
         sys.exit()
@@ -69,11 +116,10 @@ class IPSParserV402:
         print("  [v] Procesar SOLO VISIBLES.")
         print("  [t] Procesar TODAS.")
         print("  [s] Saltar esta hoja.")
-        while True:
-            choice = input("  >> Elija (v/t/s): ").lower().strip()
-            if choice == 'v': return 'visible'
-            if choice == 't': return 'all'
-            if choice == 's': return 'skip'
+        choice = self.decisiones.responder("ocultos_hoja", "  >> Elija (v/t/s): ", ["v", "t", "s"], texto=count, hoja=sheet_name)
+        if choice == 'v': return 'visible'
+        if choice == 't': return 'all'
+        if choice == 's': return 'skip'
 
     def ask_column_action(self, missing_cols, sheet_name):
         print(f"\n[ALERTA] En hoja '{sheet_name}' faltan columnas: {missing_cols}")
@@ -82,19 +128,22 @@ class IPSParserV402:
         print("   [s] Saltar esta hoja.")
         print("   [f] Saltar este ARCHIVO completo.")
         print("   [d] Detener y Guardar.")
-        while True:
-            choice = input("  >> Elija opción (c/s/f/d): ").lower().strip()
-            if choice == 'c': return 'continue'
-            if choice == 's': return 'skip_sheet'
-            if choice == 'f': return 'skip_file'
-            if choice == 'd': self.print_summary_and_exit()
-
-    def ask_center_resp_manual(self, sheet_name, file_name, last_found):
+        choice = self.decisiones.responder("columnas", "  >> Elija opción (c/s/f/d): ", ["c", "s", "f", "d"],
+                                           texto=", ".join(missing_cols), hoja=sheet_name)
+        if choice == 'c': return 'continue'
+        if choice == 's': return 'skip_sheet'
+        if choice == 'f': return 'skip_file'
+        if choice == 'd': self.print_summary_and_exit()
+
+    def ask_center_resp_manual(self, sheet_name, file_name, last_found, candidates=None):
+        candidates = candidates or []
         print(f"\n{'!'*60}")
         print(f"[ALERTA CRÍTICA] Equipo NO IDENTIFICADO en hoja '{sheet_name}'")
         print(f"Archivo: {file_name}")
         print(f"{'!'*60}")
         print("  Opciones:")
+        for i, (name, _, score) in enumerate(candidates, 1):
+            print(f"   [{i}] Candidato por similitud: '{name}' ({score:.0%})")
         print("   [n] Asignar 'No aplica'.")
         if last_found:
             print(f"   [h] Heredar de hoja anterior: '{last_found}'")
@@ -102,14 +151,14 @@ class IPSParserV402:
             print("   [h] (Heredar no disponible)")
         print("   [m] Escribir nombre MANUALMENTE.")
         print("   [s] Saltar esta HOJA.")
-        while True:
-            choice = input("  >> Elija opción (n/h/m/s): ").lower().strip()
-            if choice == 'n': return "No aplica"
-            if choice == 'h':
-                if last_found: return last_found
-                else: print("     [ERROR] No hay nada que heredar.")
-            if choice == 'm': return input("     >> Ingrese Nombre del Equipo: ").strip()
-            if choice == 's': return None
+        nums = f"1-{len(candidates)}/" if candidates else ""
+        opciones = [str(i) for i in range(1, len(candidates) + 1)] + ["n", "m", "s"] + (["h"] if last_found else [])
+        choice = self.decisiones.responder("equipo", f"  >> Elija opción ({nums}n/h/m/s): ", opciones, archivo=file_name, hoja=sheet_name)
+        if choice.isdigit(): return candidates[int(choice) - 1][0]
+        if choice == 'n': return "No aplica"
+        if choice == 'h': return last_found
+        if choice == 'm': return self.decisiones.responder("equipo_manual", "     >> Ingrese Nombre del Equipo: ", archivo=file_name, hoja=sheet_name)
+        if choice == 's': return None
 
     # --- UTILIDAD: CHEQUEAR BALANCE DE PARENTESIS ---
     def is_fully_enclosed_by_parens(self, text):
@@ -138,7 +187,7 @@ class IPSParserV402:
 
     # --- LÓGICA 3: ANÁLISIS DE FÓRMULA (CORREGIDO v4.0.2) ---
     def analyze_formula(self, formula_raw):
-        if pd.isna(formula_raw) or str(formula_raw).strip() == "":
+        if es_nulo(formula_raw) or str(formula_raw).strip() == "":
             return "", "Sin Fórmula"
         
         # 1. Limpieza base
@@ -180,7 +229,7 @@ class IPSParserV402:
 
     # --- LÓGICA 2: PARSING DE INDICADOR ---
     def parse_indicator_text(self, text):
-        if pd.isna(text) or str(text).strip() == "":
+        if es_nulo(text) or str(text).strip() == "":
             return "", "No identificado", "No identificado"
         
         text_str = str(text).strip()
@@ -232,6 +281,13 @@ class IPSParserV402:
                     return val
         return None
 
+    def suggest_center(self, file_name):
+        """
+        Busca el CR en el catálogo oficial por similitud con el nombre del archivo.
+        Devuelve (nombre, candidatos): nombre es None si el caso es ambiguo.
+        """
+        return indice_catalogo().resolver(os.path.splitext(file_name)[0])
+
     def ask_weird_row_action(self, row_idx, content, file_name, sheet_name):
         clean = str(content).strip().upper()
         if clean in self.memory_skip: return 'skip'
@@ -245,23 +301,23 @@ class IPSParserV402:
         print("  [x]  Saltar SIEMPRE filas con este texto.")
         print("  [d]  Detener y Guardar.")
 
-        while True:
-            choice = input("  >> Elija: ").lower().strip()
-            if choice == 'c': return 'auto'
-            if choice == 'ca': 
-                self.memory_generate = True
-                return 'auto'
-            if choice == 's': return 'skip'
-            if choice == 'x':
-                if content == "[VACÍO]": self.memory_skip_empty = True
-                else: self.memory_skip.add(clean)
-                print(f"     -> Ignorando '{content}' siempre.")
-                return 'skip'
-            if choice == 'd': self.print_summary_and_exit()
+        choice = self.decisiones.responder("fila_rara", "  >> Elija: ", ["c", "ca", "s", "x", "d"],
+                                           fila=row_idx, texto=content, archivo=file_name, hoja=sheet_name)
+        if choice == 'c': return 'auto'
+        if choice == 'ca': 
+            self.memory_generate = True
+            return 'auto'
+        if choice == 's': return 'skip'
+        if choice == 'x':
+            if content == "[VACÍO]": self.memory_skip_empty = True
+            else: self.memory_skip.add(clean)
+            print(f"     -> Ignorando '{content}' siempre.")
+            return 'skip'
+        if choice == 'd': self.print_summary_and_exit()
 
     def transform_percentage(self, val, col_name):
         if not self.opt_format_percent: return val
-        if pd.isna(val) or val == "" or val == "No aplica": return val
+        if es_nulo(val) or val == "" or val == "No aplica": return val
         try:
             num = float(val)
             if 0 < abs(num) <= 1: return round(num * 100, 2)
@@ -269,8 +325,9 @@ class IPSParserV402:
         except: return val
 
     def get_excel_files(self):
-        all_files = glob.glob(os.path.join(self.folder_path, "*.xlsx")) + glob.glob(os.path.join(self.folder_path, "*.xls"))
-        valid_files = [f for f in all_files if not os.path.basename(f).startswith("~$") and "IPS_CONSOLIDADO" not in f]
+        # Ordenados por nombre: el orden de glob depende del sistema de archivos (y 'shard'/'merge' deben repetirlo)
+        all_files = sorted(glob.glob(os.path.join(self.folder_path, "*.xlsx")) + glob.glob(os.path.join(self.folder_path, "*.xls")), key=os.path.basename)
+        valid_files = [f for f in all_files if not os.path.basename(f).startswith("~$") and "IPS_CONSOLIDADO" not in f and "carga masiva" not in os.path.basename(f)]
         if not valid_files:
             print(f"[ERROR] Carpeta vacía o sin Excel: {self.folder_path}")
             sys.exit()
@@ -279,6 +336,7 @@ class IPSParserV402:
 
     def get_hidden_rows(self, file_path, sheet_name):
         try:
+            from openpyxl import load_workbook
             wb = load_workbook(file_path, read_only=False, data_only=True)
             if sheet_name not in wb.sheetnames: return set()
             ws = wb[sheet_name]
@@ -292,338 +350,334 @@ class IPSParserV402:
 
     def process_folder(self):
         files = self.get_excel_files()
-        self.configure()
+        self.decisiones.abrir_diario(self.output_file)   # respuestas anteriores por archivo/hoja/fila
+        punto = PuntoControl(self)   # un registro por archivo terminado
+        hechos = punto.reanudar(files) if self.decisiones.reanudar else 0   # --resume: sigue desde el primero sin terminar
+        if not hechos:
+            self.configure()
+            punto.iniciar()
+        revision_previa(self, files[hechos:])   # --revision-previa: preguntas agrupadas antes de extraer
         
-        for idx_file, file_path in enumerate(files):
-            file_name = os.path.basename(file_path)
-            self.data_tree[file_name] = {}
-            skip_file_flag = False
-            last_found_center = None 
-            
-            print(f"\n>>> PROCESANDO ({idx_file + 1}/{len(files)}): {file_name}")
-            
-            try:
-                xls = pd.ExcelFile(file_path)
-                sheet_names = xls.sheet_names
-            except Exception as e:
-                print(f"  [ERROR] Archivo corrupto: {e}")
-                continue
-
-            for sheet in sheet_names:
-                if skip_file_flag: break
-
-                # 1. GESTIÓN DE OCULTOS
-                hidden_rows = self.get_hidden_rows(file_path, sheet)
-                ignored_rows = set()
-                
-                if hidden_rows:
-                    if self.opt_hidden_strategy == 'visible':
-                        ignored_rows = hidden_rows
-                    elif self.opt_hidden_strategy == 'all':
-                        ignored_rows = set()
-                    else:
-                        action = self.ask_hidden_interactive(len(hidden_rows), sheet)
-                        if action == 'skip': continue
-                        elif action == 'visible': ignored_rows = hidden_rows
-                        elif action == 'all': ignored_rows = set()
-
-                try:
-                    df = pd.read_excel(file_path, sheet_name=sheet, header=None)
-                except: continue
-
-                h_idx = None
-                for idx, row in df.iterrows():
-                    if idx in ignored_rows: continue
-                    row_vals = [str(x).upper().strip() for x in row.values if pd.notna(x)]
-                    if any(x in row_vals for x in ["NÚMERO", "NUMERO", "N°"]):
-                        h_idx = idx
-                        break
-                
-                if h_idx is None:
-                    continue 
+        if self.decisiones.cola: procesar_en_cola(self, files[hechos:], anotar=punto.anotar)   # --cola: una pregunta no detiene a los demás archivos
+        else:
+            for idx_file in range(hechos, len(files)):
+                self.process_file(files[idx_file], idx_file, len(files))
+                punto.anotar(files[idx_file])
 
-                # 2. EQUIPO Y TIPO
-                center_resp_name = self.find_center_responsibility(df, limit_row=h_idx)
-                tipo_ind = self.get_indicator_type(sheet)
+        self.print_summary_and_exit()
 
-                centro_uso = "No aplica"
-                if center_resp_name:
-                    last_found_center = center_resp_name 
-                    centro_uso = center_resp_name
+    def process_file(self, file_path, idx_file=0, total=1):
+        # Extrae un archivo completo (todas sus hojas) hacia data_tree / flat_data / variable_data
+        file_name = os.path.basename(file_path)
+        self.data_tree[file_name] = {}
+        skip_file_flag = False
+        last_found_center = None 
+        
+        print(f"\n>>> PROCESANDO ({idx_file + 1}/{total}): {file_name}")
+        
+        try:
+            xls = pd.ExcelFile(file_path)
+            sheet_names = xls.sheet_names
+        except Exception as e:
+            print(f"  [ERROR] Archivo corrupto: {e}")
+            return
+
+        for sheet in sheet_names:
+            if skip_file_flag: break
+            self.decisiones.contexto(file_name, sheet, file_path)
+
+            # 1. GESTIÓN DE OCULTOS
+            hidden_rows = self.get_hidden_rows(file_path, sheet)
+            ignored_rows = set()
+            
+            if hidden_rows:
+                if self.opt_hidden_strategy == 'visible':
+                    ignored_rows = hidden_rows
+                elif self.opt_hidden_strategy == 'all':
+                    ignored_rows = set()
                 else:
-                    if h_idx is not None:
-                        centro_uso = self.ask_center_resp_manual(sheet, file_name, last_found_center)
-                        if centro_uso is None: 
-                            print("     -> Saltando hoja.")
-                            continue 
-                        if centro_uso != "No aplica":
-                            last_found_center = centro_uso
-
-                # 3. PROCESAR TABLA
-                headers = [str(h).strip() for h in df.iloc[h_idx]]
-                
-                def find_c(names):
-                    for i, h in enumerate(headers):
-                        h_clean = " ".join(str(h).split()).lower()
-                        for n in names:
-                            if n.lower() in h_clean: return i
-                    return None
-
-                c_map = {
-                    "num": find_c(["NÚMERO", "NUMERO", "N°"]),
-                    "prod": find_c(["PRODUCTO"]),
-                    "ind": find_c(["INDICADOR"]),
-                    "form": find_c(["FORMULA", "FÓRMULA"]),
-                    "uni": find_c(["UNIDAD"]),
-                    "resp": find_c(["RESPONSABLE"]),
-                    "gest": find_c(["GESTOR"]),
-                    "sup": find_c(["SUPERVISORES"]),
-                    "meta": find_c(["Meta 2025", "Meta 2026", "Meta"]),
-                    "pond": find_c(["Ponderador"]),
-                    "op_desc": find_c(["Operandos"]), 
-                    "op_est": find_c(["Operandos Estimados", "Estimados Meta", "Estimados"]),
-                    "proy": find_c(["Cumplimiento Proyectado", "Proyectado"]),
-                    "cump_meta": find_c(["% Cumplimiento"]),
-                    "medios": find_c(["Medios"]),
-                    "control": find_c(["Control de Cambios"]),
-                    "inst": find_c(["Instrumentos"])
-                }
+                    action = self.ask_hidden_interactive(len(hidden_rows), sheet)
+                    if action == 'skip': continue
+                    elif action == 'visible': ignored_rows = hidden_rows
+                    elif action == 'all': ignored_rows = set()
 
-                missing = [k for k, v in c_map.items() if v is None and k not in ["pond", "control"]]
-                if missing:
-                    action = self.ask_column_action(missing, sheet)
-                    if action == 'skip_sheet': continue
-                    if action == 'skip_file': 
-                        skip_file_flag = True
-                        break
-
-                months = ["Ene.", "Feb.", "Acum Feb.", "Mar.", "Acum Mar.", "Abr.", "Acum Abr.", 
-                          "May.", "Acum May.", "Jun.", "Acum Jun.", "Jul.", "Acum Jul.", "Ago.", 
-                          "Acum Ago", "Sept.", "Acum Sept", "Oct.", "Acum Oct.", "Nov.", "Acum Nov.", "Dic."]
-                month_map = {m: find_c([m]) for m in months}
-
-                sheet_rows = []
-                count_rows = 0
-                
-                for i in range(h_idx + 1, len(df)):
-                    if i in ignored_rows: continue
+            try:
+                df = pd.read_excel(file_path, sheet_name=sheet, header=None)
+            except: continue
+
+            h_idx = None
+            for idx, row in df.iterrows():
+                if idx in ignored_rows: continue
+                row_vals = [str(x).upper().strip() for x in row.values if not es_nulo(x)]
+                if any(x in row_vals for x in ["NÚMERO", "NUMERO", "N°"]):
+                    h_idx = idx
+                    break
+            
+            if h_idx is None:
+                continue 
 
-                    def get_val(col_idx, row_offset=0):
-                        target_row = i + row_offset
-                        if col_idx is None: return "No aplica"
-                        if target_row >= len(df) or target_row in ignored_rows: return ""
-                        val = df.iloc[target_row, col_idx]
-                        return val if pd.notna(val) else ""
+            # 2. EQUIPO Y TIPO
+            center_resp_name = self.find_center_responsibility(df, limit_row=h_idx)
+            tipo_ind = self.get_indicator_type(sheet)
 
-                    raw_num = get_val(c_map["num"])
-                    str_num = str(raw_num).strip()
+            centro_uso = "No aplica"
+            if center_resp_name:
+                last_found_center = center_resp_name 
+                centro_uso = center_resp_name
+            else:
+                if h_idx is not None:
+                    suggested, candidates = self.suggest_center(file_name)
+                    if suggested:
+                        print(f"  [AUTO] Equipo por similitud con el archivo: '{suggested}'")
+                        centro_uso = suggested
+                    else:
+                        centro_uso = self.ask_center_resp_manual(sheet, file_name, last_found_center, candidates)
+                    if centro_uso is None: 
+                        print("     -> Saltando hoja.")
+                        continue 
+                    if centro_uso != "No aplica":
+                        last_found_center = centro_uso
+
+            # 3. PROCESAR TABLA
+            headers = [str(h).strip() for h in df.iloc[h_idx]]
+            
+            def find_c(names):
+                for i, h in enumerate(headers):
+                    h_clean = " ".join(str(h).split()).lower()
+                    for n in names:
+                        if n.lower() in h_clean: return i
+                return None
+
+            c_map = {
+                "num": find_c(["NÚMERO", "NUMERO", "N°"]),
+                "prod": find_c(["PRODUCTO"]),
+                "ind": find_c(["INDICADOR"]),
+                "form": find_c(["FORMULA", "FÓRMULA"]),
+                "uni": find_c(["UNIDAD"]),
+                "resp": find_c(["RESPONSABLE"]),
+                "gest": find_c(["GESTOR"]),
+                "sup": find_c(["SUPERVISORES"]),
+                "meta": find_c(["Meta 2025", "Meta 2026", "Meta"]),
+                "pond": find_c(["Ponderador"]),
+                "op_desc": find_c(["Operandos"]), 
+                "op_est": find_c(["Operandos Estimados", "Estimados Meta", "Estimados"]),
+                "proy": find_c(["Cumplimiento Proyectado", "Proyectado"]),
+                "cump_meta": find_c(["% Cumplimiento"]),
+                "medios": find_c(["Medios"]),
+                "control": find_c(["Control de Cambios"]),
+                "inst": find_c(["Instrumentos"])
+            }
+
+            missing = [k for k, v in c_map.items() if v is None and k not in ["pond", "control"]]
+            if missing:
+                action = self.ask_column_action(missing, sheet)
+                if action == 'skip_sheet': continue
+                if action == 'skip_file': 
+                    skip_file_flag = True
+                    break
+
+            months = ["Ene.", "Feb.", "Acum Feb.", "Mar.", "Acum Mar.", "Abr.", "Acum Abr.", 
+                      "May.", "Acum May.", "Jun.", "Acum Jun.", "Jul.", "Acum Jul.", "Ago.", 
+                      "Acum Ago", "Sept.", "Acum Sept", "Oct.", "Acum Oct.", "Nov.", "Acum Nov.", "Dic."]
+            month_map = {m: find_c([m]) for m in months}
+
+            sheet_rows = []
+            count_rows = 0
+            
+            for i in range(h_idx + 1, len(df)):
+                if i in ignored_rows: continue
 
-                    if str_num.upper() in self.blacklist_auto: continue
+                def get_val(col_idx, row_offset=0):
+                    target_row = i + row_offset
+                    if col_idx is None: return "No aplica"
+                    if target_row >= len(df) or target_row in ignored_rows: return ""
+                    val = df.iloc[target_row, col_idx]
+                    return val if not es_nulo(val) else ""
 
-                    final_code = None
-                    is_new = "NUEVO" in str_num.upper()
-                    is_empty = (str_num == "" or str_num.lower() == "nan")
-                    
-                    if is_empty or is_new:
-                        ind_val = get_val(c_map["ind"])
-                        if ind_val and str(ind_val).strip() not in ["", "0", "No aplica"]:
-                            action = self.ask_weird_row_action(i+1, str_num if str_num else "[VACÍO]", file_name, sheet)
-                            if action == 'skip': continue
-                            
-                            prefix = file_name.split()[0][:8]
-                            clean_s = ''.join(e for e in sheet if e.isalnum())
-                            final_code = f"NUEVO_{self.new_indicator_count}_{prefix}_{clean_s}"
-                            self.new_indicator_count += 1
-                        else: continue 
-                    
-                    elif not any(c.isdigit() for c in str_num):
-                        action = self.ask_weird_row_action(i+1, str_num, file_name, sheet)
+                raw_num = get_val(c_map["num"])
+                str_num = str(raw_num).strip()
+
+                if str_num.upper() in self.blacklist_auto: continue
+
+                final_code = None
+                is_new = "NUEVO" in str_num.upper()
+                is_empty = (str_num == "" or str_num.lower() == "nan")
+                
+                if is_empty or is_new:
+                    ind_val = get_val(c_map["ind"])
+                    if ind_val and str(ind_val).strip() not in ["", "0", "No aplica"]:
+                        action = self.ask_weird_row_action(i+1, str_num if str_num else "[VACÍO]", file_name, sheet)
                         if action == 'skip': continue
-                        if action == 'auto':
-                             prefix = file_name.split()[0][:8]
-                             final_code = f"GEN_{self.new_indicator_count}_{prefix}"
-                             self.new_indicator_count += 1
-                    else:
-                        final_code = str_num
+                        
+                        prefix = file_name.split()[0][:8]
+                        clean_s = ''.join(e for e in sheet if e.isalnum())
+                        final_code = self.identificadores.nuevo("NUEVO", file_name, sheet, ind_val, f"_{prefix}_{clean_s}")
+                    else: continue 
+                
+                elif not any(c.isdigit() for c in str_num):
+                    action = self.ask_weird_row_action(i+1, str_num, file_name, sheet)
+                    if action == 'skip': continue
+                    if action == 'auto':
+                         prefix = file_name.split()[0][:8]
+                         final_code = self.identificadores.nuevo("GEN", file_name, sheet, get_val(c_map["ind"]), f"_{prefix}")
+                else:
+                    final_code = str_num
 
-                    if not final_code: continue
+                if not final_code: continue
 
-                    count_rows += 1
+                count_rows += 1
+                
+                # 1. PARSING DE INDICADOR
+                raw_ind_text = get_val(c_map["ind"])
+                clean_ind_text, dim_text, amb_text = self.parse_indicator_text(raw_ind_text)
+
+                # 2. PARSING DE FÓRMULA (NUEVO)
+                raw_formula = get_val(c_map["form"])
+                clean_formula, type_formula = self.analyze_formula(raw_formula)
+
+                # 3. CARGA BRUTA
+                row_data = {
+                    "ARCHIVO": file_name, 
+                    "HOJA": sheet, 
+                    "EQUIPO": centro_uso, 
+                    "TIPO INDICADOR": tipo_ind, 
+                    "NÚMERO": final_code,
+                    "PRODUCTO O PROCESO ESPECÍFICO": get_val(c_map["prod"]),
+                    "INDICADOR": clean_ind_text,
+                    "DIMENSIÓN": dim_text,
+                    "ÁMBITO": amb_text,
+                    "FORMULA": clean_formula,   
+                    "TIPO FORMULA": type_formula,
+                    "UNIDAD": get_val(c_map["uni"]),
+                    "RESPONSABLE": get_val(c_map["resp"]), 
+                    "GESTOR": get_val(c_map["gest"]),
+                    "SUPERVISORES": get_val(c_map["sup"]),
+                    "Meta 2026": self.transform_percentage(get_val(c_map["meta"]), "Meta"),
+                    "Ponderador": self.transform_percentage(get_val(c_map["pond"]), "Ponderador"),
+                }
+                
+                row_data["Descripción Operando 1"] = get_val(c_map["op_desc"], 0)
+                row_data["Descripción Operando 2"] = get_val(c_map["op_desc"], 3)
+                row_data["Meta Operando 1 (Valor)"] = get_val(c_map["op_est"], 3)
+                row_data["Meta Operando 2 (Valor)"] = get_val(c_map["op_est"], 5)
+                
+                for m_name, m_idx in month_map.items():
+                    row_data[f"{m_name} Op 1"] = get_val(m_idx, 3)
+                    row_data[f"{m_name} Op 2"] = get_val(m_idx, 5)
+
+                row_data["Cumplimiento Proyectado 2026 Op 1"] = get_val(c_map["proy"], 3)
+                row_data["Cumplimiento Proyectado 2026 Op 2"] = get_val(c_map["proy"], 5)
+                row_data["% Cumplimiento de Meta"] = self.transform_percentage(get_val(c_map["cump_meta"], 3), "% Cump Meta")
+                row_data["Medios de Verificación"] = get_val(c_map["medios"], 0)
+                row_data["Control de Cambios"] = get_val(c_map["control"], 0)
+                row_data["Instrumentos de Gestión Asociados"] = get_val(c_map["inst"], 0)
+
+                sheet_rows.append(row_data)
+                self.flat_data.append(row_data)
+
+                # 4. DATOS_VARIABLE
+                meses_vars = [(10, "Oct."), (11, "Nov."), (12, "Dic.")]
+                
+                for mes_num, mes_key in meses_vars:
+                    c_idx_mes = month_map[mes_key]
+                    val_op1 = get_val(c_idx_mes, 3)
+                    val_op2 = get_val(c_idx_mes, 5)
                     
-                    # 1. PARSING DE INDICADOR
-                    raw_ind_text = get_val(c_map["ind"])
-                    clean_ind_text, dim_text, amb_text = self.parse_indicator_text(raw_ind_text)
-
-                    # 2. PARSING DE FÓRMULA (NUEVO)
-                    raw_formula = get_val(c_map["form"])
-                    clean_formula, type_formula = self.analyze_formula(raw_formula)
-
-                    # 3. CARGA BRUTA
-                    row_data = {
-                        "ARCHIVO": file_name, 
-                        "HOJA": sheet, 
-                        "EQUIPO": centro_uso, 
-                        "TIPO INDICADOR": tipo_ind, 
-                        "NÚMERO": final_code,
-                        "PRODUCTO O PROCESO ESPECÍFICO": get_val(c_map["prod"]),
-                        "INDICADOR": clean_ind_text,
-                        "DIMENSIÓN": dim_text,
-                        "ÁMBITO": amb_text,
-                        "FORMULA": clean_formula,   
-                        "TIPO FORMULA": type_formula,
-                        "UNIDAD": get_val(c_map["uni"]),
-                        "RESPONSABLE": get_val(c_map["resp"]), 
-                        "GESTOR": get_val(c_map["gest"]),
-                        "SUPERVISORES": get_val(c_map["sup"]),
-                        "Meta 2026": self.transform_percentage(get_val(c_map["meta"]), "Meta"),
-                        "Ponderador": self.transform_percentage(get_val(c_map["pond"]), "Ponderador"),
+                    var_a = {
+                        "ANO": 2025,
+                        "MES": mes_num,
+                        "VARIABLE_COD": f"{final_code}_A",
+                        "CENTRO_RESP_COD": centro_uso, 
+                        "COD_REGION": 0,
+                        "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "",
+                        "VALOR_TOTAL": val_op1,
+                        "ARCHIVO": file_name,
+                        "HOJA": sheet
                     }
+                    self.variable_data.append(var_a)
                     
-                    row_data["Descripción Operando 1"] = get_val(c_map["op_desc"], 0)
-                    row_data["Descripción Operando 2"] = get_val(c_map["op_desc"], 3)
-                    row_data["Meta Operando 1 (Valor)"] = get_val(c_map["op_est"], 3)
-                    row_data["Meta Operando 2 (Valor)"] = get_val(c_map["op_est"], 5)
-                    
-                    for m_name, m_idx in month_map.items():
-                        row_data[f"{m_name} Op 1"] = get_val(m_idx, 3)
-                        row_data[f"{m_name} Op 2"] = get_val(m_idx, 5)
-
-                    row_data["Cumplimiento Proyectado 2026 Op 1"] = get_val(c_map["proy"], 3)
-                    row_data["Cumplimiento Proyectado 2026 Op 2"] = get_val(c_map["proy"], 5)
-                    row_data["% Cumplimiento de Meta"] = self.transform_percentage(get_val(c_map["cump_meta"], 3), "% Cump Meta")
-                    row_data["Medios de Verificación"] = get_val(c_map["medios"], 0)
-                    row_data["Control de Cambios"] = get_val(c_map["control"], 0)
-                    row_data["Instrumentos de Gestión Asociados"] = get_val(c_map["inst"], 0)
-
-                    sheet_rows.append(row_data)
-                    self.flat_data.append(row_data)
-
-                    # 4. DATOS_VARIABLE
-                    meses_vars = [(10, "Oct."), (11, "Nov."), (12, "Dic.")]
-                    
-                    for mes_num, mes_key in meses_vars:
-                        c_idx_mes = month_map[mes_key]
-                        val_op1 = get_val(c_idx_mes, 3)
-                        val_op2 = get_val(c_idx_mes, 5)
-                        
-                        var_a = {
-                            "ANO": 2025,
-                            "MES": mes_num,
-                            "VARIABLE_COD": f"{final_code}_A",
-                            "CENTRO_RESP_COD": centro_uso, 
-                            "COD_REGION": 0,
-                            "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "",
-                            "VALOR_TOTAL": val_op1,
-                            "ARCHIVO": file_name,
-                            "HOJA": sheet
-                        }
-                        self.variable_data.append(var_a)
-                        
-                        var_b = {
-                            "ANO": 2025,
-                            "MES": mes_num,
-                            "VARIABLE_COD": f"{final_code}_B",
-                            "CENTRO_RESP_COD": centro_uso, 
-                            "COD_REGION": 0,
-                            "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "",
-                            "VALOR_TOTAL": val_op2,
-                            "ARCHIVO": file_name,
-                            "HOJA": sheet
-                        }
-                        self.variable_data.append(var_b)
-
-                self.data_tree[file_name][sheet] = sheet_rows
-                print(f"  -> {count_rows} ok [Hoja: {sheet}]")
-
-            if skip_file_flag: print("  [SALTO] Archivo omitido.")
+                    var_b = {
+                        "ANO": 2025,
+                        "MES": mes_num,
+                        "VARIABLE_COD": f"{final_code}_B",
+                        "CENTRO_RESP_COD": centro_uso, 
+                        "COD_REGION": 0,
+                        "VALOR_M": "", "VALOR_F": "", "VALOR_S": "", "VALOR_J": "",
+                        "VALOR_TOTAL": val_op2,
+                        "ARCHIVO": file_name,
+                        "HOJA": sheet
+                    }
+                    self.variable_data.append(var_b)
 
-        self.print_summary_and_exit()
+            self.data_tree[file_name][sheet] = sheet_rows
+            print(f"  -> {count_rows} ok [Hoja: {sheet}]")
 
-    def export_excel(self):
-        print(f"\n{'='*60}\nGUARDANDO ARCHIVO MAESTRO...\n{'='*60}")
-        wb = Workbook()
+        if skip_file_flag: print("  [SALTO] Archivo omitido.")
+
+    def render_views(self, wb):
+        # PLANILLA ESTILIZADA (estilos con nombre, banner de 64 columnas)
+        render_estilizada(wb, "Planilla Estilizada", self.data_tree,
+                          lambda rows: [k for k in rows[0].keys() if k not in ("ARCHIVO", "HOJA") + CLAVES_INTERNAS],
+                          ancho_banner=64, marcas=marcas_acumulados("ips_revisar", "ips_derivado"))
+
+    def build_styled_workbook(self):
+        wb = nuevo_libro()
+        self.render_views(wb)
+        return wb
+
+    def build_workbook(self):
+        # Escritura fila a fila con el backend más rápido disponible (ips_core.escritores)
+        wb = nuevo_libro()
         
-        # 1. CARGA BRUTA
-        ws = wb.active; ws.title = "Carga Bruta"
+        # 1. CARGA BRUTA (acumulados a revisar en naranjo, completados con el cálculo en celeste)
         if self.flat_data:
-            ws.append(list(self.flat_data[0].keys()))
-            for r in self.flat_data: ws.append(list(r.values()))
+            keys_bruta = [k for k in self.flat_data[0].keys() if k not in CLAVES_INTERNAS]
+            hoja_tabla(wb, "Carga Bruta", keys_bruta, self.flat_data, marcas=marcas_acumulados("tabla_revisar", "tabla_derivado"))
+        else:
+            wb.hoja("Carga Bruta")
         
-        # 2. PLANILLA ESTILIZADA
-        ws_style = wb.create_sheet("Planilla Estilizada")
-        styles = {
-            'file': PatternFill("solid", fgColor="000000"),
-            'sheet': PatternFill("solid", fgColor="2F5597"),
-            'head': PatternFill("solid", fgColor="BFBFBF"),
-            'w_font': Font(color="FFFFFF", bold=True),
-            'b_font': Font(bold=True),
-            'border': Border(left=Side('thin'), right=Side('thin'), top=Side('thin'), bottom=Side('thin'))
-        }
-
-        row_idx = 1
-        FULL_WIDTH = 64
-
-        for fname, sheets in self.data_tree.items():
-            if not any(sheets.values()): continue
-            
-            c = ws_style.cell(row=row_idx, column=1, value=f"ARCHIVO: {fname}")
-            c.fill = styles['file']; c.font = styles['w_font']; c.alignment = Alignment('center')
-            ws_style.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=FULL_WIDTH)
-            row_idx += 1
-            
-            for sname, rows in sheets.items():
-                if not rows: continue
-                c = ws_style.cell(row=row_idx, column=1, value=f"HOJA: {sname}")
-                c.fill = styles['sheet']; c.font = styles['w_font']
-                ws_style.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=FULL_WIDTH)
-                row_idx += 1
-                
-                keys = [k for k in rows[0].keys() if k not in ["ARCHIVO", "HOJA"]]
-                for c_i, k in enumerate(keys, 1):
-                    c = ws_style.cell(row=row_idx, column=c_i, value=k)
-                    c.fill = styles['head']; c.font = styles['b_font']; c.border = styles['border']
-                row_idx += 1
-                
-                for r in rows:
-                    for c_i, k in enumerate(keys, 1):
-                        c = ws_style.cell(row=row_idx, column=c_i, value=r[k])
-                        c.border = styles['border']; c.alignment = Alignment(wrapText=True, vertical='top')
-                    row_idx += 1
-                row_idx += 1
-
-        for i in range(1, FULL_WIDTH + 2):
-            ws_style.column_dimensions[get_column_letter(i)].width = 22
+        # 2. PLANILLA ESTILIZADA (sólo con --estilizada; si no, a pedido con 'render')
+        if self.estilizada: self.render_views(wb)
             
         # 3. DATOS_VARIABLE
         if self.variable_data:
-            ws_vars = wb.create_sheet("DATOS_VARIABLE")
-            headers_vars = ["ANO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION", 
-                            "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL",
-                            "ARCHIVO", "HOJA"]
-            ws_vars.append(headers_vars)
-            
-            for row in self.variable_data:
-                ws_vars.append([row[k] for k in headers_vars])
+            hoja_tabla(wb, "DATOS_VARIABLE", self.HEADERS_VARS, self.variable_data)
+        return wb
+
+    def data_tables(self):
+        # Tablas planas tipadas una sola vez para todos los formatos de datos
+        keys_bruta = [k for k in self.flat_data[0].keys() if k not in CLAVES_INTERNAS]
+        return {"Carga Bruta": tipar(self.flat_data, keys_bruta),
+                "DATOS_VARIABLE": tipar(self.variable_data, self.HEADERS_VARS)}
+
+    def export_outputs(self):
+        # Resultado bruto para generar la Planilla Estilizada después ('render'), sin re-extraer
+        persistir({a: getattr(self, a) for a in self.ESTADO_BRUTO}, self.output_file)
+        # --format: el xlsx es opcional; parquet/csv/sqlite salen del mismo resultado en memoria
+        if "xlsx" in self.formatos:
+            if self.particion: exportar_particiones(self, *self.particion)
+            else: self.export_excel()
+        otros = [f for f in self.formatos if f != "xlsx"]
+        if otros: exportar_tablas(os.path.splitext(self.output_file)[0], self.data_tables(), otros)
+        if self.carga: generar_carga(self.folder_path, self.variable_data, self.carga)
+        if not self.estilizada: print(f"[INFO] Planilla Estilizada a pedido: python {os.path.basename(__file__)} render [--filtro REGION]")
 
-        while True:
-            try:
-                wb.save(self.output_file)
-                print(f"[ÉXITO] Archivo generado: {self.output_file}")
-                break
-            except PermissionError:
-                print(f"\n[ERROR DE PERMISO] El archivo '{self.output_file}' está ABIERTO.")
-                input("  >> Por favor CIERRA el Excel y presiona Enter para reintentar...")
-            except Exception as e:
-                print(f"\n[ERROR AL GUARDAR] {e}")
-                input("  >> Presiona Enter para reintentar...")
+    def export_excel(self):
+        print(f"\n{'='*60}\nGUARDANDO ARCHIVO MAESTRO (en segundo plano)...\n{'='*60}")
+        # Temporal + renombrado atómico; si el Excel está abierto se guarda con fecha-hora, sin bloquear
+        return guardar_en_segundo_plano(lambda ruta: self.build_workbook().guardar(ruta), self.output_file)
 
 if __name__ == "__main__":
+    render, carpeta, filtros, estilizada = vistas_de_argv()
+    formatos, particion, carga = formatos_de_argv(), particion_de_argv(), carga_de_argv()
+    decisiones = reglas_de_argv()   # --reglas: sin preguntas por consola
     try:
-        path = input("Ruta de la carpeta (Enter para actual): ").strip() or os.getcwd()
+        path = carpeta or decisiones.carpeta or decisiones.responder("ruta", "Ruta de la carpeta (Enter para actual): ") or os.getcwd()
         if os.path.isdir(path):
-            parser = IPSParserV402(path)
+            if render: renderizar(IPSParserV402(path), filtros); sys.exit()
+            parser = IPSParserV402(path, formatos, particion, carga, estilizada, decisiones)
             parser.process_folder()
         else: print("Ruta inválida.")
     except Exception as e:
         print(f"Error: {e}")
-        input("Enter para salir.")
\ No newline at end of file
+        if decisiones.interactivo: input("Enter para salir.")
\ No newline at end of file
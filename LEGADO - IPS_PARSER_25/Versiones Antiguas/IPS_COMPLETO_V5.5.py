@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 import re
+import json
+import hashlib
 import unicodedata
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
@@ -17,7 +19,8 @@ ARCHIVOS = {
     "VARS_APP": "VARIABLES_APLICADAS_IPS_2026.xlsx",
     "INDS_IPS": "INDICADORES_IPS_2026.xlsx",
     "INDS_APP": "INDICADORES_APLICADOS_IPS_2026.xlsx",
-    "MAPA_POND": "FCM_INFO_2025_v3_RMB(INDICADORES_PONDERADOS).csv"
+    "MAPA_POND": "FCM_INFO_2025_v3_RMB(INDICADORES_PONDERADOS).csv",
+    "MAPA_POND_IDX": "FCM_INFO_2025_v3_RMB(INDICADORES_PONDERADOS).idx.json"
 }
 
 HOJAS_CONFIG = {"CDC 2025": "CDC", "PMG 2025": "PMG", "Riesgos 2025": "Riesgos"}
@@ -393,24 +396,61 @@ def ejecutar_fase_4(dataframes_input=None):
 # BLOQUE 5: FASE 5 (INDICADORES APLICADOS)
 # =============================================================================
 
+def hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(65536), b""): h.update(bloque)
+    return h.hexdigest()
+
+def compilar_mapa_ponderados(ruta_csv):
+    """Lee el CSV una vez y arma el índice {clave normalizada: INDICADOR_COD}."""
+    df_map = pd.read_csv(ruta_csv, sep=";")
+    nombres = df_map['NOMBRE'] if 'NOMBRE' in df_map.columns else pd.Series([''] * len(df_map))
+    valores = df_map['INDICADOR_COD'] if 'INDICADOR_COD' in df_map.columns else pd.Series([''] * len(df_map))
+    mapa = {}
+    for nombre_raw, valor in zip(nombres, valores):
+        clave = normalizar_clave_responsable(nombre_raw)
+        if clave: mapa[clave] = valor.item() if hasattr(valor, 'item') else valor
+    return mapa
+
 def cargar_mapa_ponderados():
+    """
+    Devuelve el índice compilado del CSV de ponderados. El índice se guarda junto
+    al CSV (MAPA_POND_IDX) con el hash del CSV y sólo se recompila si éste cambió.
+    """
     if not os.path.exists(ARCHIVOS["MAPA_POND"]):
         print(f"[AVISO] No se encontró {ARCHIVOS['MAPA_POND']}. Columna AT (COD_PONDERADO) quedará vacía.")
         return {}
     try:
-        df_map = pd.read_csv(ARCHIVOS["MAPA_POND"], sep=";")
-        # NORMALIZACIÓN ROBUSTA DE LA CLAVE DEL CSV
-        mapa = {}
-        for _, row in df_map.iterrows():
-            nombre_raw = row.get('NOMBRE', '')
-            clave = normalizar_clave_responsable(nombre_raw)
-            valor = row.get('INDICADOR_COD', '')
-            if clave: mapa[clave] = valor
+        hash_csv = hash_archivo(ARCHIVOS["MAPA_POND"])
+        if os.path.exists(ARCHIVOS["MAPA_POND_IDX"]):
+            try:
+                with open(ARCHIVOS["MAPA_POND_IDX"], "r", encoding="utf-8") as f: idx = json.load(f)
+                if idx.get("sha256") == hash_csv: return idx.get("mapa", {})
+            except (ValueError, OSError): pass
+
+        mapa = compilar_mapa_ponderados(ARCHIVOS["MAPA_POND"])
+        try:
+            with open(ARCHIVOS["MAPA_POND_IDX"], "w", encoding="utf-8") as f:
+                json.dump({"csv": ARCHIVOS["MAPA_POND"], "sha256": hash_csv, "mapa": mapa}, f, ensure_ascii=False, indent=1)
+            print(f"   -> [OK] Índice de ponderados compilado: {ARCHIVOS['MAPA_POND_IDX']}")
+        except OSError as e:
+            print(f"[AVISO] No se pudo guardar el índice de ponderados: {e}")
         return mapa
     except Exception as e:
         print(f"[ERROR] Leyendo CSV mapa ponderados: {e}")
         return {}
 
+_CACHE_RESPONSABLES = {}
+
+def buscar_cod_ponderado(mapa_ponderados, responsable_raw):
+    """Resolver de COD_PONDERADO: normaliza cada responsable distinto una sola vez."""
+    if pd.isna(responsable_raw): responsable_raw = ""
+    clave = _CACHE_RESPONSABLES.get(responsable_raw)
+    if clave is None:
+        clave = _CACHE_RESPONSABLES[responsable_raw] = normalizar_clave_responsable(responsable_raw)
+    return mapa_ponderados.get(clave, None)
+
 def transformar_a_indicadores_aplicados(df_origen, etiqueta_origen, contador_nuevos_global, mapa_ponderados):
     filas_app = []
     
@@ -431,10 +471,8 @@ def transformar_a_indicadores_aplicados(df_origen, etiqueta_origen, contador_nue
 
         # --- AT. COD_PONDERADO (MATCHING) ---
         responsable_raw = row.get('RESPONSABLE CENTRO DE RESPONSABILIDAD', '')
-        # Aplicamos la misma normalización "agresiva" que al CSV
-        responsable_norm = normalizar_clave_responsable(responsable_raw)
-        
-        cod_ponderado = mapa_ponderados.get(responsable_norm, None)
+        # Misma normalización "agresiva" que al CSV (memorizada por responsable)
+        cod_ponderado = buscar_cod_ponderado(mapa_ponderados, responsable_raw)
         
         # --- AU. COD_VAR_AUTO ---
         cod_var_auto = f"A_{cod_ponderado}" if cod_ponderado else None
@@ -408,6 +408,16 @@ def ejecutar_fase_4(dataframes_input=None):
 # BLOQUE 5: FASE 5 (INDICADORES APLICADOS)
 # =============================================================================
 
+_CACHE_RESPONSABLES = {}
+
+def buscar_cod_ponderado(responsable_raw, mapa_ponderados=MAPA_PONDERADOS_INTERNO):
+    """Resolver de COD_PONDERADO: normaliza cada responsable distinto una sola vez."""
+    if pd.isna(responsable_raw): responsable_raw = ""
+    clave = _CACHE_RESPONSABLES.get(responsable_raw)
+    if clave is None:
+        clave = _CACHE_RESPONSABLES[responsable_raw] = normalizar_clave_responsable(responsable_raw)
+    return mapa_ponderados.get(clave, None)
+
 def transformar_a_indicadores_aplicados(df_origen, etiqueta_origen, contador_nuevos_global):
     filas_app = []
     for index, row in df_origen.iterrows():
@@ -421,8 +431,7 @@ def transformar_a_indicadores_aplicados(df_origen, etiqueta_origen, contador_nue
 
         # --- CRUCE CON MAPA INTERNO ---
         responsable_raw = row.get('RESPONSABLE CENTRO DE RESPONSABILIDAD', '')
-        responsable_clave = normalizar_clave_responsable(responsable_raw)
-        cod_ponderado = MAPA_PONDERADOS_INTERNO.get(responsable_clave, None)
+        cod_ponderado = buscar_cod_ponderado(responsable_raw)
         cod_var_auto = f"A_{cod_ponderado}" if cod_ponderado else None
 
         fila = {
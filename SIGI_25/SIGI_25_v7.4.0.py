@@ -11,15 +11,25 @@
 =============================================================================
 """
 
-import pandas as pd
 import os
+import sys
 import glob
 import re
 import warnings
 import unicodedata
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from openpyxl.utils import get_column_letter
+
+# Librería compartida (carpeta ips_core en la raíz del repositorio)
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+while not os.path.isdir(os.path.join(_RAIZ, "ips_core")) and os.path.dirname(_RAIZ) != _RAIZ:
+    _RAIZ = os.path.dirname(_RAIZ)
+sys.path.insert(0, _RAIZ)
+from ips_core.centros import IndiceCentros
+from ips_core.salida import escribir_libros
+from ips_core.formatos import formatos_de_argv, tipar, exportar_tablas
+from ips_core.vistas import vistas_de_argv, persistir, restaurar, coincide, ruta_vista
+from ips_core.arranque import perezoso, es_nulo
+
+pd = perezoso("pandas")   # se importa al leer la primera planilla (ips_core.arranque)
 
 # Silenciar alertas
 warnings.simplefilter(action='ignore', category=FutureWarning)
@@ -110,6 +120,13 @@ MAPA_NOMBRES_OFICIALES = {
 # 2. UTILS
 # =============================================================================
 
+_INDICES_MAPA = {}
+
+def indice_mapa(mapa):
+    # Un índice de n-gramas por mapa, construido la primera vez que se necesita
+    if id(mapa) not in _INDICES_MAPA: _INDICES_MAPA[id(mapa)] = IndiceCentros(mapa)
+    return _INDICES_MAPA[id(mapa)]
+
 def buscar_en_mapa(nombre_archivo, mapa):
     nombre_upper = nombre_archivo.upper()
     # Buscar por longitud de clave para priorizar coincidencias exactas (ej: LOS RIOS vs RIOS)
@@ -117,16 +134,19 @@ def buscar_en_mapa(nombre_archivo, mapa):
     for clave in claves:
         if clave in nombre_upper:
             return mapa[clave]
-    return "?"
+    # Sin coincidencia exacta: búsqueda aproximada (typos, tildes, espacios dobles).
+    # Sólo se acepta si el mejor candidato supera el umbral y se despega del segundo.
+    valor, _ = indice_mapa(mapa).resolver(nombre_archivo)
+    return valor if valor is not None else "?"
 
 def limpiar_porcentaje(val):
-    if pd.isna(val) or str(val).strip() == "": return 0
+    if es_nulo(val) or str(val).strip() == "": return 0
     s = str(val).replace('%', '').strip().replace(',', '.')
     try: return float(s)
     except: return 0
 
 def limpiar_numero(val):
-    if pd.isna(val) or str(val).strip() == "": return 0
+    if es_nulo(val) or str(val).strip() == "": return 0
     s = str(val).strip()
     if "," in s: s = s.replace('.', '').replace(',', '.')
     else: s = s.replace('.', '')
@@ -134,7 +154,7 @@ def limpiar_numero(val):
     except: return 0
 
 def limpiar_texto(val):
-    if pd.isna(val): return ""
+    if es_nulo(val): return ""
     return str(val).strip().replace("\n", " ").replace("\r", " ")
 
 def detectar_encabezados(df):
@@ -143,25 +163,6 @@ def detectar_encabezados(df):
         if any("INDICADOR" in x for x in fila): return i
     return None
 
-def aplicar_estilo_profesional(ruta, hoja):
-    try:
-        wb = load_workbook(ruta)
-        if hoja not in wb.sheetnames: return
-        ws = wb[hoja]
-        header_fill = PatternFill("solid", fgColor="1F4E78")
-        header_font = Font(b=True, color="FFFFFF", size=10)
-        border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
-        for cell in ws[1]:
-            cell.fill = header_fill; cell.font = header_font; cell.border = border
-        for row in ws.iter_rows(min_row=2):
-            es_sep = str(row[0].value).startswith("---")
-            for c in row:
-                c.border = border
-                if es_sep: c.fill = PatternFill("solid", fgColor="D9D9D9"); c.font = Font(b=True)
-        ws.column_dimensions["B"].width = 15; ws.column_dimensions["C"].width = 50
-        wb.save(ruta)
-    except: pass
-
 # =============================================================================
 # 3. MOTOR DE EXTRACCIÓN
 # =============================================================================
@@ -172,6 +173,9 @@ def procesar_archivo(ruta_archivo):
     nombre_oficial = buscar_en_mapa(nombre_archivo, MAPA_NOMBRES_OFICIALES)
     
     print(f"   -> Procesando: {nombre_archivo[:35]}... (CR: {nombre_oficial})")
+    if nombre_oficial == "?":
+        cands = indice_mapa(MAPA_NOMBRES_OFICIALES).candidatos(nombre_archivo)
+        if cands: print("      [AVISO] CR ambiguo. Candidatos: " + ", ".join(f"{v} ({p})" for v, _, p in cands))
     
     dfs_extraidos = []
     try:
@@ -201,7 +205,7 @@ def procesar_archivo(ruta_archivo):
             extracted_rows = []
             for i in range(idx_header + 1, len(df) - 5):
                 val_num = str(df.iloc[i, IDX_NUM]).strip()
-                if pd.notna(df.iloc[i, IDX_NUM]) and "." in val_num and len(val_num) >= 3:
+                if not es_nulo(df.iloc[i, IDX_NUM]) and "." in val_num and len(val_num) >= 3:
                     try:
                         meta_raw = df.iloc[i+1, IDX_OP_EST]
                         meta = limpiar_porcentaje(meta_raw) if isinstance(meta_raw, str) and "%" in meta_raw else limpiar_numero(meta_raw)
@@ -371,7 +375,17 @@ def generar_f5(df_f1):
 # 5. EJECUCIÓN
 # =============================================================================
 
-def ejecutar_masivo():
+def libros_visuales(df_full, f2, f3, f4, f5, sufijo=None):
+    """Vistas estilizadas: F1 completo (DATOS_BRUTOS + DATOS_ESTILIZADOS) y F3 (VISUAL_*)."""
+    ancho = {"B": 15, "C": 50}
+    ruta = lambda f: ruta_vista(ARCHIVOS_SALIDA[f], sufijo) if sufijo else ARCHIVOS_SALIDA[f]
+    return [
+        (ruta("F1"), [("DATOS_BRUTOS", df_full, False, None), ("DATOS_ESTILIZADOS", df_full, True, ancho)]),
+        (ruta("F3"), [("VISUAL_VARIABLES", f2, True, ancho), ("VISUAL_VAR_APP", f3, True, ancho),
+                      ("VISUAL_INDICADORES", f4, True, ancho), ("VISUAL_IND_APP", f5, True, ancho)]),
+    ]
+
+def ejecutar_masivo(formatos=("xlsx",), estilizada=False):
     archivos = [f for f in glob.glob("*.xlsx") if not f.startswith("1_") and not f.startswith("2_") and not f.startswith("3_") and not f.startswith("~$")]
     print(f"\n[SIGI 25 v7.4.0] PROCESO MASIVO CON NOMBRES OFICIALES ({len(archivos)} archivos)")
     
@@ -388,31 +402,45 @@ def ejecutar_masivo():
     print("\n   -> Generando Archivos Finales...")
     df_full = pd.concat(master_list, ignore_index=True)
     
-    with pd.ExcelWriter(ARCHIVOS_SALIDA["F1"], engine='openpyxl') as w:
-        df_full.to_excel(w, index=False, sheet_name="DATOS_BRUTOS")
-        df_full.to_excel(w, index=False, sheet_name="DATOS_ESTILIZADOS")
-    aplicar_estilo_profesional(ARCHIVOS_SALIDA["F1"], "DATOS_ESTILIZADOS")
-    
     f2 = generar_f2(df_full)
     f3 = generar_f3(f2, df_full) # Se pasa df_full para el cruce de nombres
     f4 = generar_f4(df_full); f5 = generar_f5(df_full)
     
-    with pd.ExcelWriter(ARCHIVOS_SALIDA["F2"], engine='openpyxl') as w:
-        f2.to_excel(w, index=False, sheet_name="F2_VARIABLES")
-        f3.to_excel(w, index=False, sheet_name="F3_VAR_APLICADAS")
-        f4.to_excel(w, index=False, sheet_name="F4_INDICADORES")
-        f5.to_excel(w, index=False, sheet_name="F5_IND_APLICADOS")
-        
-    with pd.ExcelWriter(ARCHIVOS_SALIDA["F3"], engine='openpyxl') as w:
-        f2.to_excel(w, index=False, sheet_name="VISUAL_VARIABLES")
-        f3.to_excel(w, index=False, sheet_name="VISUAL_VAR_APP")
-        f4.to_excel(w, index=False, sheet_name="VISUAL_INDICADORES")
-        f5.to_excel(w, index=False, sheet_name="VISUAL_IND_APP")
-    
-    for h in ["VISUAL_VARIABLES", "VISUAL_VAR_APP", "VISUAL_INDICADORES", "VISUAL_IND_APP"]:
-        aplicar_estilo_profesional(ARCHIVOS_SALIDA["F3"], h)
+    # Resultado bruto para generar las vistas estilizadas después ('render'), sin re-extraer
+    persistir({"df_full": df_full}, ARCHIVOS_SALIDA["F1"])
+
+    # Cada DataFrame se convierte a celdas una vez; los archivos se escriben en paralelo.
+    # DATOS_ESTILIZADOS y F3 (VISUAL_*) sólo con --estilizada; si no, a pedido con 'render'
+    if "xlsx" in formatos:
+        brutos = [(ARCHIVOS_SALIDA["F2"], [("F2_VARIABLES", f2, False, None), ("F3_VAR_APLICADAS", f3, False, None),
+                                           ("F4_INDICADORES", f4, False, None), ("F5_IND_APLICADOS", f5, False, None)])]
+        if estilizada: escribir_libros(libros_visuales(df_full, f2, f3, f4, f5) + brutos)
+        else: escribir_libros([(ARCHIVOS_SALIDA["F1"], [("DATOS_BRUTOS", df_full, False, None)])] + brutos)
+
+    # --format parquet/csv/sqlite: mismas tablas, tipadas una vez, sin pasar por Excel
+    otros = [f for f in formatos if f != "xlsx"]
+    if otros:
+        tablas = {"DATOS_BRUTOS": tipar(df_full), "F2_VARIABLES": tipar(f2), "F3_VAR_APLICADAS": tipar(f3),
+                  "F4_INDICADORES": tipar(f4), "F5_IND_APLICADOS": tipar(f5)}
+        exportar_tablas(os.path.splitext(ARCHIVOS_SALIDA["F2"])[0], tablas, otros)
 
     print(f"\n   ¡LISTO! Revisa: {ARCHIVOS_SALIDA['F2']}")
+    if not estilizada: print(f"   Vistas estilizadas (F3 y DATOS_ESTILIZADOS) a pedido: python {os.path.basename(__file__)} render [--filtro REGION]")
+
+def render_vistas(filtros=None):
+    """Genera F1 estilizado y F3 desde el resultado guardado, opcionalmente sólo para algunos archivos/CR."""
+    df_full = restaurar(ARCHIVOS_SALIDA["F1"])["df_full"]
+    if filtros:
+        mascara = [coincide([a, cr], filtros) for a, cr in zip(df_full["ORIGEN_ARCHIVO"], df_full["NOMBRE_OFICIAL_CR"])]
+        df_full = df_full[mascara].reset_index(drop=True)
+        if df_full.empty: print(f"[ERROR] Ningún archivo ni CR coincide con: {', '.join(filtros)}"); return
+    f2 = generar_f2(df_full)
+    f3 = generar_f3(f2, df_full)
+    f4 = generar_f4(df_full); f5 = generar_f5(df_full)
+    for ruta in escribir_libros(libros_visuales(df_full, f2, f3, f4, f5, filtros)): print(f"[ÉXITO] Vista estilizada: {ruta}")
 
 if __name__ == "__main__":
-    ejecutar_masivo()
\ No newline at end of file
+    render, carpeta, filtros, estilizada = vistas_de_argv()
+    if carpeta: os.chdir(carpeta)
+    if render: render_vistas(filtros)
+    else: ejecutar_masivo(formatos_de_argv(), estilizada)
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""
+=============================================================================
+ ips_core - Utilidades compartidas por los consolidadores IPS
+=============================================================================
+ Módulos usados por IPS_CONSOLIDADO (v4.x), IPS_HYBRID (v1.x),
+ IPS_ADP_PARSER (v1.x) y SIGI_25 (v7.x). Cada script ubica esta carpeta
+ subiendo desde su propia ubicación, por lo que basta con que ips_core/
+ esté en la raíz del repositorio.
+
+ Para varias carpetas en un solo proceso:
+   python -m ips_core consolidate --profile v402 DIR1 DIR2 ...  (ips_core.cli)
+ Para consolidar a medida que llegan las planillas:
+   python -m ips_core watch --profile v402 DIR1 DIR2 --reglas R.json  (ips_core.vigilancia)
+ Para repartir una carpeta entre varios equipos y juntar los paquetes:
+   python -m ips_core shard|merge --profile v402 DIR ...  (ips_core.fragmentos)
+=============================================================================
+"""
@@ -0,0 +1,7 @@
+"""Punto de entrada de 'python -m ips_core': los comandos y opciones están en ips_core.cli."""
+
+import sys
+
+from ips_core.cli import main
+
+sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Series mensuales de operandos: acumulados derivados y cotejo con lo digitado.
+
+Las planillas traen, por indicador, el valor mensual de cada operando y (no
+siempre) una columna "Acum" al lado. Aquí se arma una matriz float
+(indicadores x meses) por operando, se calcula el acumulado con NumPy para
+todos los indicadores de una vez, se completan los acumulados que faltan y se
+marcan los que no calzan con el cálculo.
+
+No todos los operandos se acumulan sumando: los denominadores suelen ser un
+stock (dotación, total de casos) cuyo "Acum" repite el valor del mes. Por
+eso, por cada indicador se elige el modo (suma o último valor) que más calza
+con los acumulados ya digitados; sin acumulados digitados se asume suma.
+Como ese cálculo puede no ser el dato real, los acumulados completados
+quedan anotados aparte (CLAVE_DERIVADO) y se pintan de otro color que los
+digitados; los que no calzan se pintan en naranjo (CLAVE_REVISAR).
+"""
+
+from ips_core.arranque import perezoso
+
+np = perezoso("numpy")
+
+TOLERANCIA = 0.005          # Diferencia relativa aceptada entre acumulado leído y calculado
+VACIOS = ("", "No aplica")   # Valores de celda que se consideran "sin acumulado"
+
+# Claves internas en cada fila (no se exportan): columnas Acum que no calzan / que se completaron con el cálculo
+CLAVE_REVISAR = "_ACUM_REVISAR"
+CLAVE_DERIVADO = "_ACUM_DERIVADO"
+CLAVES_INTERNAS = (CLAVE_REVISAR, CLAVE_DERIVADO)
+
+def a_numero(val):
+    """Valor de celda -> float (NaN si no es numérico)."""
+    if val is None or isinstance(val, bool): return np.nan
+    if isinstance(val, (int, float, np.number)): return float(val)
+    txt = str(val).strip().replace(" ", "")
+    if not txt: return np.nan
+    if "," in txt and "." not in txt: txt = txt.replace(",", ".")
+    try: return float(txt)
+    except ValueError: return np.nan
+
+def matriz(filas, claves):
+    """Matriz (len(filas) x len(claves)) de floats; claves None -> columna NaN."""
+    m = np.full((len(filas), len(claves)), np.nan)
+    for j, k in enumerate(claves):
+        if k is None: continue
+        m[:, j] = [a_numero(f.get(k)) for f in filas]
+    return m
+
+def acumular(mensual):
+    """
+    Suma acumulada por fila ignorando los meses vacíos. Sólo hay acumulado en los
+    meses que tienen valor propio (no se arrastra hacia meses futuros sin dato).
+    """
+    calc = np.cumsum(np.nan_to_num(mensual, nan=0.0), axis=1)
+    calc[np.isnan(mensual)] = np.nan
+    return calc
+
+def _coinciden(leido, calc, tolerancia):
+    escala = np.maximum(1.0, np.abs(np.nan_to_num(calc)))
+    return (~np.isnan(leido) & ~np.isnan(calc) &
+            (np.abs(np.nan_to_num(leido) - np.nan_to_num(calc)) <= tolerancia * escala))
+
+def derivar_acumulados(filas, cols_mes, cols_acum, tolerancia=TOLERANCIA):
+    """
+    filas     -> lista de dicts (se modifican en el lugar)
+    cols_mes  -> claves del valor mensual, en orden cronológico
+    cols_acum -> claves del acumulado de cada mes (None si ese mes no tiene Acum)
+
+    Completa los acumulados vacíos con el cálculo (anotándolos en fila[CLAVE_DERIVADO])
+    y agrega a fila[CLAVE_REVISAR] las claves cuyo acumulado digitado difiere del calculado.
+    Devuelve (n_completados, n_diferencias).
+    """
+    if not filas: return 0, 0
+    mensual = matriz(filas, cols_mes)
+    leido = matriz(filas, cols_acum)
+
+    # Modo por indicador: suma acumulada vs. último valor (stock)
+    suma = acumular(mensual)
+    es_stock = _coinciden(leido, mensual, tolerancia).sum(axis=1) > _coinciden(leido, suma, tolerancia).sum(axis=1)
+    calc = np.where(es_stock[:, None], mensual, suma)
+
+    hay_calc = ~np.isnan(calc)
+    hay_leido = ~np.isnan(leido)
+    con_col = np.array([k is not None for k in cols_acum])
+
+    difiere = hay_calc & hay_leido & ~_coinciden(leido, calc, tolerancia)
+    completar = hay_calc & ~hay_leido & con_col
+
+    n_comp = 0
+    for i, j in zip(*np.nonzero(completar)):
+        k = cols_acum[j]
+        if filas[i].get(k, "") in VACIOS:
+            v = calc[i, j]
+            filas[i][k] = int(v) if float(v).is_integer() else round(float(v), 4)
+            filas[i].setdefault(CLAVE_DERIVADO, set()).add(k)
+            n_comp += 1
+
+    for i, j in zip(*np.nonzero(difiere)):
+        filas[i].setdefault(CLAVE_REVISAR, set()).add(cols_acum[j])
+
+    return n_comp, int(difiere.sum())
+
+def marcas_acumulados(estilo_revisar, estilo_derivado):
+    """Función fila -> {clave: estilo} para el parámetro 'marcas' de las hojas de ips_core.salida."""
+    def marcas(fila):
+        m = dict.fromkeys(fila.get(CLAVE_DERIVADO, ()), estilo_derivado)
+        m.update(dict.fromkeys(fila.get(CLAVE_REVISAR, ()), estilo_revisar))
+        return m
+    return marcas
@@ -0,0 +1,102 @@
+"""
+Arranque liviano: importaciones diferidas y reporte de tiempos de importación.
+
+pandas, numpy y el stack de estilos de openpyxl cuestan casi un segundo en
+importarse, y muchos caminos no los usan (ayuda de la línea de comandos,
+'render' de SIGI/ADP, búsqueda de archivos, el reporte de revisión). Los
+módulos de ips_core y los scripts los declaran con perezoso(): el módulo real
+se importa en el primer uso de un atributo (pd.read_excel, np.nan, ...).
+es_nulo() reemplaza a pd.isna/pd.notna en los valores de celda del camino
+caliente (mismo resultado para escalares, sin pasar por pandas).
+
+Reporte con presupuesto (falla con código 1 si alguno se excede):
+
+    python -m ips_core.arranque
+"""
+
+import importlib
+import os
+import re
+import sys
+import threading
+
+class _Perezoso:
+    """Módulo que se importa en el primer acceso a uno de sus atributos (seguro entre hilos)."""
+
+    def __init__(self, nombre):
+        self._nombre, self._modulo, self._lock = nombre, None, threading.Lock()
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            with self._lock:
+                if self._modulo is None: self._modulo = importlib.import_module(self._nombre)
+        valor = getattr(self._modulo, atributo)
+        self.__dict__[atributo] = valor   # los siguientes accesos no pasan por aquí
+        return valor
+
+    def __repr__(self):
+        return f"<módulo diferido '{self._nombre}'{' (cargado)' if self._modulo else ''}>"
+
+def perezoso(nombre):
+    """'pandas' -> el módulo si ya está importado, si no un sustituto que lo importa al primer uso."""
+    return sys.modules.get(nombre) or _Perezoso(nombre)
+
+def es_nulo(valor):
+    """pd.isna() para un valor de celda: None, NaN o NaT."""
+    try: return valor is None or bool(valor != valor)
+    except (TypeError, ValueError): return True   # pd.NA
+
+# =============================================================================
+# REPORTE DE TIEMPOS DE IMPORTACIÓN
+# =============================================================================
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ("pandas", "numpy", "openpyxl")
+
+# Objetivo -> (código a importar, presupuesto en ms, pesados permitidos)
+PRESUPUESTO = {
+    "ips_core.cli (ayuda)": ("import ips_core.cli", 120, ()),
+    "ips_core.decisiones": ("import ips_core.decisiones", 80, ()),
+    "ips_core.vistas": ("import ips_core.vistas", 80, ()),
+    "perfil v402": ("import ips_core.cli as c; c.cargar_perfil('v402')", 150, ()),
+    "perfil hybrid": ("import ips_core.cli as c; c.cargar_perfil('hybrid')", 150, ()),
+    "perfil adp": ("import ips_core.cli as c; c.cargar_perfil('adp')", 150, ()),
+    "perfil sigi": ("import ips_core.cli as c; c.cargar_perfil('sigi')", 150, ()),
+    "extracción (pandas)": ("import ips_core.cli as c; c.cargar_perfil('v402').pd.read_excel", 1000, PESADOS),
+}
+
+_LINEA = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+def medir(codigo):
+    """
+    Ejecuta 'codigo' en un intérprete nuevo con -X importtime.
+    Devuelve (ms totales, {paquete: ms de su importación más costosa}).
+    """
+    import subprocess
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=RAIZ,
+                       capture_output=True, text=True)
+    if r.returncode != 0: raise RuntimeError(r.stderr.strip().splitlines()[-1])
+    total, paquetes = 0, {}
+    for m in _LINEA.finditer(r.stderr):
+        acumulado, sangria, raiz = int(m.group(2)), len(m.group(3)), m.group(4).split(".")[0]
+        if sangria == 1: total += acumulado   # primer nivel (las anidadas ya están en su acumulado)
+        paquetes[raiz] = max(paquetes.get(raiz, 0), acumulado)
+    return total / 1000, {k: v / 1000 for k, v in paquetes.items()}
+
+def reporte(presupuesto=PRESUPUESTO):
+    """Imprime el tiempo de cada objetivo contra su presupuesto. Devuelve cuántos se exceden."""
+    print(f"{'OBJETIVO':<24} {'MS':>8} {'PRESUP.':>8}  ESTADO  MÁS PESADOS")
+    excedidos = 0
+    for objetivo, (codigo, limite, permitidos) in presupuesto.items():
+        ms, paquetes = medir(codigo)
+        pesados = [p for p in PESADOS if p in paquetes and p not in permitidos]
+        ok = ms <= limite and not pesados
+        excedidos += not ok
+        externos = {p: v for p, v in paquetes.items() if p != "ips_core" and not p.startswith("ips_perfil")}
+        top = ", ".join(f"{p} {v:.0f}" for p, v in sorted(externos.items(), key=lambda x: -x[1])[:3])
+        estado = "OK" if ok else ("PESADO" if pesados else "EXCEDE")
+        print(f"{objetivo:<24} {ms:>8.0f} {limite:>8}  {estado:<6}  {top}" + (f"  [importa {', '.join(pesados)}]" if pesados else ""))
+    return excedidos
+
+if __name__ == "__main__":
+    sys.exit(1 if reporte() else 0)
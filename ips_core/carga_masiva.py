@@ -0,0 +1,213 @@
+"""
+Archivo de "carga masiva" de variables para el SIG (hoja DATOS_VARIABLES).
+
+Hasta ahora se armaba a mano ('ALVARO/IPS - carga masiva 202510 a 202512'):
+se copiaba DATOS_VARIABLE, se buscaba con BUSCARV el centro de
+responsabilidad oficial de cada variable y se dejaban sólo las filas con
+valor. Aquí se genera directo desde los registros de variables de los
+parsers (o desde la hoja DATOS_VARIABLE de un consolidado ya generado), para
+cualquier rango ANO/MES, con el orden y tipos de columnas de la plantilla.
+
+Lectura y escritura son en streaming (openpyxl read-only / write-only): una
+carga de un año completo para todas las regiones no crece en memoria.
+
+El CENTRO_RESP_COD de cada variable sale de '--mapa-cr' (obligatorio: la
+carga anterior o el DATOS_VARIABLES del SIG). Lo que traen los consolidados
+en esa columna es el equipo tal como se leyó, no el código oficial; si una
+variable no está en el mapa no se escribe el archivo y se listan las filas
+(con el nombre del catálogo más parecido, como ayuda para completar el mapa).
+
+Uso directo:
+    python -m ips_core.carga_masiva CONSOLIDADO.xlsx --desde 202510 --hasta 202512 --mapa-cr REFERENCIA.xlsx
+"""
+
+import argparse
+import os
+import re
+import sys
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ips_core.centros import indice_catalogo
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import guardar_atomico
+
+# Orden y tipos de la plantilla de importación del SIG
+COLUMNAS_CARGA = ["ANO", "MES", "VARIABLE_COD", "CENTRO_RESP_COD", "COD_REGION",
+                  "VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL"]
+HOJA_CARGA = "DATOS_VARIABLES"
+VALORES = ["VALOR_M", "VALOR_F", "VALOR_S", "VALOR_J", "VALOR_TOTAL"]
+
+# Hojas de variables en los consolidados (V402/Hybrid, ADP)
+HOJAS_VARIABLES = ("DATOS_VARIABLE", "SIG_DATOS_VARIABLES", HOJA_CARGA)
+
+def _entero(v):
+    try: return int(float(str(v).strip()))
+    except (TypeError, ValueError): return None
+
+def _numero(v):
+    """Celda -> int/float, o None si está vacía o no es numérica ('No aplica', '-', ...)."""
+    if v is None or isinstance(v, bool): return None
+    if isinstance(v, (int, float)):
+        if v != v: return None
+        return int(v) if float(v).is_integer() else v
+    txt = str(v).strip().replace(" ", "")
+    if "," in txt and "." not in txt: txt = txt.replace(",", ".")
+    try: n = float(txt)
+    except ValueError: return None
+    return int(n) if n.is_integer() else n
+
+def periodo(texto):
+    """'202510' / '2025-10' / '10-2025' -> 202510."""
+    dig = "".join(c for c in str(texto) if c.isdigit())
+    if len(dig) != 6: raise ValueError(f"Periodo inválido '{texto}' (use AAAAMM)")
+    if not dig.startswith(("19", "20")): dig = dig[2:] + dig[:2]
+    return int(dig)
+
+def leer_mapa_cr(ruta):
+    """
+    VARIABLE_COD -> CENTRO_RESP_COD oficial, desde cualquier hoja de 'ruta' que tenga
+    ambas columnas con valores (p. ej. la carga anterior o el DATOS_VARIABLES_2025 del SIG).
+    """
+    mapa = {}
+    from openpyxl import load_workbook
+    wb = load_workbook(ruta, read_only=True, data_only=True)
+    for ws in wb.worksheets:
+        filas = ws.iter_rows(values_only=True)
+        cab = [str(c).strip().upper() if c is not None else "" for c in next(filas, ())]
+        if "VARIABLE_COD" not in cab or "CENTRO_RESP_COD" not in cab: continue
+        i_var, i_cr = cab.index("VARIABLE_COD"), cab.index("CENTRO_RESP_COD")
+        for f in filas:
+            var = f[i_var] if i_var < len(f) else None
+            cr = f[i_cr] if i_cr < len(f) else None
+            if var and cr and not str(cr).startswith("="):
+                mapa.setdefault(str(var).strip(), str(cr).strip())
+    wb.close()
+    return mapa
+
+def leer_variables(ruta, hoja=None):
+    """Genera los registros (dicts) de la hoja de variables de un consolidado, en streaming."""
+    from openpyxl import load_workbook
+    wb = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        nombre = hoja or next((h for h in HOJAS_VARIABLES if h in wb.sheetnames), None)
+        if nombre is None: raise ValueError(f"'{os.path.basename(ruta)}' no tiene hoja de variables {HOJAS_VARIABLES}")
+        filas = wb[nombre].iter_rows(values_only=True)
+        cab = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+        for f in filas:
+            yield dict(zip(cab, f))
+    finally:
+        wb.close()
+
+def filas_carga(registros, desde=None, hasta=None, mapa_cr=None, resumen=None):
+    """
+    Registros de variables -> filas de la plantilla (listas en el orden COLUMNAS_CARGA).
+    Se omiten los registros fuera de [desde, hasta] (AAAAMM), sin ningún valor
+    numérico y los duplicados (ANO, MES, VARIABLE_COD) después del primero.
+    El CR oficial sale de 'mapa_cr'; las variables que no están se omiten y quedan en
+    resumen["sin_cr"] como (ANO, MES, VARIABLE_COD, CR del consolidado, nombre del catálogo o None).
+    'resumen' (dict opcional) acumula los conteos.
+    """
+    resumen = resumen if resumen is not None else {}
+    for k in ("filas", "fuera_rango", "sin_valor", "duplicadas"): resumen.setdefault(k, 0)
+    resumen.setdefault("sin_cr", [])
+    mapa_cr = mapa_cr or {}
+    cache_cr, vistas = {}, set()
+
+    for reg in registros:
+        ano, mes = _entero(reg.get("ANO", reg.get("AÑO"))), _entero(reg.get("MES"))
+        if ano is None or mes is None: continue
+        per = ano * 100 + mes
+        if (desde and per < desde) or (hasta and per > hasta):
+            resumen["fuera_rango"] += 1; continue
+
+        valores = [_numero(reg.get(k)) for k in VALORES]
+        if all(v is None for v in valores):
+            resumen["sin_valor"] += 1; continue
+
+        var = str(reg.get("VARIABLE_COD") or "").strip()
+        if (ano, mes, var) in vistas:
+            resumen["duplicadas"] += 1; continue
+        vistas.add((ano, mes, var))
+
+        cr = mapa_cr.get(var)
+        if cr is None:
+            crudo = str(reg.get("CENTRO_RESP_COD") or "").strip()
+            if crudo not in cache_cr: cache_cr[crudo] = indice_catalogo().resolver(crudo)[0]
+            resumen["sin_cr"].append((ano, mes, var, crudo, cache_cr[crudo]))
+            continue
+
+        region = _entero(reg.get("COD_REGION"))
+        resumen["filas"] += 1
+        yield [ano, mes, var, cr, region if region is not None else 0] + valores
+
+class _SinCR(Exception):
+    """Hay variables sin CR oficial: el archivo de carga no se deja."""
+
+def escribir_carga_masiva(registros, ruta, desde=None, hasta=None, mapa_cr=None):
+    """
+    Escribe el archivo de carga (hoja DATOS_VARIABLES) fila a fila. Devuelve (ruta_final, resumen);
+    ruta_final es None si alguna variable no tiene CR oficial (resumen["sin_cr"]).
+    """
+    resumen = {}
+    def escribir(destino):
+        wb = nuevo_libro()
+        ws = wb.hoja(HOJA_CARGA)
+        wb.fila(ws, COLUMNAS_CARGA)
+        for fila in filas_carga(registros, desde, hasta, mapa_cr, resumen):
+            wb.fila(ws, fila)
+        if resumen["sin_cr"]: raise _SinCR()   # guardar_atomico() borra el temporal
+        wb.guardar(destino)
+    try: ruta = guardar_atomico(escribir, ruta)
+    except _SinCR: ruta = None
+    return ruta, resumen
+
+def nombre_carga(carpeta, desde, hasta):
+    """Mismo patrón que la planilla manual: 'IPS - carga masiva 202510 a 202512.xlsx'."""
+    return os.path.join(carpeta, f"IPS - carga masiva {desde or 'inicio'} a {hasta or 'fin'}.xlsx")
+
+def informar(ruta, resumen, max_filas=20):
+    """Resumen de escribir_carga_masiva() en consola. Devuelve False si no se escribió el archivo."""
+    sin_cr = resumen.get("sin_cr", [])
+    if ruta: print(f"[ÉXITO] Carga masiva: {ruta}")
+    else: print(f"[ERROR] Carga masiva NO generada: {len(sin_cr)} fila(s) con variables que no están en --mapa-cr.")
+    print(f"  * {'Filas exportadas:' if ruta else 'Filas con CR oficial:':<30}{resumen.get('filas', 0)}")
+    print(f"  * Omitidas fuera de rango:      {resumen.get('fuera_rango', 0)}")
+    print(f"  * Omitidas sin valor:           {resumen.get('sin_valor', 0)}")
+    print(f"  * Omitidas duplicadas:          {resumen.get('duplicadas', 0)}")
+    if sin_cr:
+        print("  * Sin CR oficial (ANO-MES | VARIABLE_COD | CR del consolidado | catálogo):")
+        for ano, mes, var, crudo, sugerido in sin_cr[:max_filas]:
+            print(f"      {ano}-{mes:02d} | {var} | {crudo or '-'} | {sugerido or '(sin coincidencia)'}")
+        if len(sin_cr) > max_filas: print(f"      ... y {len(sin_cr) - max_filas} más")
+    return ruta is not None
+
+def carga_de_argv(argv=None):
+    """'--carga-masiva AAAAMM-AAAAMM --mapa-cr REF.xlsx' -> (desde, hasta, mapa_cr) o None."""
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--carga-masiva")
+    ap.add_argument("--mapa-cr")
+    args, _ = ap.parse_known_args(argv)
+    if not args.carga_masiva: return None
+    periodos = re.findall(r'\d{6}', args.carga_masiva)
+    if len(periodos) not in (1, 2): raise SystemExit(f"[ERROR] --carga-masiva espera AAAAMM o AAAAMM-AAAAMM (recibido '{args.carga_masiva}')")
+    if not args.mapa_cr: raise SystemExit("[ERROR] --carga-masiva requiere --mapa-cr REF.xlsx (VARIABLE_COD -> CENTRO_RESP_COD oficial).")
+    return periodo(periodos[0]), periodo(periodos[-1]), leer_mapa_cr(args.mapa_cr)
+
+def generar_carga(carpeta, registros, opcion):
+    """Atajo para los parsers: opcion = carga_de_argv(). Devuelve False si el archivo no se generó."""
+    desde, hasta, mapa_cr = opcion
+    return informar(*escribir_carga_masiva(registros, nombre_carga(carpeta, desde, hasta), desde, hasta, mapa_cr))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Genera el archivo de carga masiva de variables del SIG.")
+    ap.add_argument("consolidado", help="xlsx con hoja DATOS_VARIABLE / SIG_DATOS_VARIABLES")
+    ap.add_argument("--desde", type=periodo, help="AAAAMM inicial (incluido)")
+    ap.add_argument("--hasta", type=periodo, help="AAAAMM final (incluido)")
+    ap.add_argument("--hoja", help="Hoja de variables (por defecto se detecta)")
+    ap.add_argument("--mapa-cr", required=True, help="xlsx con VARIABLE_COD y CENTRO_RESP_COD oficiales")
+    ap.add_argument("--salida", help="Ruta del archivo a generar")
+    a = ap.parse_args()
+    salida = a.salida or nombre_carga(os.path.dirname(os.path.abspath(a.consolidado)), a.desde, a.hasta)
+    ok = informar(*escribir_carga_masiva(leer_variables(a.consolidado, a.hoja), salida, a.desde, a.hasta, leer_mapa_cr(a.mapa_cr)))
+    sys.exit(0 if ok else 1)
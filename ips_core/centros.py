@@ -0,0 +1,163 @@
+"""
+Catálogo oficial de Centros de Responsabilidad (CR) y búsqueda aproximada.
+
+Cuando ni el nombre del archivo ni la cabecera de la hoja calzan con una clave
+conocida, los consolidadores terminaban en "?" (SIGI) o en una pregunta manual
+(IPS_CONSOLIDADO / IPS_HYBRID). Aquí se indexan los nombres oficiales y sus
+alias por n-gramas de caracteres para devolver candidatos con puntaje, de modo
+que los casos claros ("REG  Los Rios", "Aisen", "Nuble") se acepten solos y
+sólo se pregunte lo realmente ambiguo.
+"""
+
+import re
+import unicodedata
+
+# =============================================================================
+# 1. CATÁLOGO OFICIAL (Basado en FCM_INFO_2025_v3_RMB)
+# =============================================================================
+
+# (Código IP, Nombre oficial CR, Alias conocidos en nombres de archivo/hojas)
+CATALOGO_CR = [
+    ("IP25_711", "FORMULARIO H", []),
+    ("IP25_712", "DIVISION BENEFICIOS", ["BENEFICIOS", "DIV BENEFICIOS"]),
+    ("IP25_713", "SUBDIRECCION SERVICIOS AL CLIENTE", ["CLIENTES", "SUBDIR CLIENTES"]),
+    ("IP25_714", "DIVISION INFORMATICA", ["INFORMATICA", "DIV INFORMATICA"]),
+    ("IP25_715", "DIVISION JURIDICA", ["JURIDICA"]),
+    ("IP25_716", "DIVISION PLANIFICACION Y DESARROLLO", ["PLANIFICACION"]),
+    ("IP25_717", "DEPARTAMENTO DE COMUNICACIONES", ["COMUNICACIONES"]),
+    ("IP25_718", "DEPARTAMENTO CONTRALORIA INTERNA", ["CONTRALORIA", "CONTRALORIA INTERNA"]),
+    ("IP25_719", "DIRECCION REGIONAL DE ARICA Y PARINACOTA", ["ARICA", "PARINACOTA"]),
+    ("IP25_720", "DIRECCION REGIONAL TARAPACA", ["TARAPACA"]),
+    ("IP25_721", "DIRECCION REGIONAL ANTOFAGASTA", ["ANTOFAGASTA"]),
+    ("IP25_722", "DIRECCION REGIONAL ATACAMA", ["ATACAMA"]),
+    ("IP25_723", "DIRECCION REGIONAL COQUIMBO", ["COQUIMBO"]),
+    ("IP25_724", "DIRECCION REGIONAL VALPARAISO", ["VALPARAISO"]),
+    ("IP25_725", "DIRECCION REGIONAL OHIGGINS", ["OHIGGINS", "LIBERTADOR"]),
+    ("IP25_726", "DIRECCION REGIONAL MAULE", ["MAULE"]),
+    ("IP25_727", "DIRECCION REGIONAL BIO BIO", ["BIOBIO"]),
+    ("IP25_728", "DIRECCION REGIONAL ARAUCANIA", ["ARAUCANIA"]),
+    ("IP25_729", "DIRECCION REGIONAL DE LOS RIOS", ["LOS RIOS"]),
+    ("IP25_730", "DIRECCION REGIONAL DE LOS LAGOS", ["LOS LAGOS"]),
+    ("IP25_731", "DIRECCION REGIONAL AYSEN", ["AYSEN", "AISEN"]),
+    ("IP25_732", "DIRECCION REGIONAL MAGALLANES", ["MAGALLANES"]),
+    ("IP25_733", "DIRECCION REGIONAL METROPOLITANA", ["METROPOLITANA"]),
+    ("IP25_738", "DEPARTAMENTO AUDITORIA INTERNA", ["AUDITORIA", "AUDITORIA INTERNA"]),
+    ("IP25_739", "SUBDIRECCION SISTEMAS DE INFORMACION Y ADMINISTRACIÓN", ["SIST INFORM", "SISTEMAS DE INFORMACION"]),
+    ("IP25_748", "DIRECCION REGIONAL ÑUBLE", ["ÑUBLE", "NUBLE"]),
+    ("IP25_750", "DEPARTAMENTO GESTION Y DESARROLLO DE PERSONAS", ["GESTION PERSONAS", "DESARROLLO DE PERSONAS"]),
+]
+
+# Palabras que aparecen en casi todos los nombres de archivo y no distinguen a un CR.
+PALABRAS_RUIDO = {
+    "PLANILLA", "SIG", "CDC", "PMG", "RIESGO", "RIESGOS", "PROYECCIONES", "PROYECCION",
+    "INDICADORES", "INDICADOR", "REG", "XLSX", "XLS", "ADP", "DR", "V", "Y", "DE", "DEL",
+    "LA", "EL", "AL", "OCT", "NOV", "DIC", "ENE", "COPIA"
+}
+
+UMBRAL_AUTO = 0.75   # Puntaje mínimo para aceptar sin preguntar
+MARGEN_AUTO = 0.10   # Distancia mínima con el segundo candidato (de otro CR)
+
+# =============================================================================
+# 2. NORMALIZACIÓN Y N-GRAMAS
+# =============================================================================
+
+def normalizar_texto(texto):
+    """Mayúsculas, sin tildes, sin puntuación y con espacios simples. 'REG  Los Ríos' -> 'REG LOS RIOS'."""
+    if texto is None: return ""
+    txt = str(texto).upper().replace("Ñ", "N")
+    txt = ''.join(c for c in unicodedata.normalize('NFD', txt) if unicodedata.category(c) != 'Mn')
+    txt = re.sub(r'[^A-Z0-9]+', ' ', txt)
+    return re.sub(r'\s+', ' ', txt).strip()
+
+def tokens_utiles(texto):
+    return [t for t in normalizar_texto(texto).split() if t not in PALABRAS_RUIDO and not t.isdigit() and len(t) > 1]
+
+def ngramas(texto):
+    """Bigramas y trigramas de cada palabra útil (con borde), unidos en un set."""
+    grams = set()
+    for tok in tokens_utiles(texto):
+        t = f" {tok} "
+        for n in (2, 3):
+            for i in range(len(t) - n + 1):
+                grams.add(t[i:i + n])
+    return grams
+
+# =============================================================================
+# 3. ÍNDICE
+# =============================================================================
+
+class IndiceCentros:
+    """
+    Índice invertido n-grama -> alias. Cada alias apunta a un valor (nombre
+    oficial, código IP, etc.). El puntaje de un alias es el coeficiente de
+    solapamiento |q ∩ a| / min(|q|, |a|), así un alias corto contenido en un
+    nombre de archivo largo puntúa alto; el Dice se usa sólo para desempatar.
+    """
+
+    def __init__(self, mapa_alias):
+        self.alias = []          # [(alias, valor, n_grams)]
+        self.indice = {}         # gram -> [id_alias]
+        for alias, valor in mapa_alias.items():
+            grams = ngramas(alias)
+            if not grams: continue
+            id_alias = len(self.alias)
+            self.alias.append((alias, valor, len(grams)))
+            for g in grams:
+                self.indice.setdefault(g, []).append(id_alias)
+        self._cache = {}
+
+    def candidatos(self, texto, n=3):
+        """Lista [(valor, alias, puntaje)] ordenada, un único alias (el mejor) por valor."""
+        clave = normalizar_texto(texto)
+        if clave in self._cache: return self._cache[clave][:n]
+
+        q = ngramas(texto)
+        comunes = {}
+        for g in q:
+            for id_alias in self.indice.get(g, ()):
+                comunes[id_alias] = comunes.get(id_alias, 0) + 1
+
+        mejores = {}
+        for id_alias, inter in comunes.items():
+            alias, valor, n_a = self.alias[id_alias]
+            solapamiento = inter / min(len(q), n_a)
+            dice = 2 * inter / (len(q) + n_a)
+            actual = mejores.get(valor)
+            if actual is None or (solapamiento, dice) > (actual[2], actual[3]):
+                mejores[valor] = (valor, alias, solapamiento, dice)
+
+        orden = sorted(mejores.values(), key=lambda x: (x[2], x[3]), reverse=True)
+        res = [(v, a, round(s, 3)) for v, a, s, _ in orden]
+        self._cache[clave] = res
+        return res[:n]
+
+    def resolver(self, texto, umbral=UMBRAL_AUTO, margen=MARGEN_AUTO):
+        """
+        Devuelve (valor, candidatos). 'valor' es None si no hay un candidato
+        claramente ganador; en ese caso 'candidatos' sirve para preguntar.
+        """
+        cands = self.candidatos(texto, n=3)
+        if not cands: return None, []
+        mejor = cands[0][2]
+        segundo = cands[1][2] if len(cands) > 1 else 0
+        if mejor >= umbral and (mejor - segundo) >= margen:
+            return cands[0][0], cands
+        return None, cands
+
+_INDICE_CATALOGO = None
+
+def indice_catalogo():
+    """Índice (alias y nombre oficial -> nombre oficial) sobre CATALOGO_CR, construido una sola vez."""
+    global _INDICE_CATALOGO
+    if _INDICE_CATALOGO is None:
+        mapa = {}
+        for _, nombre, alias in CATALOGO_CR:
+            mapa[nombre] = nombre
+            for a in alias: mapa[a] = nombre
+        _INDICE_CATALOGO = IndiceCentros(mapa)
+    return _INDICE_CATALOGO
+
+def codigo_cr(nombre_oficial):
+    for cod, nombre, _ in CATALOGO_CR:
+        if nombre == nombre_oficial: return cod
+    return None
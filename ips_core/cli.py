@@ -0,0 +1,227 @@
+"""
+Punto de entrada único para los consolidadores: varias carpetas en un solo proceso.
+
+Cada script pregunta una carpeta y, para procesar las del proyecto
+(Indicadores y proyecciones 2026, Div Beneficios, DEPTO GESTION, ADP,
+AVANCE), había que lanzarlo una vez por carpeta, pagando cada vez la
+importación de pandas/openpyxl. Aquí el script del perfil se carga una sola
+vez y se reutiliza para todas las carpetas, con los cachés ya calientes
+(catálogo de centros, patrones de reglas compilados, mapas de SIGI):
+
+    python -m ips_core consolidate --profile v402 DIR1 DIR2 ... [--procesos N]   (desde la raíz del repositorio)
+    python -m ips_core render --profile v402 DIR1 DIR2 ... [--filtro Maule]
+    python -m ips_core watch --profile v402 DIR1 DIR2 ... --reglas R.json   (ver ips_core.vigilancia)
+    python -m ips_core shard|merge --profile v402 DIR ...                     (ver ips_core.fragmentos)
+
+Las demás opciones de los scripts se pasan igual (--reglas, --format,
+--partition, --carga-masiva, --estilizada, --revision-previa, --cola,
+--resume, ...) y valen para todas las carpetas. Con --procesos N (> 1) las
+carpetas se procesan en paralelo, una por proceso; requiere --reglas porque
+no hay consola para preguntar. Un error en una carpeta no detiene a las
+demás: al final se muestra un resumen y el código de salida indica si alguna
+falló.
+"""
+
+import argparse
+import glob
+import importlib.util
+import inspect
+import os
+import sys
+import time
+
+from ips_core.carga_masiva import carga_de_argv
+from ips_core.decisiones import reglas_de_argv
+from ips_core.formatos import formatos_de_argv
+from ips_core.particiones import particion_de_argv
+from ips_core.salida import en_paralelo, esperar_guardados, guardados_pendientes
+from ips_core.vistas import vistas_de_argv, renderizar
+
+# Opciones de los scripts que se aceptan aquí y se pasan tal cual (cada *_de_argv lee las suyas)
+OPCIONES_CON_VALOR = ("--reglas", "--format", "--partition", "--solo", "--carga-masiva", "--mapa-cr", "--aplicar-revision", "--filtro")
+OPCIONES_BANDERA = ("--estilizada", "--sin-diario", "--cola", "--resume")
+
+SALIDAS = ("IPS_CONSOLIDADO", "ADP_CONSOLIDADO", "carga masiva")   # archivos generados, no de entrada
+PROPIOS = {"sigi": ("1_", "2_", "3_")}   # prefijos de las salidas de SIGI
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Perfil -> (script relativo a la raíz del repositorio, clase del parser; None = funciones de módulo de SIGI)
+PERFILES = {
+    "v402": ("IPS - Indicadores y proyecciones 2026/IPS_CONSOLIDADO_v4.0.2.py", "IPSParserV402"),
+    "hybrid": ("IPS - AVANCE_OCT-NOV-DIC_2025/IPS_HYBRID_v1.1.3.py", "IPSParserHybridV113"),
+    "adp": ("IPS - ADP 2025/IPS_ADP_PARSER_v1.1.1.py", "IPS_ADP_Parser"),
+    "sigi": ("SIGI_25/SIGI_25_v7.4.0.py", None),
+}
+_MODULOS = {}
+
+def cargar_perfil(perfil):
+    """Módulo del script del perfil, importado una vez por proceso."""
+    if perfil not in _MODULOS:
+        ruta = os.path.join(RAIZ, PERFILES[perfil][0])
+        spec = importlib.util.spec_from_file_location(f"ips_perfil_{perfil}", ruta)
+        modulo = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = modulo   # pickle (procesos de --partition/--revision-previa) busca las clases por módulo
+        spec.loader.exec_module(modulo)
+        _MODULOS[perfil] = modulo
+    return _MODULOS[perfil]
+
+def _parser(perfil, carpeta, opciones=None):
+    clase = getattr(cargar_perfil(perfil), PERFILES[perfil][1])
+    if opciones is None: return clase(carpeta)
+    aceptados = inspect.signature(clase).parameters   # ADP no tiene --partition
+    return clase(carpeta, **{k: v for k, v in opciones.items() if k in aceptados})
+
+def entradas(carpeta, propios=()):
+    """
+    Planillas de entrada de 'carpeta' ordenadas por nombre, como las listan v402/hybrid (el mismo
+    orden en cualquier equipo y sistema de archivos), sin '~$', salidas ni 'propios' (prefijos).
+    """
+    rutas = sorted(glob.glob(os.path.join(carpeta, "*.xlsx")) + glob.glob(os.path.join(carpeta, "*.xls")), key=os.path.basename)
+    return [r for r in rutas if not os.path.basename(r).startswith(("~$",) + tuple(propios))
+            and not any(s in os.path.basename(r) for s in SALIDAS)]
+
+def _en_carpeta(carpeta, funcion, *args):
+    # SIGI trabaja sobre el directorio actual
+    anterior = os.getcwd()
+    os.chdir(carpeta)
+    try: return funcion(*args)
+    finally: os.chdir(anterior)
+
+def _opciones(argv):
+    """Opciones de los scripts (--format, --partition, --carga-masiva, --estilizada, --reglas) leídas de 'argv'."""
+    return {"formatos": formatos_de_argv(argv), "particion": particion_de_argv(argv), "carga": carga_de_argv(argv),
+            "estilizada": vistas_de_argv(argv)[3], "decisiones": reglas_de_argv(argv)}
+
+def exportar(parser):
+    """Cierre de la extracción ya hecha: informe de revisión y salidas (v402 además resume y deriva acumulados)."""
+    try:
+        if hasattr(parser, "print_summary_and_exit"): parser.print_summary_and_exit()   # v402
+        else: parser.decisiones.informe(parser.output_file); parser.export_outputs()
+    except SystemExit as e:
+        if e.code not in (None, 0): raise
+    _sin_errores_de_guardado(esperar_guardados())
+
+def _sin_errores_de_guardado(errores):
+    if errores: raise RuntimeError("no se pudo guardar: " + "; ".join(str(e) for e in errores.values()))
+
+def consolidar(perfil, carpeta, argv, esperar=True):
+    """
+    Procesa una carpeta con el perfil dado. Devuelve (carpeta, estado, segundos).
+    esperar=False: los guardados siguen en segundo plano (el llamador llama a esperar_guardados()).
+    """
+    inicio = time.time()
+    print(f"\n{'#'*60}\n# [{perfil}] {carpeta}\n{'#'*60}")
+    try:
+        if not entradas(carpeta, PROPIOS.get(perfil, ())): raise ValueError("carpeta vacía o sin Excel de entrada")
+        if PERFILES[perfil][1] is None:
+            _en_carpeta(carpeta, cargar_perfil(perfil).ejecutar_masivo, formatos_de_argv(argv), vistas_de_argv(argv)[3])
+        else:
+            parser = _parser(perfil, carpeta, _opciones(argv))
+            try: parser.process_folder()
+            except SystemExit as e:   # los parsers terminan con sys.exit() tras exportar (también sin datos)
+                if e.code not in (None, 0): raise
+            filas = [getattr(parser, a) for a in parser.ESTADO_BRUTO if isinstance(getattr(parser, a), list)]   # los árboles tienen la hoja aunque no haya filas
+            if not any(filas): raise ValueError("no se extrajo ningún dato; no se generó salida")
+        if esperar: _sin_errores_de_guardado(esperar_guardados())
+        estado = "OK"
+    except (Exception, SystemExit) as e:
+        print(f"[ERROR] {carpeta}: {e}")
+        estado = f"ERROR: {e}"
+    return carpeta, estado, round(time.time() - inicio, 1)
+
+def renderizar_carpeta(perfil, carpeta, filtros):
+    inicio = time.time()
+    try:
+        if PERFILES[perfil][1] is None: _en_carpeta(carpeta, cargar_perfil(perfil).render_vistas, filtros)
+        else: renderizar(_parser(perfil, carpeta), filtros)
+        estado = "OK"
+    except (Exception, SystemExit) as e:
+        print(f"[ERROR] {carpeta}: {e}")
+        estado = f"ERROR: {e}"
+    return carpeta, estado, round(time.time() - inicio, 1)
+
+def _resumen(resultados):
+    print(f"\n{'='*60}\n   RESUMEN POR CARPETA\n{'='*60}")
+    for carpeta, estado, segundos in resultados:
+        print(f"  * {os.path.basename(carpeta) or carpeta:<45} {segundos:>7}s  {estado}")
+    return sum(1 for _, estado, _ in resultados if estado != "OK")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m ips_core", description="Consolidadores IPS sobre varias carpetas en un solo proceso.")
+    comandos = ap.add_subparsers(dest="comando", required=True)
+    for nombre, ayuda in (("consolidate", "extrae y exporta cada carpeta"), ("render", "genera las vistas estilizadas guardadas"),
+                          ("watch", "vigila las carpetas y consolida a medida que llegan archivos"),
+                          ("shard", "extrae un fragmento K/N de la carpeta a un paquete (ver ips_core.fragmentos)"),
+                          ("merge", "junta los paquetes de los fragmentos en el consolidado")):
+        c = comandos.add_parser(nombre, help=ayuda)
+        c.add_argument("--profile", required=True, choices=sorted(PERFILES))
+        c.add_argument("carpetas", nargs="+", metavar="DIR")
+        c.add_argument("--procesos", type=int, default=1, help="carpetas en paralelo (requiere --reglas)")
+        for opcion in OPCIONES_CON_VALOR: c.add_argument(opcion, action="append", help=argparse.SUPPRESS)
+        for opcion in OPCIONES_BANDERA: c.add_argument(opcion, action="store_true", help=argparse.SUPPRESS)
+        c.add_argument("--revision-previa", nargs="?", const="terminal", help=argparse.SUPPRESS)
+        if nombre == "watch":
+            c.add_argument("--intervalo", type=float, default=5.0, help="segundos entre revisiones (default 5)")
+            c.add_argument("--estable", type=float, default=2.0, help="segundos sin cambios para extraer un archivo (default 2)")
+        if nombre == "shard":
+            c.add_argument("--fragmento", required=True, metavar="K/N", help="fragmento de este equipo, ej. 2/5")
+            c.add_argument("--paquete", metavar="RUTA", help="paquete de salida (default: <salida>_FRAGMENTO_KdeN.json en DIR)")
+        if nombre == "merge":
+            c.add_argument("--paquetes", nargs="+", required=True, metavar="PAQUETE", help="paquetes de todos los fragmentos")
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = ap.parse_args(argv)
+
+    invalidas = [c for c in args.carpetas if not os.path.isdir(c)]
+    if invalidas: raise SystemExit(f"[ERROR] Ruta(s) inválida(s): {', '.join(invalidas)}")
+    carpetas = [os.path.abspath(c) for c in args.carpetas]
+
+    if args.comando != "render" and args.filtro: ap.error("--filtro sólo se usa con 'render'")
+    if args.comando == "watch":
+        if not args.reglas and PERFILES[args.profile][1] is not None:
+            raise SystemExit("[ERROR] 'watch' requiere --reglas (no hay operador para preguntar).")
+        from ips_core.vigilancia import vigilar   # sólo este comando la usa
+        vigilar(args.profile, carpetas, argv, args.intervalo, args.estable)
+        return 0
+    if args.comando in ("shard", "merge"):
+        if len(carpetas) != 1: ap.error(f"'{args.comando}' recibe una sola carpeta")
+        if PERFILES[args.profile][1] is None or not hasattr(getattr(cargar_perfil(args.profile), PERFILES[args.profile][1]), "process_file"):
+            raise SystemExit(f"[ERROR] El perfil {args.profile} no extrae por archivo; '{args.comando}' es para v402/hybrid.")
+        from ips_core.fragmentos import extraer_fragmento, juntar_fragmentos, leer_fragmento
+        parser = _parser(args.profile, carpetas[0], _opciones(argv))
+        if args.comando == "merge":
+            juntar_fragmentos(args.profile, parser, args.paquetes)
+            try: exportar(parser)
+            except RuntimeError as e: raise SystemExit(f"[ERROR] {e}")
+            return 0
+        archivos = entradas(carpetas[0], (os.path.splitext(os.path.basename(parser.output_file))[0],))
+        if not archivos: raise SystemExit(f"[ERROR] Carpeta vacía o sin Excel: {carpetas[0]}")
+        extraer_fragmento(args.profile, parser, archivos, *leer_fragmento(args.fragmento), args.paquete)
+        return 0
+    if args.comando == "render":
+        filtros = args.filtro or []
+        tareas = [(args.profile, c, filtros) for c in carpetas]
+        resultados = en_paralelo(renderizar_carpeta, tareas, args.procesos)
+    else:
+        if args.procesos > 1 and not args.reglas:
+            raise SystemExit("[ERROR] --procesos > 1 requiere --reglas (no hay consola para preguntar en paralelo).")
+        cargar_perfil(args.profile)   # una sola importación para todas las carpetas
+        if args.procesos > 1:
+            resultados = en_paralelo(consolidar, [(args.profile, c, argv) for c in carpetas], args.procesos)
+        else:
+            # Cada carpeta tiene su propio parser: su guardado corre mientras se extrae la siguiente
+            resultados, guardados = [], []
+            for c in carpetas:
+                previos = set(guardados_pendientes())
+                resultados.append(consolidar(args.profile, c, argv, esperar=False))
+                guardados.append([f for f in guardados_pendientes() if f not in previos])
+            errores = esperar_guardados()
+            for i, futuros in enumerate(guardados):
+                fallidos = [str(errores[f]) for f in futuros if f in errores]
+                if fallidos and resultados[i][1] == "OK":
+                    carpeta, _, segundos = resultados[i]
+                    resultados[i] = (carpeta, f"ERROR AL GUARDAR: {'; '.join(fallidos)}", segundos)
+    return 1 if _resumen(resultados) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
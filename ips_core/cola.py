@@ -0,0 +1,160 @@
+"""
+Cola de decisiones no bloqueante ('--cola').
+
+En modo interactivo cada input() detiene toda la extracción hasta que el
+operador responde. Con la cola, cada archivo se extrae en su propio hilo
+(sobre una copia liviana del parser) y, cuando un archivo llega a una
+pregunta, sólo ese archivo queda estacionado: los demás siguen. El hilo
+principal atiende las preguntas en orden de llegada (mostrando el menú que
+imprimió ese archivo) y cada archivo retoma apenas tiene su respuesta. El
+tiempo total se acerca a max(extracción, operador) en vez de la suma.
+
+La salida por consola de cada archivo se muestra completa al terminar, en
+el orden de los archivos, y los resultados se juntan en ese mismo orden.
+Los códigos GEN_/NUEVO_ no dependen del hilo (hash del contenido, ver
+ips_core.identificadores) y su registro se comparte entre las copias. Las
+MEMORIAS de respuestas "siempre" (filas a saltar, segmentos, equipos y las
+banderas como "generar siempre") también se comparten: las copias leen y
+escriben las del parser original. Pero como los archivos avanzan a la vez,
+un "siempre" vale para las preguntas que llegan después de darlo, de
+cualquier archivo, y no para las que ya esperan: con respuestas "siempre"
+el consolidado puede diferir del de la ejecución en serie (se avisa al
+empezar). Sin ellas (p. ej. --reglas sin "siempre") es el mismo.
+Responder 'd' (detener) termina la extracción con lo ya procesado.
+"""
+
+import copy
+import io
+import itertools
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ips_core.decisiones import NO_REPETIR
+
+HILOS = 4
+
+class _Detenido(Exception):
+    """El operador respondió 'detener': el archivo deja de extraerse ahí."""
+
+class _SalidaPorHilo(io.TextIOBase):
+    """sys.stdout que, en los hilos de la cola, acumula lo impreso en el buffer del archivo en curso."""
+
+    def __init__(self, real):
+        self.real, self.buffers = real, {}
+
+    def write(self, texto):
+        buf = self.buffers.get(threading.get_ident())
+        if buf is None: return self.real.write(texto)
+        buf.append(texto)
+        return len(texto)
+
+    def flush(self):
+        self.real.flush()
+
+class _Tarea:
+    def __init__(self, parser, ruta, idx, total):
+        self.parser, self.ruta, self.idx, self.total = parser, ruta, idx, total
+        self.salida, self.visto = [], 0     # lo impreso y hasta dónde ya se mostró con una pregunta
+        self.iniciada = self.completa = False
+        self.error = None
+
+def _clase_copia(parser):
+    """Subclase para las copias: las MEMORIAS de una sola bandera se leen y escriben en 'parser'."""
+    banderas = [a for a in parser.MEMORIAS if not isinstance(getattr(parser, a), (set, dict, list)) and not hasattr(getattr(parser, a), "__dict__")]
+    return type(type(parser).__name__, (type(parser),),
+                {a: property(lambda c, a=a: getattr(parser, a), lambda c, v, a=a: setattr(parser, a, v)) for a in banderas})
+
+def _clonar(parser, clase=None):
+    clon = copy.copy(parser)   # configuración y memorias compartidas; resultados propios
+    clon.__class__ = clase or _clase_copia(parser)
+    for atributo in parser.ESTADO_BRUTO: setattr(clon, atributo, type(getattr(parser, atributo))())
+    return clon
+
+def _juntar(parser, clones):
+    """Agrega los resultados de cada copia al parser, en el orden de los archivos."""
+    for clon in clones:
+        for atributo in parser.ESTADO_BRUTO:
+            destino = getattr(parser, atributo)
+            if isinstance(destino, dict): destino.update(getattr(clon, atributo))
+            else: destino.extend(getattr(clon, atributo))
+
+def procesar_en_cola(parser, archivos, hilos=HILOS, anotar=None):
+    """
+    Extrae 'archivos' con parser.process_file() en hilos, atendiendo las preguntas
+    en el hilo principal, y deja el resultado en el parser como la ejecución en serie.
+    anotar(ruta, copia) -> punto de control de cada archivo terminado (ips_core.reanudacion),
+    en el orden de los archivos y mientras no haya uno detenido o con error antes.
+    """
+    decisiones, preguntas, detener = parser.decisiones, queue.Queue(), threading.Event()
+    salida = _SalidaPorHilo(sys.stdout)
+    clase = _clase_copia(parser)
+    tareas = [_Tarea(_clonar(parser, clase), ruta, i, len(archivos)) for i, ruta in enumerate(archivos)]
+    actual = {}   # hilo -> tarea en curso
+
+    def preguntar(pregunta):
+        # En el hilo del archivo: deja la pregunta en la cola y espera la respuesta
+        if detener.is_set(): raise _Detenido()
+        t = actual[threading.get_ident()]
+        contexto, t.visto = "".join(t.salida[t.visto:]), len(t.salida)
+        opciones = getattr(decisiones._ctx, "opciones", None)
+        detiene = isinstance(opciones, (list, tuple)) and any(o in NO_REPETIR for o in opciones)
+        caja, listo = [], threading.Event()
+        preguntas.put((t, contexto, pregunta, detiene, caja, listo))
+        listo.wait()
+        if caja[0] is None: raise _Detenido()
+        return caja[0]
+
+    def extraer(t):
+        if detener.is_set(): return
+        ident = threading.get_ident()
+        actual[ident], salida.buffers[ident], t.iniciada = t, t.salida, True
+        try: t.parser.process_file(t.ruta, t.idx, t.total); t.completa = True
+        except _Detenido: t.salida.append("  [COLA] Extracción detenida por el operador.\n")
+        except BaseException as e: t.error = e; detener.set()   # se relanza al terminar los demás hilos
+        finally: del salida.buffers[ident], actual[ident]
+
+    def atender(futuros):
+        mostrados, anotando = 0, anotar is not None
+        while mostrados < len(tareas):
+            try: t, contexto, pregunta, detiene, caja, listo = preguntas.get(timeout=0.2)
+            except queue.Empty:
+                # Salida (y punto de control) de los archivos terminados, en orden
+                while mostrados < len(tareas) and futuros[mostrados].done():
+                    t = tareas[mostrados]
+                    salida.real.write("".join(t.salida)); mostrados += 1
+                    anotando = anotando and t.completa
+                    if anotando: anotar(t.ruta, t.parser)
+                continue
+            if detener.is_set():
+                caja.append(None); listo.set(); continue   # se libera sin preguntar
+            salida.real.write(f"\n[COLA] Pregunta de ({t.idx + 1}/{t.total}) {os.path.basename(t.ruta)}\n{contexto}")
+            respuesta = input(pregunta)
+            if detiene and respuesta.lower().strip() in NO_REPETIR:
+                detener.set(); respuesta = None
+            caja.append(respuesta); listo.set()
+
+    print(f"\n[COLA] {len(archivos)} archivo(s) en {min(hilos, len(archivos))} hilo(s); las preguntas se atienden a medida que llegan.")
+    print("[COLA] Aviso: una respuesta 'siempre' no alcanza a las preguntas que ya están esperando;"
+          " con ellas el resultado puede diferir de la ejecución sin --cola.")
+    decisiones.entrada = preguntar
+    sys.stdout = salida
+    try:
+        with ThreadPoolExecutor(max_workers=hilos) as ex:
+            futuros = [ex.submit(extraer, t) for t in tareas]
+            try: atender(futuros)
+            except BaseException:
+                detener.set()   # Ctrl+C u otro error: se liberan los archivos en espera antes de salir
+                while not all(f.done() for f in futuros):
+                    try: item = preguntas.get(timeout=0.2)
+                    except queue.Empty: continue
+                    item[4].append(None); item[5].set()
+                raise
+    finally:
+        sys.stdout = salida.real
+        decisiones.entrada = None
+    for t in tareas:
+        if t.error is not None: raise t.error
+    _juntar(parser, [t.parser for t in itertools.takewhile(lambda t: t.iniciada, tareas)])
@@ -0,0 +1,298 @@
+"""
+Decisiones de los consolidadores: interactivas o por archivo de reglas.
+
+Cada pregunta de los parsers (fila rara, columna faltante, equipo no
+identificado, segmento, ID faltante, ...) pasa por Decisiones.responder()
+con un tipo y su contexto (archivo, hoja, fila, texto). En modo interactivo
+se pregunta por consola como siempre. Con '--reglas reglas.json' (o .yaml)
+la ejecución no lee nunca la entrada estándar: cada pregunta se responde con
+la primera regla que coincide y, si ninguna coincide, se aplica la respuesta
+conservadora del tipo (DEFECTOS) y la pregunta queda en el informe de
+revisión '<salida>_REVISION.xlsx'.
+
+Diario de decisiones: cada respuesta dada por consola se agrega a
+'<salida>_DECISIONES.jsonl' (una línea JSON por respuesta, nunca se
+reescribe) con la clave (hash del archivo, hoja, fila, tipo de pregunta) y el
+texto de la celda. En las ejecuciones siguientes la misma pregunta se
+responde sola si el archivo no cambió, o si cambió pero la celda (mismo
+archivo, hoja, fila y texto) sigue igual; sólo se vuelve a preguntar cuando
+el dato cambió. '--sin-diario' desactiva la repetición (se pregunta todo).
+
+Revisión previa ('--revision-previa', ver ips_core.revision): antes de
+extraer se recorren todos los archivos en paralelo juntando las preguntas
+pendientes, se responden de una vez (agrupadas) y las respuestas van al
+diario, desde donde la extracción las toma sola.
+
+Cola ('--cola', ver ips_core.cola): los archivos se extraen en hilos y una
+pregunta pendiente sólo detiene a su archivo; las preguntas se atienden en
+orden de llegada desde el hilo principal.
+
+Reanudación ('--resume', ver ips_core.reanudacion): sigue una ejecución
+cortada desde el primer archivo sin terminar; las respuestas del archivo que
+quedó a medias salen de este diario.
+
+Formato del archivo de reglas (JSON; YAML si está instalado PyYAML):
+    {
+      "carpeta": "C:/IPS/Proyecciones",            (opcional; o --carpeta)
+      "defecto": {"fila_rara": "s", "equipo": "n"},  (respuesta por tipo si no hay regla)
+      "reglas": [
+        {"tipo": "fila_rara", "texto": "NUEVO*", "respuesta": "c"},
+        {"tipo": "equipo", "archivo": "*Maule*", "respuesta": "m"},
+        {"tipo": "equipo_manual", "archivo": "*Maule*", "respuesta": "DIRECCION REGIONAL DEL MAULE"},
+        {"tipo": "columnas", "archivo": "*.xls", "hoja": "Riesgo*", "respuesta": "s"}
+      ]
+    }
+'archivo', 'hoja' y 'texto' son patrones tipo glob (sin distinguir mayúsculas
+ni tildes); 'texto' admite una expresión regular con el prefijo "re:". Las
+respuestas son las mismas letras del menú de cada pregunta.
+"""
+
+import argparse
+import fnmatch
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime
+
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import hoja_tabla, guardar_atomico
+
+# Tipos de pregunta -> respuesta conservadora si no hay regla (queda en el informe)
+DEFECTOS = {
+    "ruta": "",              # Enter = carpeta actual
+    "porcentajes": "",       # Enter = transformar
+    "ocultos": "",           # Enter = sólo visibles
+    "ocultos_hoja": "v",
+    "columnas": "s",         # saltar hoja
+    "equipo": "n",           # 'No aplica'
+    "equipo_manual": "No aplica",
+    "fila_rara": "s",        # saltar fila
+    "segmento": "n",         # ninguno es segmento
+    "id_embebido": "n",
+    "id_faltante": "s",      # saltar fila
+}
+# Preguntas de configuración cuyo Enter ya es la opción recomendada: no van al informe
+SIN_REVISION = {"ruta", "porcentajes", "ocultos"}
+
+# Respuestas que no se guardan en el diario (detener la ejecución no se repite sola)
+NO_REPETIR = {"d"}
+SUFIJO_DIARIO = "_DECISIONES.jsonl"
+
+COLUMNAS_REVISION = ["TIPO", "ARCHIVO", "HOJA", "FILA", "TEXTO", "PREGUNTA", "RESPUESTA_APLICADA"]
+
+def _normalizar(texto):
+    return unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode().upper().strip()
+
+@functools.lru_cache(maxsize=None)
+def _patron(patron):
+    # Compilado una vez por proceso (se reutiliza entre carpetas con python -m ips_core)
+    if patron.startswith("re:"): return re.compile(patron[3:], re.I).search, str
+    return re.compile(fnmatch.translate(_normalizar(patron))).match, _normalizar
+
+def _coincide(patron, valor):
+    if patron is None: return True
+    if valor is None: return False
+    buscar, preparar = _patron(str(patron))
+    return buscar(preparar(valor)) is not None
+
+def leer_reglas(ruta):
+    """Archivo de reglas JSON/YAML -> dict con 'reglas' y 'defecto'."""
+    with open(ruta, encoding="utf-8") as f:
+        if os.path.splitext(ruta)[1].lower() in (".yaml", ".yml"):
+            try: import yaml
+            except ImportError: raise SystemExit("[ERROR] Reglas en YAML requieren PyYAML (pip install pyyaml) o use JSON.")
+            datos = yaml.safe_load(f) or {}
+        else:
+            datos = json.load(f)
+    for i, r in enumerate(datos.get("reglas", []), 1):
+        if "tipo" not in r or "respuesta" not in r:
+            raise SystemExit(f"[ERROR] Regla {i} de '{os.path.basename(ruta)}' sin 'tipo' o 'respuesta': {r}")
+        if r["tipo"] not in DEFECTOS and r["tipo"] != "*":
+            print(f"[AVISO] Regla {i}: tipo desconocido '{r['tipo']}' (tipos: {', '.join(DEFECTOS)})")
+    return {"reglas": datos.get("reglas", []), "defecto": datos.get("defecto", {}), "carpeta": datos.get("carpeta")}
+
+def hash_archivo(ruta):
+    """SHA-1 del contenido del archivo (clave del diario)."""
+    h = hashlib.sha1()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""): h.update(bloque)
+    return h.hexdigest()
+
+def reglas_de_argv(argv=None):
+    """'--reglas ARCHIVO [--carpeta DIR] [--sin-diario]' -> Decisiones (interactivas si no se indica --reglas)."""
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--reglas")
+    ap.add_argument("--carpeta")
+    ap.add_argument("--sin-diario", action="store_true")
+    ap.add_argument("--revision-previa", nargs="?", const="terminal", choices=["terminal", "planilla"])
+    ap.add_argument("--aplicar-revision")
+    ap.add_argument("--cola", action="store_true")
+    ap.add_argument("--resume", action="store_true")
+    args, _ = ap.parse_known_args(argv)
+    if args.sin_diario and (args.revision_previa or args.aplicar_revision):
+        raise SystemExit("[ERROR] La revisión previa se aplica a través del diario: no se combina con --sin-diario.")
+    decisiones = Decisiones(leer_reglas(args.reglas) if args.reglas else None, diario=not args.sin_diario)
+    decisiones.carpeta = args.carpeta or decisiones.carpeta
+    decisiones.revision_previa, decisiones.aplicar_revision = args.revision_previa, args.aplicar_revision
+    decisiones.cola = args.cola and decisiones.interactivo   # con reglas no hay esperas que evitar
+    decisiones.reanudar = args.resume
+    return decisiones
+
+class Decisiones:
+    """
+    Punto único de entrada para las preguntas al operador.
+      reglas -> dict de leer_reglas(); None = interactivo (input)
+      diario -> False: no repetir respuestas del diario (se siguen anotando)
+    """
+
+    def __init__(self, reglas=None, diario=True):
+        self.reglas = reglas
+        self.interactivo = reglas is None
+        self.carpeta = (reglas or {}).get("carpeta")
+        self.pendientes = []          # preguntas sin regla (modo reglas)
+        self.repetir = diario
+        self.ruta_diario = None
+        self.revision_previa = None   # 'terminal' / 'planilla' (ips_core.revision)
+        self.aplicar_revision = None  # ruta de una planilla de revisión ya respondida
+        self.cola = False             # --cola: archivos en hilos, preguntas atendidas sin detener a los demás
+        self.entrada = None           # función que reemplaza a input() (ips_core.cola)
+        self.reanudar = False         # --resume: seguir desde el punto de control (ips_core.reanudacion)
+        self._exactas, self._por_celda = {}, {}
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self._ctx = threading.local()
+
+    def __getstate__(self):
+        # Para enviarlo a otro proceso (revisión previa): sin lock, contexto de hilo ni entrada
+        estado = dict(self.__dict__, entrada=None)
+        del estado["_lock"], estado["_ctx"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock, self._ctx = threading.Lock(), threading.local()
+
+    # --- Contexto actual (por hilo): archivo y hoja en proceso ---
+    def contexto(self, archivo=None, hoja=None, ruta=None):
+        """ruta -> archivo en disco, para la clave del diario (el hash se calcula una vez por archivo)."""
+        self._ctx.archivo, self._ctx.hoja = archivo, hoja
+        self._ctx.hash = self._hash(ruta) if ruta else None
+
+    def _hash(self, ruta):
+        firma = (os.path.getmtime(ruta), os.path.getsize(ruta))
+        with self._lock:
+            if self._hashes.get(ruta, (None,))[0] != firma:
+                self._hashes[ruta] = (firma, hash_archivo(ruta))
+            return self._hashes[ruta][1]
+
+    # --- Diario de decisiones (append-only) ---
+    @staticmethod
+    def _claves(entrada):
+        e = entrada
+        return ((e["hash"], e["hoja"], e["fila"], e["tipo"]),
+                (e["archivo"], e["hoja"], e["fila"], e["tipo"], e["texto"]))
+
+    def abrir_diario(self, salida):
+        """Diario '<salida>_DECISIONES.jsonl': carga las respuestas anteriores (la última gana) y anota las nuevas ahí."""
+        self.ruta_diario = ruta = os.path.splitext(salida)[0] + SUFIJO_DIARIO
+        self._exactas, self._por_celda = {}, {}
+        if not os.path.exists(ruta): return
+        n = 0
+        with open(ruta, encoding="utf-8") as f:
+            for linea in f:
+                try: e = json.loads(linea)
+                except ValueError: continue      # línea cortada por un corte de luz, etc.
+                exacta, celda = self._claves(e)
+                self._exactas[exacta] = self._por_celda[celda] = e["respuesta"]
+                n += 1
+        if n: print(f"[INFO] Diario de decisiones: {n} respuesta(s) en {os.path.basename(ruta)}")
+
+    def _recordada(self, tipo, archivo, hoja, fila, texto):
+        e = {"hash": getattr(self._ctx, "hash", None), "archivo": archivo, "hoja": hoja, "fila": fila, "tipo": tipo, "texto": texto}
+        exacta, celda = self._claves(e)
+        return self._exactas.get(exacta) if e["hash"] and exacta in self._exactas else self._por_celda.get(celda)
+
+    def _anotar(self, tipo, archivo, hoja, fila, texto, respuesta, hash_=None):
+        if not self.ruta_diario or respuesta in NO_REPETIR: return
+        e = {"hash": hash_ or getattr(self._ctx, "hash", None), "archivo": archivo, "hoja": hoja, "fila": fila, "tipo": tipo,
+             "texto": texto, "respuesta": respuesta, "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        exacta, celda = self._claves(e)
+        with self._lock:
+            self._exactas[exacta] = self._por_celda[celda] = respuesta
+            with open(self.ruta_diario, "a", encoding="utf-8") as f:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+    def _valida(self, opciones, respuesta):
+        if opciones is None: return True
+        if callable(opciones): return opciones(respuesta)
+        return respuesta in opciones
+
+    def _regla(self, tipo, archivo, hoja, texto):
+        for r in self.reglas["reglas"]:
+            if r["tipo"] in (tipo, "*") and _coincide(r.get("archivo"), archivo) \
+               and _coincide(r.get("hoja"), hoja) and _coincide(r.get("texto"), texto):
+                return str(r["respuesta"])
+        return None
+
+    def responder(self, tipo, pregunta, opciones=None, fila=None, texto=None, archivo=None, hoja=None):
+        """
+        Respuesta (texto en minúsculas, salvo las de texto libre) a una pregunta del tipo dado.
+          pregunta -> texto del input() ('  >> Elija: ')
+          opciones -> lista de respuestas válidas, función de validación o None (texto libre)
+          fila/texto/archivo/hoja -> contexto para las reglas y el informe (archivo/hoja por defecto, los de contexto())
+        """
+        archivo = archivo if archivo is not None else getattr(self._ctx, "archivo", None)
+        hoja = hoja if hoja is not None else getattr(self._ctx, "hoja", None)
+        texto = None if texto is None else str(texto).strip()
+        normalizar = (lambda r: r.strip()) if opciones is None else (lambda r: r.lower().strip())
+        en_diario = archivo is not None and tipo not in SIN_REVISION
+
+        if en_diario and self.repetir:
+            respuesta = self._recordada(tipo, archivo, hoja, fila, texto)
+            if respuesta is not None and self._valida(opciones, respuesta):
+                print(f"{pregunta.rstrip()} {respuesta}   [diario]")
+                return respuesta
+
+        if self.interactivo:
+            self._ctx.opciones = opciones   # para la cola: ¿esta pregunta admite 'detener'?
+            while True:
+                respuesta = normalizar((self.entrada or input)(pregunta))
+                if self._valida(opciones, respuesta): break
+            if en_diario: self._anotar(tipo, archivo, hoja, fila, texto, respuesta)
+            return respuesta
+
+        respuesta = self._regla(tipo, archivo, hoja, texto)
+        if respuesta is not None:
+            respuesta = normalizar(respuesta)
+            if self._valida(opciones, respuesta):
+                print(f"{pregunta.rstrip()} {respuesta}   [regla]")
+                return respuesta
+            print(f"  [AVISO] Regla para '{tipo}' con respuesta no válida aquí: '{respuesta}'")
+
+        por_defecto = self.reglas["defecto"].get(tipo)
+        if por_defecto is not None and self._valida(opciones, normalizar(str(por_defecto))):
+            respuesta = normalizar(str(por_defecto))
+            print(f"{pregunta.rstrip()} {respuesta}   [defecto]")
+            return respuesta
+
+        respuesta = DEFECTOS.get(tipo, "")
+        print(f"{pregunta.rstrip()} {respuesta}   [sin regla -> revisión]")
+        if tipo not in SIN_REVISION:
+            self.pendientes.append({"TIPO": tipo, "ARCHIVO": archivo or "", "HOJA": hoja or "", "FILA": fila or "",
+                                    "TEXTO": "" if texto is None else texto, "PREGUNTA": pregunta.strip(),
+                                    "RESPUESTA_APLICADA": respuesta, "HASH": getattr(self._ctx, "hash", None),
+                                    "OPCIONES": list(opciones) if isinstance(opciones, (list, tuple)) else None})
+        return respuesta
+
+    def informe(self, salida):
+        """Escribe '<salida>_REVISION.xlsx' con las preguntas sin regla (si hubo). Devuelve la ruta o None."""
+        if not self.pendientes: return None
+        wb = nuevo_libro()
+        hoja_tabla(wb, "REVISION", COLUMNAS_REVISION, self.pendientes, estilo_cabecera="tabla_cabecera_azul")
+        ruta = guardar_atomico(wb.guardar, os.path.splitext(salida)[0] + "_REVISION.xlsx")
+        print(f"[REVISIÓN] {len(self.pendientes)} decisión(es) sin regla, resueltas con la opción conservadora: {ruta}")
+        return ruta
@@ -0,0 +1,366 @@
+"""
+Capa de escritura de libros xlsx con backends intercambiables.
+
+Todas las salidas (Carga Bruta, Planilla Estilizada, DATOS_VARIABLE, hojas
+SIGI, carga masiva, índices) se escriben con la misma interfaz mínima:
+    hoja(titulo, anchos)              -> crea la hoja (anchos antes de la primera fila)
+    fila(hoja, valores, estilos)      -> estilos: None, un nombre para toda la fila o uno por celda
+    banner(hoja, valor, estilo, n)    -> fila de una celda combinada sobre n columnas
+    guardar(ruta)
+Los estilos se definen una vez en ESTILOS en forma neutra (fondo, fuente,
+borde, alineación) y cada backend los traduce a su formato.
+
+Backends:
+    openpyxl-streaming -> Workbook(write_only=True), memoria plana (por defecto)
+    openpyxl           -> Workbook() normal (referencia, más lento)
+    xlsxwriter         -> si está instalado (pip install xlsxwriter)
+
+elegir() toma el más rápido de los disponibles con memoria plana (openpyxl
+normal no se mide; queda sólo como referencia) según un benchmark corto que
+se guarda por máquina (temporal del sistema) y se repite sólo si cambian las
+librerías. La variable de entorno IPS_BACKEND fuerza uno en particular.
+Para ver los tiempos y comparar celda por celda la salida de cada backend
+con la de openpyxl-streaming: python -m ips_core.escritores
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+# openpyxl se importa al crear el primer libro (ips_core.arranque): importar este módulo es liviano
+
+# =============================================================================
+# ESTILOS (definición neutra)
+# =============================================================================
+# fondo/color: RGB; negrita; tamano; borde: fino en los 4 lados; horizontal/vertical; ajuste: texto ajustado
+
+ESTILOS = {
+    # Planilla Estilizada
+    "ips_archivo": dict(fondo="000000", color="FFFFFF", negrita=True, horizontal="center"),
+    "ips_hoja": dict(fondo="2F5597", color="FFFFFF", negrita=True),
+    "ips_cabecera": dict(fondo="BFBFBF", negrita=True, borde=True),
+    "ips_dato": dict(borde=True, ajuste=True, vertical="top"),
+    "ips_revisar": dict(fondo="F4B084", borde=True, ajuste=True, vertical="top"),
+    "ips_derivado": dict(fondo="DDEBF7", borde=True, ajuste=True, vertical="top"),
+    # Hojas planas (Carga Bruta / DATOS_VARIABLE)
+    "tabla_cabecera_azul": dict(fondo="002060", color="FFFFFF", negrita=True),
+    "tabla_revisar": dict(fondo="F4B084"),
+    "tabla_derivado": dict(fondo="DDEBF7"),   # acumulado completado con el cálculo (no digitado)
+    # Estilo profesional SIGI
+    "sigi_cabecera": dict(fondo="1F4E78", color="FFFFFF", negrita=True, tamano=10, borde=True),
+    "sigi_dato": dict(borde=True),
+    "sigi_separador": dict(fondo="D9D9D9", negrita=True, borde=True),
+}
+
+def estilo_openpyxl(nombre):
+    """Definición neutra -> NamedStyle de openpyxl."""
+    from openpyxl.styles import NamedStyle, PatternFill, Border, Side, Alignment, Font
+    from openpyxl.styles.borders import DEFAULT_BORDER
+    from openpyxl.styles.fonts import DEFAULT_FONT
+    e = ESTILOS[nombre]
+    borde = Border(left=Side('thin'), right=Side('thin'), top=Side('thin'), bottom=Side('thin'))
+    kw = {"border": borde if e.get("borde") else DEFAULT_BORDER}
+    if e.get("fondo"): kw["fill"] = PatternFill("solid", fgColor=e["fondo"])
+    fuente = {k: e[c] for c, k in (("negrita", "bold"), ("color", "color"), ("tamano", "size")) if c in e}
+    kw["font"] = Font(**fuente) if fuente else DEFAULT_FONT
+    alin = {k: e[c] for c, k in (("horizontal", "horizontal"), ("vertical", "vertical"), ("ajuste", "wrapText")) if c in e}
+    if alin: kw["alignment"] = Alignment(**alin)
+    return NamedStyle(name=nombre, **kw)
+
+def _columna(c):
+    """Columna 1-based: los anchos llegan como número (1) o como letra ('A')."""
+    from openpyxl.utils import column_index_from_string
+    return c if isinstance(c, int) else column_index_from_string(c)
+
+def _letra(c):
+    from openpyxl.utils import get_column_letter
+    return get_column_letter(_columna(c))
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+
+class Escritor:
+    """Interfaz común. Cada hoja es un dict con el objeto del backend y la fila actual."""
+    nombre = ""
+    modulo = "openpyxl"     # módulo que necesita (disponibles())
+    memoria_plana = True    # False: todas las celdas quedan en memoria (no se elige automáticamente)
+
+    def hoja(self, titulo, anchos=None): raise NotImplementedError
+    def fila(self, hoja, valores, estilos=None): raise NotImplementedError
+    def banner(self, hoja, valor, estilo, n_cols): raise NotImplementedError
+    def guardar(self, ruta): raise NotImplementedError
+
+    @staticmethod
+    def _por_celda(valores, estilos):
+        return [estilos] * len(valores) if isinstance(estilos, str) else estilos
+
+class EscritorStreaming(Escritor):
+    """openpyxl write-only: cada fila se serializa al hacer append (memoria plana)."""
+    nombre = "openpyxl-streaming"
+
+    def __init__(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        self.wb, self._WriteOnlyCell = Workbook(write_only=True), WriteOnlyCell
+
+    def _estilo(self, nombre):
+        if nombre not in self.wb.named_styles: self.wb.add_named_style(estilo_openpyxl(nombre))
+        return nombre
+
+    def _celda(self, ws, valor, estilo):
+        c = self._WriteOnlyCell(ws, value=valor)
+        c.style = self._estilo(estilo)
+        return c
+
+    def hoja(self, titulo, anchos=None):
+        ws = self.wb.create_sheet(titulo)
+        for col, ancho in (anchos or {}).items():
+            ws.column_dimensions[_letra(col)].width = ancho
+        return {"ws": ws, "fila": 0}
+
+    def fila(self, hoja, valores, estilos=None):
+        ws = hoja["ws"]
+        if estilos is None:
+            ws.append(list(valores))
+        else:
+            ws.append([v if e is None else self._celda(ws, v, e) for v, e in zip(valores, self._por_celda(valores, estilos))])
+        hoja["fila"] += 1
+
+    def banner(self, hoja, valor, estilo, n_cols):
+        # Una celda con estilo + un rango combinado (una sola entrada <mergeCell>)
+        self.fila(hoja, [valor], estilo)
+        if n_cols > 1: hoja["ws"].merged_cells.add(f"A{hoja['fila']}:{_letra(n_cols)}{hoja['fila']}")
+
+    def guardar(self, ruta):
+        self.wb.save(ruta)
+
+class EscritorOpenpyxl(Escritor):
+    """openpyxl normal (todas las celdas en memoria hasta guardar)."""
+    nombre = "openpyxl"
+    memoria_plana = False
+
+    def __init__(self):
+        from openpyxl import Workbook
+        self.wb = Workbook()
+        self.wb.remove(self.wb.active)
+
+    def hoja(self, titulo, anchos=None):
+        ws = self.wb.create_sheet(titulo)
+        for col, ancho in (anchos or {}).items():
+            ws.column_dimensions[_letra(col)].width = ancho
+        return {"ws": ws, "fila": 0}
+
+    def fila(self, hoja, valores, estilos=None):
+        ws = hoja["ws"]
+        valores = list(valores)
+        ws.append(valores)
+        hoja["fila"] += 1
+        if estilos is not None:
+            for col, e in enumerate(self._por_celda(valores, estilos), 1):
+                if e is None: continue
+                if e not in self.wb.named_styles: self.wb.add_named_style(estilo_openpyxl(e))
+                ws.cell(hoja["fila"], col).style = e
+
+    def banner(self, hoja, valor, estilo, n_cols):
+        self.fila(hoja, [valor], estilo)
+        if n_cols > 1: hoja["ws"].merge_cells(start_row=hoja["fila"], start_column=1, end_row=hoja["fila"], end_column=n_cols)
+
+    def guardar(self, ruta):
+        self.wb.save(ruta)
+
+class EscritorXlsxwriter(Escritor):
+    """
+    xlsxwriter en modo constant_memory: cada fila se vuelca a un temporal al pasar
+    a la siguiente (mismo orden estricto de escritura que write-only); el zip final
+    se arma directamente en la ruta de guardar().
+    """
+    nombre = "xlsxwriter"
+    modulo = "xlsxwriter"
+
+    def __init__(self):
+        import xlsxwriter
+        self.wb = xlsxwriter.Workbook(None, {   # la ruta se conoce recién en guardar()
+            "constant_memory": True, "strings_to_urls": False, "nan_inf_to_errors": True,
+            "default_date_format": "yyyy-mm-dd h:mm:ss",
+        })
+        self.formatos = {}
+
+    def _formato(self, nombre):
+        if nombre not in self.formatos:
+            e = ESTILOS[nombre]
+            f = {}
+            if e.get("fondo"): f.update(pattern=1, bg_color=f"#{e['fondo']}")
+            if e.get("color"): f["font_color"] = f"#{e['color']}"
+            if e.get("negrita"): f["bold"] = True
+            if e.get("tamano"): f["font_size"] = e["tamano"]
+            if e.get("borde"): f["border"] = 1
+            if e.get("horizontal"): f["align"] = e["horizontal"]
+            if e.get("vertical"): f["valign"] = e["vertical"]
+            if e.get("ajuste"): f["text_wrap"] = True
+            self.formatos[nombre] = self.wb.add_format(f)
+        return self.formatos[nombre]
+
+    def hoja(self, titulo, anchos=None):
+        ws = self.wb.add_worksheet(titulo)
+        for col, ancho in (anchos or {}).items():
+            i = _columna(col) - 1
+            ws.set_column(i, i, ancho)
+        return {"ws": ws, "fila": 0}
+
+    def fila(self, hoja, valores, estilos=None):
+        ws, r = hoja["ws"], hoja["fila"]
+        if estilos is None:
+            for c, v in enumerate(valores):
+                if v is not None and v != "": ws.write(r, c, v)
+        else:
+            for c, (v, e) in enumerate(zip(valores, self._por_celda(valores, estilos))):
+                if e is None:
+                    if v is not None and v != "": ws.write(r, c, v)
+                else:
+                    ws.write(r, c, v, self._formato(e))
+        hoja["fila"] += 1
+
+    def banner(self, hoja, valor, estilo, n_cols):
+        if n_cols > 1:
+            hoja["ws"].merge_range(hoja["fila"], 0, hoja["fila"], n_cols - 1, valor, self._formato(estilo))
+            hoja["fila"] += 1
+        else:
+            self.fila(hoja, [valor], estilo)
+
+    def guardar(self, ruta):
+        self.wb.filename = ruta   # close() arma el zip en self.filename
+        self.wb.close()
+
+BACKENDS = {b.nombre: b for b in (EscritorStreaming, EscritorOpenpyxl, EscritorXlsxwriter)}
+
+def disponibles():
+    """Backends que se pueden usar en esta instalación (sólo se busca el módulo, sin importarlo)."""
+    return [n for n, cls in BACKENDS.items() if importlib.util.find_spec(cls.modulo) is not None]
+
+# =============================================================================
+# BENCHMARK Y SELECCIÓN
+# =============================================================================
+
+_CACHE = os.path.join(tempfile.gettempdir(), "ips_core_backend.json")
+_ELEGIDO = None
+
+def _versiones():
+    vers = {"python": sys.version.split()[0]}
+    from importlib.metadata import version, PackageNotFoundError   # sin importar las librerías
+    for mod in ("openpyxl", "xlsxwriter"):
+        try: vers[mod] = version(mod)
+        except PackageNotFoundError: pass
+    return vers
+
+def _muestra(w, filas, cols):
+    """Escribe en 'w' una muestra con filas planas, con estilo y banners (tipos de valor de las salidas reales)."""
+    from datetime import datetime
+    plana = w.hoja("Carga Bruta")
+    estilizada = w.hoja("Planilla Estilizada", anchos={i: 22 for i in range(1, cols + 1)})
+    w.hoja("Anchos", anchos={"A": 40, "C": 12.5})
+    for i in range(filas):
+        valores = [f"texto {i}-{j}" if j % 3 else i * j for j in range(cols)]
+        valores[1:5] = [None, i / 7, datetime(2025, 1 + i % 12, 1 + i % 28), ""]
+        w.fila(plana, valores)
+        if i % 50 == 0: w.banner(estilizada, f"HOJA {i}", "ips_hoja", cols)
+        w.fila(estilizada, valores, "ips_revisar" if i % 7 == 0 else "ips_dato")
+
+def medir(nombre, filas=2000, cols=30):
+    """Segundos que tarda un backend en escribir y guardar la muestra."""
+    t = time.perf_counter()
+    w = BACKENDS[nombre]()
+    _muestra(w, filas, cols)
+    fd, ruta = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try: w.guardar(ruta)
+    finally: os.remove(ruta)
+    return time.perf_counter() - t
+
+def benchmark(referencia=False):
+    """{backend: segundos} para los backends disponibles con memoria plana (y openpyxl normal si 'referencia')."""
+    return {n: round(medir(n), 3) for n in disponibles() if referencia or BACKENDS[n].memoria_plana}
+
+def _contenido(ruta):
+    """Lo que debe coincidir entre backends: valores y estilo de cada celda, rangos combinados y anchos."""
+    from openpyxl import load_workbook
+    wb, res = load_workbook(ruta), {}
+    for ws in wb.worksheets:
+        celdas = {c.coordinate: (c.value, c.fill.fgColor.rgb[-6:] if c.fill.fill_type else None, bool(c.font.b), c.border.left.style)
+                  for fila in ws.iter_rows() for c in fila if c.value is not None or c.has_style and c.fill.fill_type}
+        anchos = {i: d.width for d in ws.column_dimensions.values() if d.customWidth for i in range(d.min, d.max + 1)}
+        res[ws.title] = (celdas, sorted(str(r) for r in ws.merged_cells.ranges), anchos)
+    return res
+
+def comparar(filas=200, cols=12):
+    """
+    Escribe la muestra con cada backend disponible y la compara celda por celda
+    con la de openpyxl-streaming. Devuelve {backend: [diferencias]} (listas vacías = iguales).
+    """
+    rutas, res = {}, {}
+    try:
+        for n in disponibles():
+            w = BACKENDS[n]()
+            _muestra(w, filas, cols)
+            fd, rutas[n] = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            w.guardar(rutas[n])
+        base = _contenido(rutas[EscritorStreaming.nombre])
+        for n, ruta in rutas.items():
+            otro, difs = _contenido(ruta), []
+            for titulo, (celdas, combinadas, anchos) in base.items():
+                if titulo not in otro: difs.append(f"falta la hoja {titulo}"); continue
+                c2, m2, a2 = otro[titulo]
+                difs += [f"{titulo}!{k}: {celdas.get(k)} != {c2.get(k)}" for k in sorted(set(celdas) | set(c2)) if celdas.get(k) != c2.get(k)]
+                if combinadas != m2: difs.append(f"{titulo}: rangos combinados distintos")
+                # xlsxwriter guarda el ancho con el relleno de la celda (< 1 carácter más)
+                if anchos.keys() != a2.keys() or any(abs(anchos[k] - a2[k]) >= 1 for k in anchos):
+                    difs.append(f"{titulo}: anchos {anchos} != {a2}")
+            res[n] = difs
+    finally:
+        for ruta in rutas.values(): os.remove(ruta)
+    return res
+
+def elegir():
+    """
+    Nombre del backend a usar: IPS_BACKEND si está definido; si no, el más rápido
+    según el benchmark guardado para estas versiones de librerías (se mide una vez).
+    """
+    global _ELEGIDO
+    forzado = os.environ.get("IPS_BACKEND")
+    if forzado:
+        if forzado not in BACKENDS: raise ValueError(f"IPS_BACKEND desconocido: {forzado} (opciones: {', '.join(BACKENDS)})")
+        return forzado
+    if _ELEGIDO: return _ELEGIDO
+
+    vers = _versiones()
+    try:
+        with open(_CACHE, encoding="utf-8") as f: guardado = json.load(f)
+        if guardado.get("versiones") == vers and guardado.get("backend") in BACKENDS: _ELEGIDO = guardado["backend"]
+    except (OSError, ValueError):
+        pass
+    if not _ELEGIDO:
+        tiempos = benchmark()
+        _ELEGIDO = min((n for n in tiempos if BACKENDS[n].memoria_plana), key=tiempos.get)
+        try:
+            with open(_CACHE, "w", encoding="utf-8") as f: json.dump({"versiones": vers, "backend": _ELEGIDO, "tiempos": tiempos}, f)
+        except OSError:
+            pass
+    return _ELEGIDO
+
+def nuevo_libro(backend=None):
+    """Escritor del backend pedido o del elegido por benchmark."""
+    return BACKENDS[backend or elegir()]()
+
+if __name__ == "__main__":
+    tiempos = benchmark(referencia=True)
+    for n, t in sorted(tiempos.items(), key=lambda x: x[1]): print(f"  {n:<20} {t:>7.3f} s")
+    print(f"Elegido (más rápido con memoria plana): {min((n for n in tiempos if BACKENDS[n].memoria_plana), key=tiempos.get)}")
+    diferencias = comparar()
+    for n, difs in diferencias.items():
+        print(f"  {n:<20} {'igual a openpyxl-streaming' if not difs else f'{len(difs)} diferencia(s)'}")
+        for d in difs[:10]: print(f"      {d}")
+    sys.exit(1 if any(diferencias.values()) else 0)
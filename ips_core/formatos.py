@@ -0,0 +1,119 @@
+"""
+Salidas para consumo automático: Parquet, CSV y SQLite junto (o en lugar) del xlsx.
+
+Releer el xlsx consolidado desde notebooks u otros sistemas es lo más lento de
+la cadena. Aquí las tablas planas (Carga Bruta, DATOS_VARIABLE, ...) se tipan
+una sola vez en memoria y se escriben en todos los formatos pedidos con
+'--format xlsx,parquet,csv,sqlite'. El xlsx lo sigue armando cada script; este
+módulo sólo se encarga de los formatos de datos.
+
+Tipos: las columnas conocidas tienen tipo fijo (ESQUEMA); el resto se infiere
+por columna (número sólo si todos los valores no vacíos lo son; si no, texto),
+de modo que un "No aplica" o un "1.10" nunca se pierden al convertir.
+"""
+
+import argparse
+import re
+import sqlite3
+
+from ips_core.arranque import perezoso
+from ips_core.salida import guardar_atomico
+
+pd = perezoso("pandas")   # se importa al exportar, no al leer --format
+
+FORMATOS = ("xlsx", "parquet", "csv", "sqlite")
+
+# Tipos fijos por nombre de columna (dtypes nullable de pandas)
+ESQUEMA = {
+    "ANO": "Int64", "AÑO": "Int64", "MES": "Int64", "COD_REGION": "Int64",
+    "VALOR_M": "Float64", "VALOR_F": "Float64", "VALOR_S": "Float64", "VALOR_J": "Float64", "VALOR_TOTAL": "Float64",
+    "VARIABLE_COD": "string", "CENTRO_RESP_COD": "string", "NÚMERO": "string", "NUMERO": "string",
+    "ARCHIVO": "string", "HOJA": "string", "EQUIPO": "string",
+}
+
+def formatos_de_argv(argv=None):
+    """
+    Lee '--format xlsx,parquet,...' de la línea de comandos (por defecto sólo xlsx).
+    Ignora los demás argumentos para no chocar con los de cada script.
+    """
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--format", default="xlsx")
+    args, _ = ap.parse_known_args(argv)
+    pedidos = [f.strip().lower() for f in args.format.split(",") if f.strip()]
+    invalidos = [f for f in pedidos if f not in FORMATOS]
+    if invalidos:
+        raise SystemExit(f"[ERROR] Formato no soportado: {', '.join(invalidos)} (opciones: {', '.join(FORMATOS)})")
+    return pedidos or ["xlsx"]
+
+def _vacios(s):
+    return s.isna() | s.map(lambda v: isinstance(v, str) and not v.strip())
+
+def _columna(s, tipo=None):
+    vacio = _vacios(s)
+    if tipo == "string" or vacio.all():
+        return s.where(~s.isna(), None).map(lambda v: v if v is None else str(v)).astype("string")
+
+    inferido = pd.api.types.infer_dtype(s[~vacio], skipna=True)
+    if tipo is None and inferido in ("datetime", "datetime64", "date"):
+        return pd.to_datetime(s.where(~vacio), errors="coerce")
+    if tipo is None and inferido == "boolean":
+        return s.where(~vacio).astype("boolean")
+
+    num = pd.to_numeric(s.where(~vacio).map(lambda v: v.strip().replace(",", ".") if isinstance(v, str) else v), errors="coerce")
+    if (num.notna() | vacio).all():
+        enteros = num.dropna().map(float).map(float.is_integer).all()
+        if tipo == "Int64" and not enteros: tipo = "Float64"
+        return num.astype(tipo or ("Int64" if enteros and inferido not in ("floating", "mixed-integer-float", "decimal") else "Float64"))
+    if tipo is not None:
+        print(f"  [AVISO] Columna '{s.name}' declarada {tipo} tiene texto; se exporta como texto.")
+    return _columna(s, "string")
+
+def tipar(datos, columnas=None, esquema=ESQUEMA):
+    """
+    Lista de dicts (o DataFrame) -> DataFrame con dtypes definidos.
+      columnas -> orden/selección de columnas (claves faltantes quedan vacías)
+    """
+    if isinstance(datos, pd.DataFrame):
+        df = datos[list(columnas)] if columnas else datos
+    else:
+        df = pd.DataFrame.from_records(list(datos), columns=list(columnas) if columnas else None)
+    return pd.DataFrame({col: _columna(df[col].astype(object), esquema.get(col)) for col in df.columns})
+
+def nombre_tabla(titulo):
+    """'Carga Bruta' -> 'carga_bruta' (nombre válido para SQLite y archivos)."""
+    return re.sub(r'[^0-9a-z]+', '_', titulo.lower().replace("ñ", "n")).strip("_") or "tabla"
+
+def _escribir_sqlite(ruta, tablas):
+    con = sqlite3.connect(ruta)
+    try:
+        with con:
+            for titulo, df in tablas.items():
+                df.to_sql(nombre_tabla(titulo), con, if_exists="replace", index=False)
+    finally:
+        con.close()
+
+def exportar_tablas(base, tablas, formatos):
+    """
+    Escribe las tablas ({titulo: DataFrame tipado}) en los formatos de datos pedidos.
+      base -> ruta sin extensión; CSV/Parquet generan '<base>_<tabla>.<ext>', SQLite un solo '<base>.sqlite'
+    Cada archivo se escribe en un temporal y se renombra (ver salida.guardar_atomico).
+    Los errores de un formato se informan y no detienen a los demás. Devuelve las rutas escritas.
+    """
+    rutas = []
+    for fmt in formatos:
+        if fmt == "xlsx": continue
+        try:
+            if fmt == "sqlite":
+                rutas.append(guardar_atomico(lambda tmp: _escribir_sqlite(tmp, tablas), f"{base}.sqlite"))
+            else:
+                for titulo, df in tablas.items():
+                    ruta = f"{base}_{nombre_tabla(titulo)}.{fmt}"
+                    if fmt == "csv": escribir = lambda tmp: df.to_csv(tmp, index=False, encoding="utf-8-sig")
+                    else: escribir = lambda tmp: df.to_parquet(tmp, index=False)
+                    rutas.append(guardar_atomico(escribir, ruta))
+        except ImportError as e:
+            print(f"[AVISO] Formato {fmt} omitido: falta una dependencia ({str(e).splitlines()[0]})")
+        except Exception as e:
+            print(f"[ERROR AL GUARDAR {fmt.upper()}] {e}")
+    for ruta in rutas: print(f"[ÉXITO] Archivo generado: {ruta}")
+    return rutas
@@ -0,0 +1,144 @@
+"""
+Consolidación repartida en varios equipos ('shard' + 'merge').
+
+Para la corrida nacional (todas las regiones x CDC/PMG/Riesgos x varios
+períodos) la lista de archivos de la carpeta se reparte en N fragmentos que
+corren en equipos o contenedores distintos. Cada uno deja un paquete con lo
+extraído, las preguntas pendientes y un manifiesto, y 'merge' los junta en el
+consolidado final:
+
+    python -m ips_core shard --profile v402 DIR --fragmento 1/3 --reglas R.json [--paquete RUTA]
+    python -m ips_core shard --profile v402 DIR --fragmento 2/3 --reglas R.json
+    python -m ips_core shard --profile v402 DIR --fragmento 3/3 --reglas R.json
+    python -m ips_core merge --profile v402 DIR --paquetes PAQUETE1 PAQUETE2 PAQUETE3
+
+- El listado de la carpeta va ordenado por nombre (como en una ejecución
+  normal), así es el mismo en cualquier equipo y sistema de archivos. El
+  archivo en la posición i va al fragmento i % N + 1. El paquete por defecto
+  es '<salida>_FRAGMENTO_KdeN.json' en DIR.
+- El paquete es JSON (filas, manifiesto y códigos; ver a_json() en
+  ips_core.salida): abrir un paquete traído de otro equipo no ejecuta nada.
+- El manifiesto guarda el perfil, la configuración y el listado completo de
+  la carpeta con el hash de cada archivo. 'merge' rechaza paquetes de otro
+  perfil, configuración o listado, archivos con distinto contenido entre
+  equipos (o modificados durante la extracción), fragmentos repetidos o que
+  comparten archivos, archivos que no están en ningún paquete y códigos
+  GEN_/NUEVO_ que chocan entre fragmentos.
+- Los registros de cada paquete vienen ordenados por posición y se juntan
+  con una mezcla ordenada de K vías. El orden de filas es el de la ejecución
+  en un solo equipo, y también el del informe de revisión.
+- Las memorias de respuestas "siempre" (filas a saltar, equipos, segmentos)
+  son de cada fragmento. Con --reglas el resultado es el mismo que en un
+  solo equipo. En modo interactivo, una respuesta "siempre" sólo vale
+  dentro de su fragmento.
+"""
+
+import hashlib
+import heapq
+import os
+import socket
+from datetime import datetime
+
+from ips_core.reanudacion import marcar, aporte, agregar
+from ips_core.salida import guardar_json, leer_json
+
+VERSION = 3   # 2: hash de todo el listado en el manifiesto; 3: JSON en vez de pickle
+
+def leer_fragmento(texto):
+    """'2/5' -> (2, 5)."""
+    try: k, n = (int(x) for x in str(texto).split("/"))
+    except ValueError: raise SystemExit(f"[ERROR] --fragmento espera K/N (ej: 2/5), no '{texto}'.")
+    if not 1 <= k <= n: raise SystemExit(f"[ERROR] Fragmento fuera de rango: {k}/{n}.")
+    return k, n
+
+def ruta_paquete(salida, k, n):
+    return f"{os.path.splitext(salida)[0]}_FRAGMENTO_{k}de{n}.json"
+
+def _hash(ruta):
+    with open(ruta, "rb") as f: return hashlib.sha1(f.read()).hexdigest()
+
+def extraer_fragmento(perfil, parser, archivos, k, n, ruta=None):
+    """
+    Extrae con parser.process_file() los archivos del fragmento k/n de 'archivos'
+    (listado completo, en orden) y guarda el paquete. Devuelve su ruta.
+    """
+    ruta = ruta or ruta_paquete(parser.output_file, k, n)
+    decisiones = parser.decisiones
+    decisiones.abrir_diario(ruta)   # diario propio: los fragmentos no escriben el mismo archivo
+    parser.configure()
+    propios = [(i, r) for i, r in enumerate(archivos) if i % n == k - 1]
+    print(f"\n[FRAGMENTO {k}/{n}] {len(propios)} de {len(archivos)} archivo(s).")
+    hashes = {os.path.basename(r): _hash(r) for r in archivos}   # para cotejar las copias de cada equipo
+
+    registros = []
+    for i, archivo in propios:
+        marca, pendientes = marcar(parser), len(decisiones.pendientes)
+        parser.process_file(archivo, i, len(archivos))
+        registros.append({"indice": i, "archivo": os.path.basename(archivo), "hash": _hash(archivo),
+                          "estado": aporte(parser, marca), "pendientes": decisiones.pendientes[pendientes:]})
+
+    manifiesto = {"version": VERSION, "perfil": perfil, "clase": type(parser).__name__, "fragmento": k, "total": n,
+                  "orden": [os.path.basename(r) for r in archivos], "hashes": hashes,
+                  "configuracion": {a: getattr(parser, a) for a in parser.CONFIGURACION},
+                  "equipo": socket.gethostname(), "generado": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    paquete = {"manifiesto": manifiesto, "registros": registros, "codigos": parser.identificadores.claves}
+    ruta = guardar_json(paquete, ruta)
+    print(f"[FRAGMENTO {k}/{n}] Paquete: {ruta}")
+    return ruta
+
+def _leer(ruta):
+    if not os.path.exists(ruta): raise SystemExit(f"[ERROR] No existe el paquete: {ruta}")
+    try: paquete = leer_json(ruta)
+    except ValueError: paquete = {}
+    if not isinstance(paquete, dict) or paquete.get("manifiesto", {}).get("version") != VERSION:
+        raise SystemExit(f"[ERROR] {os.path.basename(ruta)} no es un paquete de fragmento compatible.")
+    return paquete
+
+def verificar(perfil, paquetes):
+    """Errores de compatibilidad y de cobertura entre los paquetes [(ruta, paquete)] (lista vacía = OK)."""
+    errores, (primero, base) = [], (os.path.basename(paquetes[0][0]), paquetes[0][1]["manifiesto"])
+    for ruta, p in paquetes:
+        m, nombre = p["manifiesto"], os.path.basename(ruta)
+        if m["perfil"] != perfil: errores.append(f"{nombre}: perfil '{m['perfil']}', se pidió '{perfil}'.")
+        for campo, texto in (("total", "número de fragmentos"), ("orden", "listado de archivos"), ("configuracion", "configuración")):
+            if m[campo] != base[campo]: errores.append(f"{nombre}: {texto} distinto de {primero}.")
+        for archivo, h in m["hashes"].items():
+            if base["hashes"].get(archivo, h) != h: errores.append(f"'{archivo}' tiene otro contenido en {nombre} que en {primero}.")
+        for r in p["registros"]:
+            if r["hash"] != m["hashes"][r["archivo"]]: errores.append(f"{nombre}: '{r['archivo']}' cambió durante la extracción.")
+
+    origen, fragmentos = {}, {}
+    for ruta, p in paquetes:
+        k = p["manifiesto"]["fragmento"]
+        if k in fragmentos: errores.append(f"Fragmento {k} repetido: {os.path.basename(fragmentos[k])} y {os.path.basename(ruta)}.")
+        fragmentos[k] = ruta
+        for r in p["registros"]:
+            if r["archivo"] in origen:
+                errores.append(f"'{r['archivo']}' está en {os.path.basename(origen[r['archivo']])} y en {os.path.basename(ruta)}.")
+            origen[r["archivo"]] = ruta
+    faltan = [a for a in base["orden"] if a not in origen]
+    if faltan: errores.append(f"{len(faltan)} archivo(s) en ningún paquete (¿falta un fragmento?): {', '.join(faltan[:5])}")
+
+    codigos = {}
+    for _, p in paquetes:
+        for codigo, clave in p["codigos"].items():
+            if codigos.setdefault(codigo, clave) != clave: errores.append(f"Código {codigo} generado para dos indicadores distintos.")
+    return errores
+
+def juntar_fragmentos(perfil, parser, rutas):
+    """Carga y verifica los paquetes y deja en 'parser' el resultado de la ejecución en un solo equipo."""
+    paquetes = [(ruta, _leer(ruta)) for ruta in rutas]
+    errores = verificar(perfil, paquetes)
+    if errores:
+        for e in errores: print(f"  [ERROR] {e}")
+        raise SystemExit(f"[ERROR] {len(errores)} problema(s) en los paquetes; no se generó el consolidado.")
+
+    manifiestos = [p["manifiesto"] for _, p in paquetes]
+    for atributo, valor in manifiestos[0]["configuracion"].items(): setattr(parser, atributo, valor)
+    # Cada paquete ya está ordenado por posición: mezcla de K vías
+    for r in heapq.merge(*(p["registros"] for _, p in paquetes), key=lambda r: r["indice"]):
+        agregar(parser, r["estado"])
+        parser.decisiones.pendientes.extend(r["pendientes"])
+    for _, p in paquetes: parser.identificadores.claves.update(p["codigos"])
+    print(f"\n[MERGE] {len(paquetes)} paquete(s), {len(manifiestos[0]['orden'])} archivo(s): "
+          + ", ".join(f"{m['fragmento']}/{m['total']} ({m['equipo']})" for m in manifiestos))
@@ -0,0 +1,70 @@
+"""
+Códigos estables para los indicadores sin número (GEN_/NUEVO_).
+
+Antes los códigos salían de un contador global (new_indicator_count) que
+avanzaba en el orden de los archivos: 'NUEVO_7_18_Proyecciones' cambiaba
+cuando se agregaba, quitaba o reordenaba un archivo anterior, y los hilos de
+'--cola' tenían que renumerar al juntar. Ahora el número es un hash de
+(nombre de archivo, hoja, texto del indicador normalizado):
+
+    NUEVO_3f9a0c1e_18_Proyecciones     GEN_b41d77a2_03     GEN_5e0c2f9b (Hybrid)
+
+El mismo indicador recibe el mismo código en cada ejecución, sin importar
+qué otros archivos haya ni quién lo extraiga. Choques:
+- el mismo texto repetido en la misma hoja -> se agrega el número de
+  aparición a la clave (1.ª, 2.ª, ... en el orden de las filas);
+- dos claves distintas con el mismo hash -> la segunda alarga el hash
+  hasta que no choque.
+El registro de códigos se comparte entre las copias del parser ('--cola',
+vigilancia) y viaja en el punto de control ('--resume').
+"""
+
+import hashlib
+import threading
+
+from ips_core.decisiones import _normalizar
+
+LARGO = 8   # dígitos hexadecimales del hash (se alarga sólo ante un choque)
+_SEP = "\x1f"
+
+def clave_indicador(archivo, hoja, texto):
+    return _SEP.join((str(archivo), str(hoja), " ".join(_normalizar(texto).split())))
+
+class Identificadores:
+    """Registro de códigos emitidos: código -> clave, para detectar choques."""
+
+    def __init__(self):
+        self.claves = {}   # código -> clave que lo generó
+        self.vistos = {}   # clave -> apariciones (texto repetido en la hoja)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        estado = dict(self.__dict__)
+        del estado["_lock"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.claves)
+
+    def nuevo(self, prefijo, archivo, hoja, texto, sufijo=""):
+        """'{prefijo}_{hash}{sufijo}' para el indicador de (archivo, hoja, texto)."""
+        clave = clave_indicador(archivo, hoja, texto)
+        with self._lock:
+            n = self.vistos[clave] = self.vistos.get(clave, 0) + 1
+            if n > 1: clave += f"{_SEP}{n}"
+            digest, largo = hashlib.sha1(clave.encode("utf-8")).hexdigest(), LARGO
+            while True:
+                codigo = f"{prefijo}_{digest[:largo]}{sufijo}"
+                if self.claves.setdefault(codigo, clave) == clave: return codigo
+                largo += 2   # choque con otra clave
+
+    def olvidar(self, archivo):
+        """Descarta los códigos de 'archivo' (se va a volver a extraer)."""
+        inicio = f"{archivo}{_SEP}"
+        with self._lock:
+            self.claves = {c: k for c, k in self.claves.items() if not k.startswith(inicio)}
+            self.vistos = {k: n for k, n in self.vistos.items() if not k.startswith(inicio)}
@@ -0,0 +1,103 @@
+"""
+Eje de meses de las planillas: reconoce la cabecera de cada columna mensual.
+
+Las cabeceras llegan como fechas de Excel ("2025-08-01 00:00:00"), abreviaturas
+en español ("ene-25", "Sept. 2025") o formas numéricas ("08/2025"). Antes se
+intentaba pd.to_datetime en cada celda y se caía por excepción al caso en
+español; aquí se despacha por tipo y patrón, y el resultado se memoriza por
+valor crudo, ya que todas las hojas de una carpeta repiten la misma cabecera.
+"""
+
+import re
+from datetime import date, datetime
+
+MESES_BASE = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+# Prefijo de 3 letras -> número de mes (español, más las abreviaturas inglesas que difieren)
+_PREFIJOS = {
+    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6,
+    "jul": 7, "ago": 8, "sep": 9, "set": 9, "oct": 10, "nov": 11, "dic": 12,
+    "jan": 1, "apr": 4, "aug": 8, "dec": 12
+}
+
+_RE_ISO = re.compile(r'^(\d{4})[-/.](\d{1,2})(?:[-/.]\d{1,2})?(?:[ t]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$')
+_RE_MES_ANO = re.compile(r'^(\d{1,2})[-/.](\d{4}|\d{2})$')
+_RE_TXT_ANO = re.compile(r'^([a-záéíóú]+)\.?[\s\-/]*(\d{4}|\d{2})$')
+_RE_ANO_TXT = re.compile(r'^(\d{4}|\d{2})[\s\-/]*([a-záéíóú]+)\.?$')
+
+_CACHE_MES = {}
+_CACHE_LAYOUT = {}
+
+def _etiqueta(mes, ano):
+    if not 1 <= mes <= 12: return None
+    return f"{MESES_BASE[mes - 1]}-{str(ano)[-2:]}"
+
+def _mes_de_texto(palabra):
+    return _PREFIJOS.get(palabra[:3])
+
+def _parsear(val):
+    if val is None: return ""
+    if isinstance(val, float) and val != val: return ""   # NaN
+    if isinstance(val, (datetime, date)):                 # incluye pd.Timestamp
+        return _etiqueta(val.month, val.year)
+    val_str = str(val).strip().lower()
+    if not val_str or val_str in ("nan", "nat", "none"): return ""
+    if isinstance(val, (int, float)): return val_str
+
+    m = _RE_ISO.match(val_str)
+    if m: return _etiqueta(int(m.group(2)), m.group(1)) or val_str
+    m = _RE_MES_ANO.match(val_str)
+    if m: return _etiqueta(int(m.group(1)), m.group(2)) or val_str
+    m = _RE_TXT_ANO.match(val_str)
+    if m and _mes_de_texto(m.group(1)): return _etiqueta(_mes_de_texto(m.group(1)), m.group(2))
+    m = _RE_ANO_TXT.match(val_str)
+    if m and _mes_de_texto(m.group(2)): return _etiqueta(_mes_de_texto(m.group(2)), m.group(1))
+    return val_str
+
+def mes_de_cabecera(val):
+    """
+    Cabecera cruda -> 'Mes-AA' (ej. 'Ago-25'). Vacío si la celda está vacía; si
+    no parece un mes devuelve el texto en minúsculas (mismo contrato que
+    IPS_ADP_Parser.extract_month_name).
+    """
+    try:
+        return _CACHE_MES[val]
+    except KeyError:
+        res = _CACHE_MES[val] = _parsear(val)
+        return res
+    except TypeError:
+        return _parsear(val)
+
+def layout_meses(headers, inicio, meses_validos):
+    """
+    Recorre la fila de cabecera desde 'inicio' y devuelve (month_cols, month_layout):
+      month_cols   -> {'Ago-25': idx_columna}
+      month_layout -> {'Ago-25': [idx_columnas 'Acum' que siguen a ese mes]}
+    Las columnas de Meta / Efectivo / Cumplimiento se ignoran. El resultado se
+    memoriza por la fila completa; se devuelven copias para que el llamador
+    pueda modificarlas.
+    """
+    clave = None
+    try:
+        clave = (tuple(None if (isinstance(h, float) and h != h) else h for h in headers), inicio, tuple(meses_validos))
+        hit = _CACHE_LAYOUT.get(clave)
+    except TypeError:
+        hit = None
+    if hit is None:
+        month_cols = {}
+        month_layout = {m: [] for m in meses_validos}
+        current_m = None
+        for c_idx in range(inicio, len(headers)):
+            h_name = headers[c_idx]
+            h_str = str(h_name).replace('\n', ' ').upper().strip()
+            if h_str in ["NAN", "", "NONE", "NAT"] or "META" in h_str or "EFECTIVO" in h_str or "CUMPLIMIENTO" in h_str: continue
+            if "ACUM" in h_str:
+                if current_m: month_layout[current_m].append(c_idx)
+            else:
+                generic_month = mes_de_cabecera(h_name)
+                if generic_month in month_layout:
+                    month_cols[generic_month] = c_idx
+                    current_m = generic_month
+        hit = (month_cols, month_layout)
+        if clave is not None: _CACHE_LAYOUT[clave] = hit
+    return dict(hit[0]), {m: list(v) for m, v in hit[1].items()}
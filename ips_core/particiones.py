@@ -0,0 +1,126 @@
+"""
+Salida particionada: un libro por EQUIPO (centro de responsabilidad) o por ARCHIVO de origen.
+
+Un IPS_CONSOLIDADO con todas las regiones es lento de escribir y de abrir, y
+cada región sólo revisa su parte. Con '--partition equipo|archivo' el
+resultado se divide en libros independientes (misma estructura que el
+consolidado: Carga Bruta, Planilla Estilizada, DATOS_VARIABLE), escritos en
+paralelo, más un _INDICE.xlsx liviano con cada partición y sus conteos.
+
+Cada libro se arma sólo con las filas de su partición, por lo que cualquiera
+se puede regenerar por separado con '--solo <valor>' sin tocar los demás (el
+índice se actualiza en esa fila).
+"""
+
+import argparse
+import copy
+import os
+import re
+from datetime import datetime
+
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import hoja_tabla, en_paralelo, guardar_atomico
+
+# Criterio -> claves que lo contienen (filas de indicadores, filas de DATOS_VARIABLE)
+CRITERIOS = {
+    "equipo": ("EQUIPO", "CENTRO_RESP_COD"),
+    "archivo": ("ARCHIVO", "ARCHIVO"),
+}
+INDICE = "_INDICE.xlsx"
+COLUMNAS_INDICE = ["PARTICION", "ARCHIVO_SALIDA", "INDICADORES", "VARIABLES", "GENERADO"]
+
+def particion_de_argv(argv=None):
+    """'--partition equipo|archivo [--solo VALOR]' -> (criterio, solo) o None si no se pidió."""
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--partition", choices=sorted(CRITERIOS))
+    ap.add_argument("--solo")
+    args, _ = ap.parse_known_args(argv)
+    if args.solo and not args.partition:
+        raise SystemExit("[ERROR] --solo requiere --partition.")
+    return (args.partition, args.solo) if args.partition else None
+
+def valor_particion(fila, criterio):
+    clave_ind, clave_var = CRITERIOS[criterio]
+    valor = fila.get(clave_ind, fila.get(clave_var, ""))
+    return str(valor).strip() or "SIN_VALOR"
+
+def nombres_archivo(valores):
+    """{valor: 'nombre.xlsx'} seguro para el sistema de archivos; estable para el mismo conjunto de valores."""
+    nombres, usados = {}, set()
+    for v in sorted(valores):
+        base = re.sub(r'[^\w\-]+', '_', re.sub(r'\.xls[xm]?$', '', v, flags=re.I)).strip('_')[:60] or "SIN_VALOR"
+        nombre, n = base, 2
+        while nombre.lower() in usados:
+            nombre = f"{base}_{n}"; n += 1
+        usados.add(nombre.lower())
+        nombres[v] = f"{nombre}.xlsx"
+    return nombres
+
+def dividir(parser, criterio):
+    """
+    {valor: parser_parcial}. Cada parcial es una copia liviana del parser con sólo
+    sus filas en flat_data / data_tree / variable_data (las filas se comparten, no se copian).
+    """
+    grupos = {}
+    def grupo(valor):
+        if valor not in grupos:
+            parcial = copy.copy(parser)
+            parcial.flat_data, parcial.data_tree, parcial.variable_data = [], {}, []
+            grupos[valor] = parcial
+        return grupos[valor]
+
+    for fname, sheets in parser.data_tree.items():
+        for sname, rows in sheets.items():
+            for r in rows:
+                grupo(valor_particion(r, criterio)).data_tree.setdefault(fname, {}).setdefault(sname, []).append(r)
+    for r in parser.flat_data: grupo(valor_particion(r, criterio)).flat_data.append(r)
+    for r in parser.variable_data: grupo(valor_particion(r, criterio)).variable_data.append(r)
+    return grupos
+
+def _guardar_parcial(parcial):
+    return guardar_atomico(parcial.build_workbook().guardar, parcial.output_file)
+
+def _leer_indice(ruta):
+    if not os.path.exists(ruta): return []
+    from openpyxl import load_workbook
+    wb = load_workbook(ruta, read_only=True)
+    filas = list(wb.active.iter_rows(values_only=True))
+    wb.close()
+    return [dict(zip(filas[0], f)) for f in filas[1:]] if filas else []
+
+def exportar_particiones(parser, criterio, solo=None, procesos=None):
+    """
+    Escribe un libro por partición en '<salida>_PARTICIONES/' usando
+    parser.build_workbook() sobre cada parcial, y el índice de particiones.
+    Con 'solo' regenera únicamente esa partición.
+    """
+    carpeta = os.path.splitext(parser.output_file)[0] + "_PARTICIONES"
+    os.makedirs(carpeta, exist_ok=True)
+    grupos = dividir(parser, criterio)
+    nombres = nombres_archivo(grupos)
+    if solo is not None:
+        if solo not in grupos:
+            print(f"[ERROR] No hay filas con {criterio.upper()} = '{solo}'. Opciones: {', '.join(sorted(grupos))}")
+            return []
+        grupos = {solo: grupos[solo]}
+
+    for valor, parcial in grupos.items():
+        parcial.output_file = os.path.join(carpeta, nombres[valor])
+
+    print(f"\n[PARTICIONES] {len(grupos)} libro(s) por {criterio.upper()} en: {carpeta}")
+    rutas = en_paralelo(_guardar_parcial, [(p,) for p in grupos.values()], procesos)
+
+    # Índice: se reescribe completo, conservando las filas de particiones no regeneradas
+    ruta_indice = os.path.join(carpeta, INDICE)
+    filas = {f["PARTICION"]: f for f in (_leer_indice(ruta_indice) if solo is not None else [])}
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M")
+    for valor, parcial in grupos.items():
+        filas[valor] = {"PARTICION": valor, "ARCHIVO_SALIDA": nombres[valor], "INDICADORES": len(parcial.flat_data),
+                        "VARIABLES": len(parcial.variable_data), "GENERADO": ahora}
+    wb = nuevo_libro()
+    hoja_tabla(wb, "PARTICIONES", COLUMNAS_INDICE, [filas[k] for k in sorted(filas)])
+    ruta_indice = guardar_atomico(wb.guardar, ruta_indice)
+
+    for ruta in rutas: print(f"  -> {os.path.basename(ruta)}")
+    print(f"[ÉXITO] Índice de particiones: {ruta_indice}")
+    return rutas
@@ -0,0 +1,171 @@
+"""
+Puntos de control por archivo y reanudación ('--resume').
+
+Si una ejecución se corta en el archivo 22 de 27 (error, corte de luz o
+"[d] Detener y Guardar"), antes había que empezar de nuevo desde el primero.
+Ahora, después de cada archivo extraído, se agrega a
+'<salida>_PUNTO_CONTROL.pkl' un registro con lo que ese archivo aportó: filas
+y árbol, lo que sumó a las MEMORIAS del parser (respuestas "siempre" y
+registro de códigos GEN_/NUEVO_) y sus preguntas pendientes del informe.
+Cada registro lleva sólo lo nuevo, así el punto de control crece con los
+archivos y no con su cuadrado. La cabecera guarda la configuración de
+configure(), las memorias de partida y las preguntas de configure(). Con
+
+    python <script>.py --resume     (o python -m ips_core consolidate ... --resume)
+
+se restaura todo eso sin volver a preguntar y la extracción sigue desde el
+primer archivo sin terminar. Las respuestas del archivo que quedó a medias
+están en el diario de decisiones. Un archivo sirve del punto de control sólo
+si está en la misma posición y no cambió (tamaño y fecha), y tampoco sirve
+ninguno posterior a él. El resultado es el mismo que el de una ejecución sin
+cortes. Sin --resume cada ejecución empieza un punto de control nuevo.
+Con --cola los archivos terminan en cualquier orden: cada uno se anota
+cuando él y todos los anteriores ya terminaron.
+"""
+
+import copy
+import os
+import pickle
+
+from ips_core.salida import guardar_atomico
+
+SUFIJO_PUNTO = "_PUNTO_CONTROL.pkl"
+VERSION = 3   # 2: códigos GEN_/NUEVO_ por hash (sin contador); 3: memorias y pendientes por diferencia
+
+def ruta_punto(salida):
+    return os.path.splitext(salida)[0] + SUFIJO_PUNTO
+
+def _firma(ruta):
+    st = os.stat(ruta)
+    return st.st_size, st.st_mtime_ns
+
+def marcar(parser):
+    """Largo actual de cada atributo de ESTADO_BRUTO (las filas sólo se agregan al final)."""
+    return {a: len(getattr(parser, a)) for a in parser.ESTADO_BRUTO}
+
+def aporte(parser, marca):
+    """Lo que se sumó a ESTADO_BRUTO desde 'marca': {atributo: filas o claves nuevas}."""
+    estado = {}
+    for atributo in parser.ESTADO_BRUTO:
+        valor, desde = getattr(parser, atributo), marca[atributo]
+        estado[atributo] = dict(list(valor.items())[desde:]) if isinstance(valor, dict) else valor[desde:]
+    return estado
+
+def agregar(parser, estado):
+    """Suma al parser un aporte() (en el orden de los archivos)."""
+    for atributo, valor in estado.items():
+        destino = getattr(parser, atributo)
+        if isinstance(destino, dict): destino.update(valor)
+        else: destino.extend(valor)
+
+# Memorias: conjuntos, dicts, listas, banderas y objetos con estado de dicts (Identificadores)
+
+def _foto(valor):
+    """Copia para comparar después (copias de C: seguras aunque otro hilo de --cola esté agregando)."""
+    if isinstance(valor, (set, dict, list)): return copy.copy(valor)
+    if hasattr(valor, "__dict__"): return {k: copy.copy(v) for k, v in valor.__getstate__().items()}
+    return valor
+
+def _diferencia(valor, antes, ahora):
+    """Lo que se sumó a la memoria 'valor' entre las fotos 'antes' y 'ahora' (las memorias sólo crecen)."""
+    if isinstance(valor, set): return ahora - antes
+    if isinstance(valor, list): return ahora[len(antes):]
+    if isinstance(valor, dict): return {k: v for k, v in ahora.items() if k not in antes or antes[k] != v}
+    if hasattr(valor, "__dict__"): return {k: _diferencia(getattr(valor, k), antes[k], v) for k, v in ahora.items()}
+    return ahora
+
+def _sumar(valor, diferencia):
+    """Aplica una _diferencia() sobre la memoria 'valor'; devuelve el valor resultante."""
+    if isinstance(valor, set): valor |= diferencia
+    elif isinstance(valor, list): valor.extend(diferencia)
+    elif isinstance(valor, dict): valor.update(diferencia)
+    elif hasattr(valor, "__dict__"):
+        for k, d in diferencia.items(): _sumar(getattr(valor, k), d)
+    else: return diferencia
+    return valor
+
+class PuntoControl:
+    """Punto de control del parser (con ESTADO_BRUTO, CONFIGURACION y MEMORIAS) junto a su salida."""
+
+    def __init__(self, parser):
+        self.parser, self.ruta = parser, ruta_punto(parser.output_file)
+        self.marca = {}   # atributo de ESTADO_BRUTO -> largo ya anotado
+
+    def _escribir(self, registros):
+        def escribir(tmp):
+            with open(tmp, "wb") as f:
+                for r in registros: pickle.dump(r, f, protocol=pickle.HIGHEST_PROTOCOL)
+        guardar_atomico(escribir, self.ruta)
+
+    def _leer(self):
+        registros = []
+        if not os.path.exists(self.ruta): return registros
+        with open(self.ruta, "rb") as f:
+            while True:
+                try: registros.append(pickle.load(f))
+                except EOFError: break
+                except Exception: break   # último registro cortado por el corte
+        return registros
+
+    def _marcar(self, parser):
+        self.marca, self.memorias = marcar(parser), {a: _foto(getattr(parser, a)) for a in parser.MEMORIAS}
+        self.n_pendientes = len(parser.decisiones.pendientes)
+
+    def iniciar(self):
+        """Punto de control nuevo con la configuración actual (después de configure())."""
+        p = self.parser
+        self._escribir([{"version": VERSION, "configuracion": {a: getattr(p, a) for a in p.CONFIGURACION},
+                         "memorias": {a: getattr(p, a) for a in p.MEMORIAS}, "pendientes": p.decisiones.pendientes}])
+        self._marcar(p)
+
+    def anotar(self, ruta, copia=None):
+        """
+        Agrega el registro del archivo recién extraído: lo que se sumó desde el registro anterior.
+        Con --cola, 'copia' es la copia del parser que extrajo ese archivo (ips_core.cola).
+        """
+        p, nombre = self.parser, os.path.basename(ruta)
+        origen = copia or p
+        ahora = {a: _foto(getattr(origen, a)) for a in p.MEMORIAS}
+        memorias = {a: _diferencia(getattr(origen, a), self.memorias[a], ahora[a]) for a in p.MEMORIAS}
+        if copia is None:
+            estado, pendientes = aporte(p, self.marca), p.decisiones.pendientes[self.n_pendientes:]
+        else:   # la copia sólo tiene su archivo; las preguntas de los demás hilos pueden estar intercaladas
+            estado = {a: getattr(copia, a) for a in p.ESTADO_BRUTO}
+            pendientes = [x for x in list(p.decisiones.pendientes) if x["ARCHIVO"] == nombre]
+        registro = {"archivo": nombre, "firma": _firma(ruta), "estado": estado, "memorias": memorias, "pendientes": pendientes}
+        with open(self.ruta, "ab") as f:
+            pickle.dump(registro, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush(); os.fsync(f.fileno())
+        self.memorias = ahora
+        if copia is None: self._marcar(p)
+
+    def reanudar(self, archivos):
+        """
+        Restaura en el parser los archivos ya terminados al comienzo de 'archivos'.
+        Devuelve cuántos son (0: no hay punto de control útil y se empieza de cero).
+        """
+        registros = self._leer()
+        if not registros or registros[0].get("version") != VERSION:
+            print("[REANUDAR] No hay punto de control; se empieza desde el primer archivo.")
+            return 0
+        cabecera, hechos, n = registros[0], registros[1:], 0
+        for r, ruta in zip(hechos, archivos):
+            if r["archivo"] != os.path.basename(ruta) or r["firma"] != _firma(ruta): break
+            n += 1
+        if not n:
+            print("[REANUDAR] El punto de control no coincide con los archivos actuales; se empieza desde el primero.")
+            return 0
+
+        p = self.parser
+        for atributo, valor in cabecera["configuracion"].items(): setattr(p, atributo, valor)
+        for atributo, valor in cabecera["memorias"].items(): setattr(p, atributo, valor)
+        p.decisiones.pendientes[:] = cabecera["pendientes"]
+        for r in hechos[:n]:
+            agregar(p, r["estado"])
+            for atributo, diferencia in r["memorias"].items(): setattr(p, atributo, _sumar(getattr(p, atributo), diferencia))
+            p.decisiones.pendientes.extend(r["pendientes"])
+        self._escribir([cabecera] + hechos[:n])   # los registros que ya no sirven se descartan
+        self._marcar(p)
+        print(f"[REANUDAR] {n} de {len(archivos)} archivo(s) restaurados del punto de control"
+              + (f"; se continúa con: {os.path.basename(archivos[n])}" if n < len(archivos) else "; no queda ninguno por extraer."))
+        return n
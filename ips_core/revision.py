@@ -0,0 +1,187 @@
+"""
+Revisión previa de decisiones ('--revision-previa [terminal|planilla]').
+
+Una corrida interactiva se detiene en cada fila rara, columna faltante o
+equipo no identificado, archivo por archivo, y el operador no puede irse
+hasta el final. Con la revisión previa, después de la configuración se
+recorren todos los archivos en paralelo sin preguntar nada (diario y reglas
+se aplican igual) sólo para juntar las preguntas pendientes. Las que son
+iguales (mismo tipo y mismo texto de celda, en cualquier archivo) se agrupan
+y se responden una sola vez:
+
+    terminal -> tabla en consola y una respuesta por grupo (Enter = preguntar
+                en su momento, como siempre)
+    planilla -> '<salida>_REVISION_PREVIA.xlsx' (hoja PREGUNTAS con la columna
+                RESPUESTA en blanco + OCURRENCIAS) y termina; se completa y se
+                vuelve a ejecutar con '--aplicar-revision <planilla>'
+
+Las respuestas se anotan en el diario de decisiones, por lo que la
+extracción las toma sola ('[diario]'). Es una pasada aproximada: una
+respuesta distinta de la conservadora puede abrir preguntas nuevas en ese
+archivo, que se hacen durante la extracción.
+"""
+
+import contextlib
+import os
+import sys
+
+from ips_core.decisiones import Decisiones, NO_REPETIR, _normalizar
+from ips_core.escritores import nuevo_libro
+from ips_core.salida import hoja_tabla, en_paralelo, guardar_atomico
+
+SUFIJO_PLANILLA = "_REVISION_PREVIA.xlsx"
+COLUMNAS_PREGUNTAS = ["GRUPO", "TIPO", "VECES", "TEXTO", "ARCHIVOS", "PREGUNTA", "OPCIONES", "RESPUESTA", "NOMBRE_MANUAL"]
+COLUMNAS_OCURRENCIAS = ["GRUPO", "TIPO", "ARCHIVO", "HOJA", "FILA", "TEXTO", "HASH"]
+
+# Tipos cuyo texto es el contenido de la celda: la misma respuesta sirve en cualquier archivo
+AGRUPABLES = {"fila_rara", "columnas", "segmento", "id_embebido", "id_faltante"}
+TEXTO_LIBRE = {"equipo_manual"}
+
+class _Detener(Exception):
+    """Una regla respondió 'detener': el pre-escaneo de ese archivo termina ahí."""
+
+class _Recolector(Decisiones):
+    """Decisiones sin consola para el pre-escaneo: lo que no resuelven diario ni reglas queda en 'pendientes'."""
+
+    def responder(self, *args, **kwargs):
+        respuesta = super().responder(*args, **kwargs)
+        if respuesta in NO_REPETIR: raise _Detener()
+        return respuesta
+
+def _recolector(decisiones):
+    recolector = _Recolector(decisiones.reglas or {"reglas": [], "defecto": {}})
+    recolector._exactas, recolector._por_celda = dict(decisiones._exactas), dict(decisiones._por_celda)
+    return recolector
+
+def _preescanear(clase, carpeta, config, ruta, decisiones):
+    """Extrae 'ruta' en un parser nuevo, sin salida por consola, y devuelve las preguntas pendientes."""
+    parser = clase(carpeta, decisiones=decisiones)
+    for atributo, valor in config.items(): setattr(parser, atributo, valor)
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        try: parser.process_file(ruta)
+        except _Detener: pass
+        except Exception: pass   # el error se verá (y se informará) en la extracción real
+    return decisiones.pendientes
+
+def agrupar(pendientes):
+    """Lista de grupos (listas de pendientes) con la misma pregunta, en orden de aparición."""
+    grupos = {}
+    for p in pendientes:
+        if p["TIPO"] in AGRUPABLES and p["TEXTO"]:
+            clave = (p["TIPO"], _normalizar(p["TEXTO"]), tuple(p["OPCIONES"] or ()))
+        else:
+            clave = (p["TIPO"], p["ARCHIVO"], p["HOJA"], p["FILA"])
+        grupos.setdefault(clave, []).append(p)
+    return list(grupos.values())
+
+def _opciones(p):
+    return [o for o in (p["OPCIONES"] or []) if o not in NO_REPETIR]
+
+def _normalizar_respuesta(p, respuesta):
+    respuesta = str(respuesta or "").strip()
+    return respuesta if p["TIPO"] in TEXTO_LIBRE else respuesta.lower()
+
+def _anotar_grupo(decisiones, grupo, respuesta, manual=None):
+    for p in grupo:
+        fila, texto = p["FILA"] if p["FILA"] != "" else None, p["TEXTO"] if p["TEXTO"] != "" else None
+        decisiones._anotar(p["TIPO"], p["ARCHIVO"], p["HOJA"], fila, texto, respuesta, p["HASH"])
+        if manual: decisiones._anotar("equipo_manual", p["ARCHIVO"], p["HOJA"], None, None, manual, p["HASH"])
+    return len(grupo)
+
+def _en_terminal(decisiones, grupos):
+    print(f"\n{'N':>4}  {'TIPO':<12} {'VECES':>5}  {'TEXTO':<50} EJEMPLO")
+    for n, grupo in enumerate(grupos, 1):
+        p = grupo[0]
+        ejemplo = f"{p['ARCHIVO']} / {p['HOJA']}" + (f" / fila {p['FILA']}" if p["FILA"] != "" else "")
+        print(f"{n:>4}  {p['TIPO']:<12} {len(grupo):>5}  {str(p['TEXTO'])[:50]:<50} {ejemplo}")
+    print("\nResponda cada grupo con la letra del menú de esa pregunta (Enter = preguntar durante la extracción).")
+
+    anotadas = 0
+    for n, grupo in enumerate(grupos, 1):
+        p, opciones = grupo[0], _opciones(grupo[0])
+        while True:
+            respuesta = _normalizar_respuesta(p, input(f"  [{n}] {p['TIPO']} ({'/'.join(opciones) or 'texto'}): "))
+            if not respuesta or not opciones or respuesta in opciones: break
+        if not respuesta: continue
+        manual = input("     >> Nombre del equipo: ").strip() if p["TIPO"] == "equipo" and respuesta == "m" else None
+        anotadas += _anotar_grupo(decisiones, grupo, respuesta, manual)
+    return anotadas
+
+def exportar_planilla(grupos, salida):
+    """'<salida>_REVISION_PREVIA.xlsx' con una fila por grupo (RESPUESTA en blanco) y sus ocurrencias."""
+    preguntas, ocurrencias = [], []
+    for n, grupo in enumerate(grupos, 1):
+        p = grupo[0]
+        preguntas.append({"GRUPO": n, "TIPO": p["TIPO"], "VECES": len(grupo), "TEXTO": p["TEXTO"],
+                          "ARCHIVOS": ", ".join(sorted({o["ARCHIVO"] for o in grupo}))[:250], "PREGUNTA": p["PREGUNTA"],
+                          "OPCIONES": "/".join(_opciones(p))})
+        ocurrencias += [dict(o, GRUPO=n) for o in grupo]
+    wb = nuevo_libro()
+    hoja_tabla(wb, "PREGUNTAS", COLUMNAS_PREGUNTAS, preguntas, estilo_cabecera="tabla_cabecera_azul")
+    hoja_tabla(wb, "OCURRENCIAS", COLUMNAS_OCURRENCIAS, ocurrencias)
+    return guardar_atomico(wb.guardar, os.path.splitext(salida)[0] + SUFIJO_PLANILLA)
+
+def _filas(ws):
+    filas = ws.iter_rows(values_only=True)
+    cab = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+    return [dict(zip(cab, f)) for f in filas]
+
+def aplicar_planilla(decisiones, ruta):
+    """Anota en el diario las respuestas completadas en una planilla de exportar_planilla(). Devuelve cuántas."""
+    if not os.path.exists(ruta): raise SystemExit(f"[ERROR] No existe la planilla de revisión: {ruta}")
+    from openpyxl import load_workbook
+    wb = load_workbook(ruta, read_only=True)
+    preguntas, ocurrencias = _filas(wb["PREGUNTAS"]), _filas(wb["OCURRENCIAS"])
+    wb.close()
+
+    grupos = {}
+    for o in ocurrencias:
+        o = {k: ("" if o.get(k) is None else o[k]) for k in COLUMNAS_OCURRENCIAS}
+        o["HOJA"], o["TEXTO"] = str(o["HOJA"]), str(o["TEXTO"])
+        grupos.setdefault(o["GRUPO"], []).append(o)
+
+    anotadas = 0
+    for q in preguntas:
+        respuesta = _normalizar_respuesta(q, q.get("RESPUESTA"))
+        if not respuesta: continue
+        opciones = [o for o in str(q.get("OPCIONES") or "").split("/") if o]
+        if opciones and respuesta not in opciones:
+            print(f"  [AVISO] Grupo {q['GRUPO']}: respuesta '{respuesta}' no válida ({'/'.join(opciones)}); se preguntará.")
+            continue
+        manual = str(q.get("NOMBRE_MANUAL") or "").strip() or None
+        anotadas += _anotar_grupo(decisiones, grupos.get(q["GRUPO"], []), respuesta, manual)
+    print(f"[REVISIÓN PREVIA] {anotadas} decisión(es) de {os.path.basename(ruta)} anotadas en el diario.")
+    return anotadas
+
+def revision_previa(parser, archivos, procesos=None):
+    """
+    Paso previo a la extracción (después de configure()) según parser.decisiones:
+    aplica una planilla respondida, o pre-escanea 'archivos' y pide las respuestas
+    agrupadas (terminal) o exporta la planilla y termina. El parser debe tener
+    process_file(ruta) y CONFIGURACION (atributos fijados por configure()).
+    """
+    decisiones = parser.decisiones
+    if decisiones.aplicar_revision: return aplicar_planilla(decisiones, decisiones.aplicar_revision)
+    if not decisiones.revision_previa: return 0
+    if decisiones.revision_previa == "terminal" and not decisiones.interactivo:
+        print("[AVISO] Revisión previa en terminal sólo en modo interactivo; con --reglas use '--revision-previa planilla'.")
+        return 0
+
+    print(f"\n[REVISIÓN PREVIA] Pre-escaneando {len(archivos)} archivo(s)...")
+    config = {atributo: getattr(parser, atributo) for atributo in parser.CONFIGURACION}
+    tareas = [(type(parser), parser.folder_path, config, ruta, _recolector(decisiones)) for ruta in archivos]
+    grupos = agrupar([p for pendientes in en_paralelo(_preescanear, tareas, procesos) for p in pendientes])
+    if not grupos:
+        print("[REVISIÓN PREVIA] No hay preguntas pendientes.")
+        return 0
+    print(f"[REVISIÓN PREVIA] {sum(len(g) for g in grupos)} pregunta(s) en {len(grupos)} grupo(s).")
+
+    if decisiones.revision_previa == "planilla":
+        ruta = exportar_planilla(grupos, parser.output_file)
+        print(f"[REVISIÓN PREVIA] Complete la columna RESPUESTA de {ruta}")
+        print(f"  y vuelva a ejecutar con: --aplicar-revision \"{ruta}\"")
+        sys.exit()
+
+    anotadas = _en_terminal(decisiones, grupos)
+    print(f"[REVISIÓN PREVIA] {anotadas} decisión(es) anotadas en el diario; comienza la extracción.")
+    return anotadas
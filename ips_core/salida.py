@@ -0,0 +1,350 @@
+"""
+Escritura de los libros de salida, fila a fila, a través de ips_core.escritores.
+
+Con un Workbook() normal cada fila queda en memoria como objetos Cell hasta el
+guardado; en consolidaciones nacionales eso es la mayor parte de la memoria y
+del tiempo. Aquí las hojas se escriben en orden, fila por fila, sin volver
+atrás (nada de ws.cell(row, col) ni releer celdas), lo que permite usar el
+backend más rápido disponible (openpyxl write-only por defecto, xlsxwriter si
+está instalado) sin cambiar el código de cada consolidador.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+
+from ips_core.arranque import perezoso
+from ips_core.escritores import nuevo_libro
+
+pd = perezoso("pandas")   # sólo para revivir tablas de de_json()
+
+# =============================================================================
+# GUARDADO ATÓMICO (temporal + renombrado) Y EN SEGUNDO PLANO
+# =============================================================================
+
+def ruta_alternativa(ruta):
+    """'X.xlsx' -> 'X_20260115-103000.xlsx' (para cuando X.xlsx está abierto en Excel)."""
+    base, ext = os.path.splitext(ruta)
+    return f"{base}_{datetime.now():%Y%m%d-%H%M%S}{ext}"
+
+def _leer_umask():
+    # os.umask() sólo se puede leer cambiándolo: se hace una vez al importar (antes de los hilos de guardado)
+    actual = os.umask(0o022)
+    os.umask(actual)
+    return actual
+
+_UMASK = _leer_umask()
+
+def _permisos(ruta):
+    """Permisos para el archivo final: los del que se reemplaza o, si es nuevo, los que daría un open() normal."""
+    try: return os.stat(ruta).st_mode & 0o7777
+    except OSError: return 0o666 & ~_UMASK
+
+def guardar_atomico(escribir, ruta):
+    """
+    escribir(ruta_tmp) genera el archivo completo en un temporal de la misma
+    carpeta (extensión .part, no lo toma ningún glob '*.xlsx'); luego se
+    renombra de forma atómica sobre 'ruta', así nunca queda un archivo a medias.
+    Si 'ruta' está bloqueada (abierta en Excel) se deja con nombre fecha-hora
+    en vez de esperar. El archivo queda con los permisos del que reemplaza (o los
+    de la umask si es nuevo), no con los 0600 del temporal. Devuelve la ruta final.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=".part", dir=os.path.dirname(os.path.abspath(ruta)))
+    os.close(fd)
+    try:
+        escribir(tmp)
+        os.chmod(tmp, _permisos(ruta))
+        try:
+            os.replace(tmp, ruta)
+        except PermissionError:
+            alternativa = ruta_alternativa(ruta)
+            os.replace(tmp, alternativa)
+            print(f"\n[AVISO] '{os.path.basename(ruta)}' está abierto o bloqueado; se guardó como: {os.path.basename(alternativa)}")
+            ruta = alternativa
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+    return ruta
+
+_POOL_GUARDADO = ThreadPoolExecutor(max_workers=2, thread_name_prefix="guardado")
+_PENDIENTES = []
+
+def _informar(futuro):
+    try: print(f"[ÉXITO] Archivo generado: {futuro.result()}")
+    except Exception as e: print(f"\n[ERROR AL GUARDAR] {e}")
+
+def guardar_en_segundo_plano(escribir, ruta):
+    """
+    guardar_atomico() en un hilo aparte: el llamador sigue (p. ej. con la
+    siguiente carpeta) y el resultado se informa al terminar. El proceso no
+    termina hasta que los guardados pendientes finalizan.
+    """
+    futuro = _POOL_GUARDADO.submit(guardar_atomico, escribir, ruta)
+    futuro.add_done_callback(_informar)
+    _PENDIENTES.append(futuro)
+    return futuro
+
+def guardados_pendientes():
+    """Guardados en segundo plano lanzados y todavía no esperados (para saber de quién es cada uno)."""
+    return list(_PENDIENTES)
+
+def esperar_guardados():
+    """
+    Bloquea hasta que terminen los guardados en segundo plano.
+    Devuelve {futuro: excepción} de los que fallaron (ya informados en consola).
+    """
+    errores = {}
+    while _PENDIENTES:
+        futuro = _PENDIENTES.pop(0)
+        try: futuro.result()
+        except Exception as e: errores[futuro] = e
+    return errores
+
+# =============================================================================
+# ESTADO EN JSON (paquetes de fragmentos, resultado bruto para 'render')
+# =============================================================================
+
+_FILA, _FECHA, _CONJUNTO, _TABLA = "__fila__", "__fecha__", "__conjunto__", "__tabla__"
+_TIPOS_FECHA = {"datetime": datetime, "date": date, "time": time}
+
+def a_json(valor):
+    """
+    'valor' (dicts, listas, conjuntos, textos, números, fechas y DataFrames) -> objeto para json.dump().
+    Cada fila (dict dentro de una lista) se guarda una vez en una tabla aparte,
+    así las filas compartidas (flat_data y data_tree) vuelven a ser el mismo dict
+    al leer y lo que se les agregue después (acumulados derivados) se ve en ambos.
+    """
+    filas, indices = [], {}
+    def convertir(v, en_lista=False):
+        if isinstance(v, dict):
+            if not en_lista: return {str(k): convertir(x) for k, x in v.items()}
+            if id(v) not in indices:
+                indices[id(v)] = len(filas); filas.append(None)
+                filas[indices[id(v)]] = {str(k): convertir(x) for k, x in v.items()}
+            return {_FILA: indices[id(v)]}
+        if isinstance(v, (list, tuple)): return [convertir(x, True) for x in v]
+        if isinstance(v, (set, frozenset)): return {_CONJUNTO: [convertir(x) for x in sorted(v, key=str)]}
+        if isinstance(v, (datetime, date, time)):
+            tipo = "datetime" if isinstance(v, datetime) else type(v).__name__
+            return {_FECHA: [tipo, v.isoformat()]}
+        if hasattr(v, "columns") and hasattr(v, "dtypes"):   # DataFrame: por columna, con su dtype
+            return {_TABLA: {"columnas": [str(c) for c in v.columns], "tipos": [str(t) for t in v.dtypes],
+                             "datos": [convertir(v[c].tolist()) for c in v.columns]}}
+        if hasattr(v, "item"): return v.item()   # escalares de NumPy
+        return v
+    return {"valor": convertir(valor), "filas": filas}
+
+def de_json(datos):
+    """Inverso de a_json() sobre lo leído con json.load()."""
+    tabla, filas = datos["filas"], [None] * len(datos["filas"])
+    def revivir(v):
+        if isinstance(v, list): return [revivir(x) for x in v]
+        if not isinstance(v, dict): return v
+        if len(v) == 1 and _FILA in v:
+            i = v[_FILA]
+            if filas[i] is None: filas[i] = revivir(tabla[i])
+            return filas[i]
+        if len(v) == 1 and _FECHA in v:
+            tipo, texto = v[_FECHA]
+            return _TIPOS_FECHA[tipo].fromisoformat(texto)
+        if len(v) == 1 and _CONJUNTO in v: return set(revivir(v[_CONJUNTO]))
+        if len(v) == 1 and _TABLA in v:
+            t = v[_TABLA]
+            return pd.DataFrame({c: pd.Series(revivir(d), dtype=tipo) for c, tipo, d in zip(t["columnas"], t["tipos"], t["datos"])},
+                                columns=t["columnas"])
+        return {k: revivir(x) for k, x in v.items()}
+    return revivir(datos["valor"])
+
+def guardar_json(valor, ruta):
+    """a_json(valor) a 'ruta' con guardar_atomico(). Devuelve la ruta final."""
+    datos = a_json(valor)
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(datos, f, ensure_ascii=False)
+    return guardar_atomico(escribir, ruta)
+
+def leer_json(ruta):
+    """Lo guardado por guardar_json(). ValueError si no es un JSON de guardar_json()."""
+    with open(ruta, encoding="utf-8") as f: datos = json.load(f)
+    try: return de_json(datos)
+    except (KeyError, TypeError, IndexError) as e: raise ValueError(f"{os.path.basename(ruta)}: formato desconocido ({e!r})")
+
+def hoja_tabla(wb, titulo, encabezados, filas, estilo_cabecera=None, marcas=None, estilo_marca="tabla_revisar"):
+    """
+    Hoja plana (Carga Bruta / DATOS_VARIABLE / SIG_DATOS_VARIABLES) escrita fila a fila.
+      wb     -> Escritor (nuevo_libro())
+      filas  -> iterable de dicts; se leen las claves de 'encabezados' (faltantes = "")
+      marcas -> función opcional fila -> colección de claves a resaltar con estilo_marca,
+                o {clave: estilo} para usar un estilo por clave
+    """
+    encabezados = list(encabezados)
+    ws = wb.hoja(titulo)
+    wb.fila(ws, encabezados, estilo_cabecera)
+
+    n = 0
+    for fila in filas:
+        valores = [fila.get(k, "") for k in encabezados]
+        resaltar = marcas(fila) if marcas else None
+        if resaltar:
+            if not isinstance(resaltar, dict): resaltar = dict.fromkeys(resaltar, estilo_marca)
+            wb.fila(ws, valores, [resaltar.get(k) for k in encabezados])
+        else: wb.fila(ws, valores)
+        n += 1
+    return ws, n
+
+# =============================================================================
+# PLANILLA ESTILIZADA (estilos con nombre)
+# =============================================================================
+
+def render_estilizada(wb, titulo, arbol, claves, ancho_banner=None, ancho_col=22, marcas=None):
+    """
+    Hoja 'Planilla Estilizada' (bloques ARCHIVO > HOJA > cabecera + filas).
+      arbol        -> {archivo: {hoja: [filas]}}
+      claves       -> lista de columnas, o función filas -> lista (cuando dependen de la hoja)
+      ancho_banner -> columnas que cubre cada banner (por defecto, las de la tabla)
+      ancho_col    -> ancho fijo de columna (None = no tocar)
+      marcas       -> función opcional fila -> claves a resaltar (estilo ips_revisar)
+                      o {clave: estilo}
+    Cada estilo (ips_*, ver escritores.ESTILOS) se registra una vez en el libro y
+    las celdas lo referencian por nombre; los banners son una celda combinada.
+    """
+    claves_fijas = None if callable(claves) else list(claves)
+    anchos = None
+    if ancho_col:
+        n_cols = ancho_banner or len(claves_fijas or [])
+        anchos = {i: ancho_col for i in range(1, n_cols + 2)}
+    ws = wb.hoja(titulo, anchos)
+
+    for fname, sheets in arbol.items():
+        if not any(sheets.values()): continue
+        primeras = next(r for r in sheets.values() if r)
+        keys = claves_fijas or claves(primeras)
+        wb.banner(ws, f"ARCHIVO: {fname}", "ips_archivo", ancho_banner or len(keys))
+
+        for sname, rows in sheets.items():
+            if not rows: continue
+            keys = claves_fijas or claves(rows)
+            wb.banner(ws, f"HOJA: {sname}", "ips_hoja", ancho_banner or len(keys))
+
+            wb.fila(ws, keys, "ips_cabecera")
+            for r in rows:
+                revisar = marcas(r) if marcas else None
+                valores = [r.get(k, "") for k in keys]
+                if revisar:
+                    if not isinstance(revisar, dict): revisar = dict.fromkeys(revisar, "ips_revisar")
+                    wb.fila(ws, valores, [revisar.get(k, "ips_dato") for k in keys])
+                else: wb.fila(ws, valores, "ips_dato")
+            wb.fila(ws, [])
+    return ws
+
+# =============================================================================
+# HOJAS DESDE DATAFRAME (reemplazo de pd.ExcelWriter + restyle con load_workbook)
+# =============================================================================
+
+# Las hojas profesionales usan sigi_cabecera / sigi_dato / sigi_separador
+# (replican aplicar_estilo_profesional de SIGI_25); las demás quedan como las
+# deja pandas.to_excel (encabezado sin formato).
+
+def _valor_excel(v):
+    """NaN/NaT/NA -> celda vacía; escalares NumPy -> tipo Python (como pandas.to_excel)."""
+    if v is None: return None
+    try:
+        if v != v: return None
+    except TypeError:
+        return None
+    return v.item() if hasattr(v, "item") and not isinstance(v, (str, bytes)) else v
+
+class TablaPreparada:
+    """
+    DataFrame convertido una sola vez a valores de celda: encabezados, filas como
+    listas de tipos Python y marca de fila separadora. Se reutiliza en todas las
+    hojas/archivos donde aparece el mismo DataFrame (y se puede enviar a otro proceso).
+    """
+
+    def __init__(self, df):
+        self.encabezados = [str(col) for col in df.columns]
+        self.filas = [[_valor_excel(v) for v in fila] for fila in df.itertuples(index=False, name=None)]
+        self.separadores = [str(f[0] if f else None).startswith("---") for f in self.filas]
+
+def hoja_dataframe(wb, titulo, df, profesional=False, anchos=None):
+    """
+    Escribe un DataFrame (sin índice) en un libro (Escritor), con el estilo final
+    ya aplicado en la misma pasada: el archivo se serializa una sola vez y nunca
+    se vuelve a abrir para darle formato.
+      df          -> DataFrame o TablaPreparada
+      profesional -> cabecera azul, bordes y filas separadoras ('---...') en gris
+      anchos      -> {letra_columna: ancho}
+    """
+    tabla = df if isinstance(df, TablaPreparada) else TablaPreparada(df)
+    ws = wb.hoja(titulo, anchos)
+    wb.fila(ws, tabla.encabezados, "sigi_cabecera" if profesional else None)
+
+    for valores, es_sep in zip(tabla.filas, tabla.separadores):
+        if profesional: wb.fila(ws, valores, "sigi_separador" if es_sep else "sigi_dato")
+        else: wb.fila(ws, valores)
+    return ws
+
+def _escribir_libro(ruta, hojas):
+    wb = nuevo_libro()
+    for nombre, tabla, profesional, anchos in hojas:
+        hoja_dataframe(wb, nombre, tabla, profesional=profesional, anchos=anchos)
+    return guardar_atomico(wb.guardar, ruta)
+
+def escribir_libros(libros, procesos=None):
+    """
+    Plan de exportación: libros = [(ruta, [(hoja, df, profesional, anchos)])].
+    Cada DataFrame distinto se convierte a celdas una sola vez aunque se repita en
+    varias hojas o archivos, y los archivos (independientes entre sí) se escriben
+    en paralelo, uno por proceso. Si no se pueden lanzar procesos se escriben en serie.
+    """
+    preparadas = {}
+    plan = []
+    for ruta, hojas in libros:
+        hojas_prep = []
+        for nombre, df, profesional, anchos in hojas:
+            if id(df) not in preparadas: preparadas[id(df)] = TablaPreparada(df)
+            hojas_prep.append((nombre, preparadas[id(df)], profesional, anchos))
+        plan.append((ruta, hojas_prep))
+
+    return en_paralelo(_escribir_libro, plan, procesos)
+
+class _NoEnviable(Exception):
+    """La tarea no se pudo cargar en el proceso hijo (módulo del perfil no importable allí)."""
+
+def _ejecutar(datos):
+    try: funcion, args = pickle.loads(datos)
+    except Exception as e: raise _NoEnviable(str(e))
+    return funcion(*args)
+
+def en_paralelo(funcion, tareas, procesos=None):
+    """
+    Ejecuta funcion(*args) para cada tupla de 'tareas' en un pool de procesos y
+    devuelve los resultados en el mismo orden. 'funcion' y los argumentos deben
+    poder enviarse a otro proceso; si no se puede (o hay una sola tarea) corre en serie.
+    Una tarea que no se pudo cargar en el proceso hijo se repite en serie, sin
+    perder las que sí terminaron allí. Un error dentro de una tarea se propaga.
+    """
+    tareas = list(tareas)
+    if len(tareas) > 1 and procesos != 1:
+        from concurrent.futures import ProcessPoolExecutor   # multiprocessing sólo si se usa (ips_core.arranque)
+        try:
+            # Se serializa aquí (una vez) para separar "no se puede enviar" de los errores de la tarea
+            datos = [pickle.dumps((funcion, args), protocol=pickle.HIGHEST_PROTOCOL) for args in tareas]
+        except (pickle.PicklingError, AttributeError, TypeError):
+            datos = None
+        if datos:
+            ex = ProcessPoolExecutor(max_workers=procesos or min(len(tareas), os.cpu_count() or 1))
+            try:
+                futuros = [ex.submit(_ejecutar, d) for d in datos]   # aquí se lanzan los procesos
+            except OSError:
+                ex.shutdown(cancel_futures=True)
+                futuros = None
+            if futuros:
+                with ex:
+                    resultados = []
+                    for f, args in zip(futuros, tareas):
+                        try: resultados.append(f.result())
+                        except _NoEnviable: resultados.append(funcion(*args))
+                    return resultados
+    return [funcion(*args) for args in tareas]
@@ -0,0 +1,164 @@
+"""
+Vigilancia de carpetas ('python -m ips_core watch'): consolida a medida que llegan las planillas.
+
+Las regiones dejan sus planillas en carpetas compartidas a lo largo de
+varios días y cada llegada obligaba a re-ejecutar todo. En modo vigilancia
+el proceso queda corriendo sobre las carpetas indicadas: revisa cada
+INTERVALO segundos (antes, si está instalado 'watchdog' y el sistema de
+archivos avisa de un cambio), extrae sólo los libros nuevos o modificados y
+regenera el consolidado, que así siempre está al día. Módulo del perfil,
+catálogos y patrones de reglas compilados quedan en memoria entre una
+llegada y otra.
+
+    python -m ips_core watch --profile v402 DIR1 DIR2 --reglas reglas.json [--intervalo 5] [--estable 2]
+
+- Se ignoran los '~$' de Excel y las salidas del propio consolidador.
+- Un libro se extrae cuando lleva 'estable' segundos sin modificarse y, si
+  es .xlsx, el zip ya está completo (copias a medio escribir).
+- v402/hybrid: cada archivo se extrae en su propia copia del parser (como
+  '--cola') y el consolidado se arma juntándolas en el orden de los
+  archivos. El resultado es el mismo que el de una ejecución completa.
+- adp/sigi (sin extracción por archivo): un cambio re-ejecuta la carpeta
+  completa.
+
+Requiere --reglas (no hay operador para preguntar). Se detiene con Ctrl+C.
+"""
+
+import copy
+import os
+import threading
+import time
+import zipfile
+
+from ips_core.cli import PERFILES, PROPIOS, cargar_perfil, consolidar, entradas, exportar, _opciones, _parser
+from ips_core.cola import _clonar
+from ips_core.reanudacion import agregar
+
+INTERVALO = 5.0   # segundos entre revisiones
+ESTABLE = 2.0     # segundos sin cambios para dar un archivo por terminado de copiar
+
+def _firma(ruta):
+    st = os.stat(ruta)
+    return st.st_size, st.st_mtime_ns
+
+def _listo(ruta, firma, estable):
+    # Sin escrituras recientes y, para .xlsx, con el directorio del zip ya escrito (está al final)
+    if time.time() - firma[1] / 1e9 < estable: return False
+    return not ruta.lower().endswith(".xlsx") or zipfile.is_zipfile(ruta)
+
+class _Carpeta:
+    """Carpeta vigilada: detecta libros nuevos, modificados y borrados entre revisiones."""
+
+    def __init__(self, perfil, carpeta, argv):
+        self.perfil, self.carpeta, self.argv = perfil, carpeta, argv
+        self.propios = PROPIOS.get(perfil, ())
+        self.vistos = {}     # ruta -> firma ya consolidada
+        self.esperando = set()
+
+    def entradas(self):
+        return entradas(self.carpeta, self.propios)
+
+    def revisar(self, estable=ESTABLE):
+        """Una revisión: consolida si algo cambió. Devuelve True si regeneró la salida."""
+        firmas = {}
+        for ruta in self.entradas():
+            try: firmas[ruta] = _firma(ruta)
+            except OSError: continue   # borrado entre el listado y el stat
+        listos, esperando = [], set()
+        for ruta, firma in firmas.items():
+            if self.vistos.get(ruta) == firma: listos.append(ruta)
+            elif _listo(ruta, firma, estable): listos.append(ruta)
+            else: esperando.add(ruta)
+        for ruta in esperando - self.esperando: print(f"[VIGILANCIA] En escritura, se espera: {os.path.basename(ruta)}")
+        self.esperando = esperando
+
+        cambiados = [r for r in listos if self.vistos.get(r) != firmas[r]]
+        borrados = [r for r in self.vistos if r not in firmas]
+        if not cambiados and not borrados: return False
+        print(f"\n[VIGILANCIA] {time.strftime('%H:%M:%S')} {os.path.basename(self.carpeta)}: "
+              f"{len(cambiados)} nuevo(s)/modificado(s), {len(borrados)} borrado(s)")
+        for ruta in cambiados: print(f"  + {os.path.basename(ruta)}")
+        for ruta in borrados: print(f"  - {os.path.basename(ruta)}")
+        self.consolidar(listos, cambiados, borrados)
+        for ruta in borrados: del self.vistos[ruta]
+        self.vistos.update((r, firmas[r]) for r in cambiados)
+        return True
+
+    def consolidar(self, listos, cambiados, borrados):
+        consolidar(self.perfil, self.carpeta, self.argv)   # adp/sigi: la carpeta completa
+
+class _CarpetaPorArchivo(_Carpeta):
+    """Carpeta de un perfil con process_file(): sólo se extraen los archivos nuevos o modificados."""
+
+    def __init__(self, perfil, carpeta, argv):
+        super().__init__(perfil, carpeta, argv)
+        self.parser = _parser(perfil, carpeta, _opciones(argv))
+        self.propios = (os.path.splitext(os.path.basename(self.parser.output_file))[0],)
+        self.extraidos = {}   # ruta -> ESTADO_BRUTO extraído de ese archivo, sin derivar (no se modifica)
+        self.parser.decisiones.abrir_diario(self.parser.output_file)
+        self.parser.configure()
+
+    def consolidar(self, listos, cambiados, borrados):
+        parser, decisiones = self.parser, self.parser.decisiones
+        for ruta in borrados:
+            self.extraidos.pop(ruta, None)
+            parser.identificadores.olvidar(os.path.basename(ruta))
+        for i, ruta in enumerate(cambiados):
+            # Lo recordado de la versión anterior del archivo (preguntas pendientes, códigos, equipo en Hybrid) se olvida
+            nombre = os.path.basename(ruta)
+            decisiones.pendientes[:] = [p for p in decisiones.pendientes if p["ARCHIVO"] != nombre]
+            parser.identificadores.olvidar(nombre)
+            getattr(parser, "file_teams", {}).pop(nombre, None)
+            clon = _clonar(parser)
+            clon.process_file(ruta, i, len(cambiados))
+            self.extraidos[ruta] = {a: getattr(clon, a) for a in parser.ESTADO_BRUTO}
+
+        # La exportación modifica las filas (acumulados derivados): se junta una copia, así cada
+        # consolidación parte de lo extraído como una ejecución completa
+        for atributo in parser.ESTADO_BRUTO: setattr(parser, atributo, type(getattr(parser, atributo))())
+        for ruta in self.entradas():
+            if ruta in self.extraidos: agregar(parser, copy.deepcopy(self.extraidos[ruta]))   # árbol y filas comparten los dict
+        exportar(parser)
+
+def _despertador(carpetas):
+    """Evento que el sistema de archivos activa ante un cambio (con 'watchdog'), y su observador; si no, (evento, None)."""
+    evento = threading.Event()
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return evento, None   # sólo sondeo cada INTERVALO segundos
+
+    class _Aviso(FileSystemEventHandler):
+        def on_any_event(self, _):
+            evento.set()
+
+    observador = Observer()
+    for carpeta in carpetas: observador.schedule(_Aviso(), carpeta, recursive=False)
+    observador.start()
+    return evento, observador
+
+def vigilar(perfil, carpetas, argv, intervalo=INTERVALO, estable=ESTABLE, vueltas=None):
+    """
+    Vigila 'carpetas' con el perfil dado hasta Ctrl+C (o 'vueltas' revisiones) y
+    mantiene al día el consolidado de cada una.
+    """
+    clase = PERFILES[perfil][1] and getattr(cargar_perfil(perfil), PERFILES[perfil][1])
+    tipo = _CarpetaPorArchivo if hasattr(clase, "process_file") else _Carpeta
+    vigiladas = [tipo(perfil, c, argv) for c in carpetas]
+    evento, observador = _despertador(carpetas)
+    print(f"\n[VIGILANCIA] {len(carpetas)} carpeta(s), perfil {perfil}, "
+          f"{'avisos del sistema de archivos' if observador else f'revisión cada {intervalo:g}s'}. Ctrl+C para terminar.")
+    n = 0
+    try:
+        while vueltas is None or n < vueltas:
+            if n: evento.wait(estable if any(v.esperando for v in vigiladas) else intervalo)
+            evento.clear()
+            for v in vigiladas:
+                try: v.revisar(estable)
+                except Exception as e: print(f"[ERROR] {v.carpeta}: {e}")   # la vigilancia sigue con las demás
+            n += 1
+    except KeyboardInterrupt:
+        print("\n[VIGILANCIA] Detenida.")
+    finally:
+        if observador: observador.stop(); observador.join()
@@ -0,0 +1,108 @@
+"""
+Vistas estilizadas diferidas (Planilla Estilizada, DATOS_ESTILIZADOS, VISUAL_*).
+
+Las vistas con formato son para revisión humana y cuestan más de escribir que
+los datos brutos. Cada consolidador guarda ahora, junto a su salida, el
+resultado bruto en '<salida>_RESULTADO.json' (árboles y filas tal como quedan
+en memoria tras la extracción; JSON, así abrirlo no ejecuta nada) y por defecto escribe sólo las hojas brutas.
+Las vistas se generan después, a pedido y sin volver a leer las planillas:
+
+    python <script>.py render [CARPETA] [--filtro Maule --filtro Biobio]
+
+--filtro (repetible) deja sólo los archivos de origen o equipos cuyo nombre
+lo contiene (sin distinguir mayúsculas ni tildes). Para el comportamiento
+anterior (todo en una pasada) se usa '--estilizada' en la ejecución normal.
+"""
+
+import argparse
+import os
+import re
+import sys
+import unicodedata
+from datetime import datetime
+
+from ips_core.salida import guardar_atomico, guardar_json, leer_json
+
+SUFIJO_RESULTADO = "_RESULTADO.json"
+SUFIJO_VISTA = "_ESTILIZADA"
+
+def vistas_de_argv(argv=None):
+    """
+    'render [CARPETA] [--filtro X ...]' / '--estilizada' -> (render, carpeta, filtros, estilizada).
+    render=False: ejecución normal; estilizada=True: vistas en la misma pasada (como antes).
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # El comando va primero: los demás argumentos posicionales son valores de otras opciones (--format xlsx)
+    render = bool(argv) and argv[0] == "render"
+    carpeta = argv[1] if render and len(argv) > 1 and not argv[1].startswith("-") else None
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--filtro", action="append", default=[])
+    ap.add_argument("--estilizada", action="store_true")
+    args, _ = ap.parse_known_args(argv)
+    if args.filtro and not render:
+        raise SystemExit("[ERROR] --filtro sólo se usa con el comando 'render'.")
+    return render, carpeta, args.filtro, args.estilizada
+
+def ruta_resultado(salida):
+    return os.path.splitext(salida)[0] + SUFIJO_RESULTADO
+
+def persistir(estado, salida):
+    """Guarda 'estado' ({atributo: valor}) junto a 'salida' (JSON, temporal + renombrado)."""
+    datos = {"generado": datetime.now().strftime("%Y-%m-%d %H:%M"), "estado": estado}
+    return guardar_json(datos, ruta_resultado(salida))
+
+def restaurar(salida):
+    """Estado guardado por persistir() para 'salida'. Sale con error si no existe."""
+    ruta = ruta_resultado(salida)
+    if not os.path.exists(ruta):
+        raise SystemExit(f"[ERROR] No hay resultado guardado ({os.path.basename(ruta)}). Ejecute primero el consolidador.")
+    try: datos = leer_json(ruta)
+    except ValueError as e: raise SystemExit(f"[ERROR] Resultado guardado ilegible ({e}). Ejecute de nuevo el consolidador.")
+    print(f"[INFO] Resultado bruto del {datos['generado']}: {os.path.basename(ruta)}")
+    return datos["estado"]
+
+def _normalizar(texto):
+    return unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode().upper()
+
+def coincide(textos, filtros):
+    """True si algún filtro está contenido en alguno de los textos (o si no hay filtros)."""
+    if not filtros: return True
+    textos = [_normalizar(t) for t in textos if t is not None]
+    return any(_normalizar(f) in t for f in filtros for t in textos)
+
+def filtrar_arbol(arbol, filtros, campos=("EQUIPO",)):
+    """
+    {archivo: {hoja: [filas]}} con sólo lo que coincide con 'filtros': el
+    archivo completo si su nombre coincide; si no, las filas cuyo 'campos' coincide.
+    """
+    if not filtros: return arbol
+    salida = {}
+    for fname, sheets in arbol.items():
+        if coincide([fname], filtros):
+            salida[fname] = sheets
+            continue
+        hojas = {s: [r for r in rows if coincide([r.get(c) for c in campos], filtros)] for s, rows in sheets.items()}
+        if any(hojas.values()): salida[fname] = hojas
+    return salida
+
+def ruta_vista(salida, filtros=None):
+    """'X.xlsx' -> 'X_ESTILIZADA.xlsx' (o 'X_ESTILIZADA_Maule_Biobio.xlsx' con filtros)."""
+    base, ext = os.path.splitext(salida)
+    sufijo = "_" + re.sub(r'[^\w\-]+', '_', "_".join(filtros)).strip("_")[:60] if filtros else ""
+    return f"{base}{SUFIJO_VISTA}{sufijo}{ext}"
+
+def renderizar(parser, filtros=None):
+    """
+    Restaura en 'parser' el resultado bruto guardado, aplica los filtros a sus
+    árboles (parser.ARBOLES_ESTILIZADOS) y escribe parser.build_styled_workbook()
+    en '<salida>_ESTILIZADA[_filtros].xlsx'. Devuelve la ruta o None si no queda nada.
+    """
+    for atributo, valor in restaurar(parser.output_file).items(): setattr(parser, atributo, valor)
+    for atributo in parser.ARBOLES_ESTILIZADOS:
+        setattr(parser, atributo, filtrar_arbol(getattr(parser, atributo), filtros))
+    if not any(getattr(parser, a) for a in parser.ARBOLES_ESTILIZADOS):
+        print(f"[ERROR] Ningún archivo ni equipo coincide con: {', '.join(filtros)}")
+        return None
+    ruta = guardar_atomico(lambda tmp: parser.build_styled_workbook().guardar(tmp), ruta_vista(parser.output_file, filtros))
+    print(f"[ÉXITO] Vista estilizada: {ruta}")
+    return ruta
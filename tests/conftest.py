@@ -0,0 +1,5 @@
+import os
+import sys
+
+# ips_core está en la raíz del repositorio (los scripts la ubican igual)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
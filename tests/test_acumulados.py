@@ -0,0 +1,36 @@
+from ips_core.acumulados import CLAVE_DERIVADO, CLAVE_REVISAR, derivar_acumulados
+
+MESES = ["Ene.", "Feb.", "Mar."]
+ACUMS = [None, "Acum Feb.", "Acum Mar."]
+
+def test_suma_completa_los_acumulados_vacios():
+    fila = {"Ene.": 1, "Feb.": 2, "Acum Feb.": "", "Mar.": 3, "Acum Mar.": ""}
+    assert derivar_acumulados([fila], MESES, ACUMS) == (2, 0)
+    assert (fila["Acum Feb."], fila["Acum Mar."]) == (3, 6)
+    assert fila[CLAVE_DERIVADO] == {"Acum Feb.", "Acum Mar."}
+    assert CLAVE_REVISAR not in fila
+
+def test_stock_repite_el_valor_del_mes():
+    # El Acum de febrero digitado repite el mes (dotación): se elige el modo "último valor"
+    fila = {"Ene.": 10, "Feb.": 10, "Acum Feb.": 10, "Mar.": 12, "Acum Mar.": ""}
+    assert derivar_acumulados([fila], MESES, ACUMS) == (1, 0)
+    assert fila["Acum Mar."] == 12
+    assert fila[CLAVE_DERIVADO] == {"Acum Mar."}
+
+def test_modo_por_indicador():
+    suma = {"Ene.": 1, "Feb.": 2, "Acum Feb.": 3, "Mar.": 3, "Acum Mar.": ""}
+    stock = {"Ene.": 10, "Feb.": 10, "Acum Feb.": 10, "Mar.": 12, "Acum Mar.": ""}
+    derivar_acumulados([suma, stock], MESES, ACUMS)
+    assert (suma["Acum Mar."], stock["Acum Mar."]) == (6, 12)
+
+def test_acumulado_digitado_distinto_se_marca():
+    fila = {"Ene.": 1, "Feb.": 2, "Acum Feb.": 99, "Mar.": 3, "Acum Mar.": "No aplica"}
+    assert derivar_acumulados([fila], MESES, ACUMS) == (1, 1)
+    assert fila["Acum Feb."] == 99   # lo digitado no se pisa
+    assert fila[CLAVE_REVISAR] == {"Acum Feb."}
+    assert fila["Acum Mar."] == 6
+
+def test_mes_sin_valor_no_arrastra_el_acumulado():
+    fila = {"Ene.": 1, "Feb.": 2, "Acum Feb.": "", "Mar.": "", "Acum Mar.": ""}
+    assert derivar_acumulados([fila], MESES, ACUMS) == (1, 0)
+    assert fila["Acum Mar."] == ""
@@ -0,0 +1,22 @@
+from ips_core.centros import IndiceCentros, codigo_cr, indice_catalogo
+
+def test_alias_claro_se_acepta_solo():
+    indice = indice_catalogo()
+    assert indice.resolver("REG  Los Rios")[0] == "DIRECCION REGIONAL DE LOS RIOS"
+    assert indice.resolver("Planilla SIG - CDC REG Aisen")[0] == "DIRECCION REGIONAL AYSEN"
+    assert indice.resolver("Proyecciones Indicadores 2026 Reg Ñuble")[0] == "DIRECCION REGIONAL ÑUBLE"
+    assert codigo_cr("DIRECCION REGIONAL ÑUBLE") == "IP25_748"
+
+def test_nombre_ambiguo_no_se_resuelve():
+    valor, candidatos = indice_catalogo().resolver("DIRECCION REGIONAL")
+    assert valor is None
+    assert len(candidatos) == 3 and all(c[0].startswith("DIRECCION REGIONAL") for c in candidatos)
+
+def test_empate_bajo_el_margen():
+    indice = IndiceCentros({"DIVISION BENEFICIOS": "A", "DIVISION JURIDICA": "B"})
+    valor, candidatos = indice.resolver("DIVISION")
+    assert valor is None and {c[0] for c in candidatos} == {"A", "B"}
+    assert indice.resolver("Division Juridica 2026")[0] == "B"
+
+def test_sin_candidatos():
+    assert IndiceCentros({"MAULE": "A"}).resolver("zzz") == (None, [])
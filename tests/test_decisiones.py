@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from ips_core.decisiones import Decisiones
+
+REGLAS = {
+    "defecto": {"equipo": "m"},
+    "reglas": [
+        {"tipo": "fila_rara", "texto": "NUEVO*", "respuesta": "c"},
+        {"tipo": "fila_rara", "texto": "re:^total\\b", "respuesta": "x"},
+        {"tipo": "equipo_manual", "archivo": "*maule*", "respuesta": "DIRECCION REGIONAL MAULE"},
+        {"tipo": "columnas", "archivo": "*.xls", "hoja": "Riesgo*", "respuesta": "S"},
+        {"tipo": "*", "archivo": "*borrador*", "respuesta": "s"},
+    ],
+}
+
+@pytest.fixture
+def reglas():
+    return Decisiones(REGLAS)
+
+def test_regla_por_texto_glob_y_regex(reglas):
+    assert reglas.responder("fila_rara", "> ", ["c", "s", "x"], texto="Nuevo indicador", archivo="a.xlsx") == "c"
+    assert reglas.responder("fila_rara", "> ", ["c", "s", "x"], texto="TOTAL país", archivo="a.xlsx") == "x"
+    assert not reglas.pendientes
+
+def test_patrones_sin_mayusculas_ni_tildes(reglas):
+    respuesta = reglas.responder("equipo_manual", "> ", archivo="Región del MÁULE.xlsx")
+    assert respuesta == "DIRECCION REGIONAL MAULE"   # texto libre: no se pasa a minúsculas
+    assert reglas.responder("columnas", "> ", ["c", "s"], archivo="x.xls", hoja="riesgos 2026") == "s"
+
+def test_primera_regla_y_comodin_de_tipo(reglas):
+    assert reglas.responder("columnas", "> ", ["c", "s"], archivo="borrador.xlsx", hoja="CDC") == "s"
+    assert reglas.responder("fila_rara", "> ", ["c", "s", "x"], texto="NUEVO", archivo="borrador.xlsx") == "c"
+
+def test_sin_regla_defecto_del_archivo_o_conservador(reglas):
+    # El "defecto" del archivo de reglas es una respuesta decidida; la conservadora queda en el informe
+    assert reglas.responder("equipo", "> ", ["1", "m", "n"], archivo="a.xlsx") == "m"
+    assert reglas.responder("fila_rara", "> ", ["c", "s", "x"], fila=7, texto="???", archivo="a.xlsx", hoja="H") == "s"
+    assert [(p["TIPO"], p["FILA"], p["RESPUESTA_APLICADA"]) for p in reglas.pendientes] == [("fila_rara", 7, "s")]
+
+def test_regla_con_respuesta_invalida_no_se_aplica():
+    d = Decisiones({"defecto": {}, "reglas": [{"tipo": "fila_rara", "respuesta": "zz"}]})
+    assert d.responder("fila_rara", "> ", ["c", "s"], archivo="a.xlsx") == "s"
+    assert len(d.pendientes) == 1
+
+# --- Diario: la misma pregunta se responde sola mientras el dato no cambie ---
+
+def _preguntar(d, ruta, texto="Fila rara"):
+    d.contexto("a.xlsx", "CDC 2026", str(ruta))
+    return d.responder("fila_rara", "> ", ["c", "s"], fila=5, texto=texto)
+
+def _sin_operador(pregunta):
+    raise AssertionError(f"No debía preguntar: {pregunta}")
+
+@pytest.fixture
+def diario(tmp_path):
+    planilla, salida = tmp_path / "a.xlsx", str(tmp_path / "SALIDA.xlsx")
+    planilla.write_bytes(b"version 1")
+    d = Decisiones()
+    d.abrir_diario(salida)
+    d.entrada = lambda pregunta: "C"
+    assert _preguntar(d, planilla) == "c"
+    return planilla, salida
+
+def _reabrir(salida, entrada=_sin_operador):
+    d = Decisiones()
+    d.abrir_diario(salida)
+    d.entrada = entrada
+    return d
+
+def test_diario_anota_clave_y_respuesta(diario):
+    planilla, salida = diario
+    (linea,) = open(salida.replace(".xlsx", "_DECISIONES.jsonl"), encoding="utf-8").read().splitlines()
+    e = json.loads(linea)
+    assert (e["archivo"], e["hoja"], e["fila"], e["tipo"], e["texto"], e["respuesta"]) == ("a.xlsx", "CDC 2026", 5, "fila_rara", "Fila rara", "c")
+    assert len(e["hash"]) == 40
+
+def test_diario_mismo_archivo(diario):
+    planilla, salida = diario
+    assert _preguntar(_reabrir(salida), planilla) == "c"
+
+def test_diario_archivo_cambiado_misma_celda(diario):
+    planilla, salida = diario
+    planilla.write_bytes(b"version 2, otra fila cambio")
+    assert _preguntar(_reabrir(salida), planilla) == "c"
+
+def test_diario_celda_cambiada_se_vuelve_a_preguntar(diario):
+    planilla, salida = diario
+    planilla.write_bytes(b"version 2")
+    assert _preguntar(_reabrir(salida, lambda p: "s"), planilla, texto="Otro texto") == "s"
+
+def test_diario_mismo_archivo_aunque_cambie_el_texto(diario):
+    # Clave exacta (hash, hoja, fila, tipo): con el archivo intacto no depende del texto
+    planilla, salida = diario
+    assert _preguntar(_reabrir(salida), planilla, texto="Texto normalizado distinto") == "c"
+
+def test_sin_diario_pregunta_igual(diario):
+    planilla, salida = diario
+    d = _reabrir(salida, lambda p: "s")
+    d.repetir = False
+    assert _preguntar(d, planilla) == "s"
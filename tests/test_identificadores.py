@@ -0,0 +1,35 @@
+import hashlib
+
+from ips_core.identificadores import LARGO, Identificadores, clave_indicador
+
+def test_mismo_indicador_mismo_codigo_en_cada_ejecucion():
+    a = Identificadores().nuevo("GEN", "Maule.xlsx", "CDC 2026", "Porcentaje de  atención")
+    b = Identificadores().nuevo("GEN", "Maule.xlsx", "CDC 2026", "porcentaje de atencion")
+    assert a == b and a.startswith("GEN_") and len(a) == len("GEN_") + LARGO
+
+def test_texto_repetido_en_la_hoja_recibe_otro_codigo():
+    ids = Identificadores()
+    primero = ids.nuevo("GEN", "Maule.xlsx", "CDC 2026", "Indicador")
+    segundo = ids.nuevo("GEN", "Maule.xlsx", "CDC 2026", "Indicador")
+    assert primero != segundo
+    # El orden de aparición es parte de la clave: se repite en otra ejecución
+    otra = Identificadores()
+    assert [otra.nuevo("GEN", "Maule.xlsx", "CDC 2026", "Indicador") for _ in range(2)] == [primero, segundo]
+
+def test_choque_de_hash_alarga_el_codigo():
+    clave = clave_indicador("Maule.xlsx", "CDC 2026", "Indicador")
+    digest = hashlib.sha1(clave.encode("utf-8")).hexdigest()
+    ids = Identificadores()
+    ids.claves[f"GEN_{digest[:LARGO]}"] = "otra clave con el mismo hash"
+    codigo = ids.nuevo("GEN", "Maule.xlsx", "CDC 2026", "Indicador")
+    assert codigo == f"GEN_{digest[:LARGO + 2]}"
+    assert ids.claves[codigo] == clave
+
+def test_sufijo_y_olvidar():
+    ids = Identificadores()
+    codigo = ids.nuevo("NUEVO", "Maule.xlsx", "CDC 2026", "Indicador", "_18_Proyecciones")
+    assert codigo.endswith("_18_Proyecciones")
+    ids.nuevo("NUEVO", "Biobio.xlsx", "CDC 2026", "Indicador")
+    ids.olvidar("Maule.xlsx")
+    assert len(ids) == 1
+    assert ids.nuevo("NUEVO", "Maule.xlsx", "CDC 2026", "Indicador", "_18_Proyecciones") == codigo